@@ -1,19 +1,65 @@
+import os
+import json
 from datetime import datetime, timedelta
 from airflow import DAG
 from airflow.operators.python_operator import PythonOperator
 from airflow.operators.dummy_operator import DummyOperator
 from airflow.operators import (StageCSVToRedshiftOperator, LoadFactOperator,
-                               LoadDimensionOperator, DataQualityOperator)
+                               LoadDimensionOperator, DataQualityOperator,
+                               PreprocessOperator, UploadToS3Operator)
 
 from helpers import EuroEnergyQueries
 
+# preprocessing ran with --build-facts: COPY the prebuilt energy_loads rows instead of joining staging tables
+LOCAL_FACTS = False
+
+# each run stages only the country=XX/year=YYYY/month=MM partitions of the processed time series
+# its schedule interval overlaps, and replaces just that window of energy_loads
+PARTITION_WINDOW = ('{{ execution_date }}', '{{ next_execution_date }}')
+
+# countries and datasets the tasks fan out over, the pools they run in and the options passed
+# on to preprocess_upload.process_data. AT, DE_LU and NL publish 15 minute intervals and BE
+# hourly ones, so every time series is resampled to one resolution for the energy_loads join
+# to line up on ts. The pools are created with
+# airflow pool -i euro_energy_pools.json
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'euro_energy_config.json')) as f:
+    CONFIG = json.load(f)
+
+POOLS = CONFIG['pools']
+
+# the processed time series are COPYed in the format preprocessing writes them in. Installed
+# capacity has no event time to partition on and is always written as csv.
+FILE_FORMAT = (CONFIG['preprocess'].get('output_format') or 'csv').upper()
+
+# staging table of each dataset, its DDL and whether it is staged by PARTITION_WINDOW
+STAGING = {
+    'total_demand': ('staging_energy_loads', EuroEnergyQueries.stage_energy_loads, True),
+    'total_generation': ('staging_energy_generation', EuroEnergyQueries.stage_energy_generation, True),
+    'day_ahead_prices': ('staging_day_ahead_prices', EuroEnergyQueries.stage_day_ahead_prices, True),
+    'installed_capacity': ('staging_installed_cap', EuroEnergyQueries.stage_installed_capacity, False),
+}
+
+# datasets joined into the energy_loads facts of a country
+FACT_SOURCES = ['total_demand', 'total_generation', 'day_ahead_prices']
+
+# ENTSOE_WAREHOUSE=duckdb runs the DAG against an embedded DuckDB file that reads the processed
+# files from disk instead of Redshift and S3, see helpers.warehouse.DuckDBWarehouse
+if os.environ.get('ENTSOE_WAREHOUSE') == 'duckdb':
+    WAREHOUSE = {'backend': 'duckdb',
+                 'database': os.environ.get('ENTSOE_DUCKDB', './data/warehouse.duckdb'),
+                 's3_root': os.environ.get('ENTSOE_PROCESSED', './data/processed')}
+else:
+    WAREHOUSE = None
+
 default_args = {
     'owner': 'nicholas',
     'start_date': datetime(2020, 5, 27, 0,0,0),
     'depends_on_past': True,
     'retries': 3,
     'retry_delay': timedelta(minutes=1),
-    'email_on_retry': False
+    'email_on_retry': False,
+    # passed on to every operator taking a warehouse argument
+    'warehouse': WAREHOUSE
 }
 
 dag = DAG('euro-energy-etl',
@@ -25,62 +71,170 @@ dag = DAG('euro-energy-etl',
 start_operator = DummyOperator(task_id='Begin_execution', dag=dag)
 
 
-stage_demand_to_redshift = StageCSVToRedshiftOperator(
-    task_id='stage_energy_loads',
-    dag=dag,
-    table='staging_energy_loads',
-    create_table_sql=EuroEnergyQueries.stage_energy_loads,
-    redshift_conn_id='redshift',
-    aws_credentials_id="aws_credentials",
-    s3_bucket='s3://energy-etl-processed/total_demand'
-)
+def preprocess_and_stage(dataset, country, table, create_table_sql, partition_window=None):
+    """
+    preprocess >> upload >> stage tasks of one (dataset, country) group. Each group retries on
+    its own and only replaces its country's rows of the shared table. Without S3, on DuckDB,
+    the processed files are staged from disk.
 
-stage_installed_capacity_to_redshift = StageCSVToRedshiftOperator(
-    task_id='stage_installed_capacity',
-    dag=dag,
-    table="staging_installed_cap",
-    create_table_sql=EuroEnergyQueries.stage_installed_capacity,
-    redshift_conn_id="redshift",
-    aws_credentials_id="aws_credentials",
-    s3_bucket="s3://energy-etl-processed/installed_capacity"
-)
+    Returns the first and last task of the group.
+    """
+
+    preprocess = PreprocessOperator(
+        task_id=f'preprocess_{dataset}_{country}',
+        dag=dag,
+        dataset=dataset,
+        country=country,
+        options=CONFIG['preprocess'],
+        pool=POOLS['preprocess']
+    )
+
+    stage = StageCSVToRedshiftOperator(
+        task_id=f'stage_{dataset}_{country}',
+        dag=dag,
+        table=table,
+        create_table_sql=create_table_sql,
+        redshift_conn_id='redshift',
+        aws_credentials_id='aws_credentials',
+        s3_bucket=f's3://energy-etl-processed/{dataset}',
+        file_format='CSV' if dataset == 'installed_capacity' else FILE_FORMAT,
+        partition_window=partition_window,
+        countries=[country],
+        pool=POOLS['warehouse']
+    )
+
+    if WAREHOUSE is None:
+        preprocess >> UploadToS3Operator(
+            task_id=f'upload_{dataset}_{country}',
+            dag=dag,
+            dataset=dataset,
+            country=country,
+            aws_credentials_id='aws_credentials',
+            pool=POOLS['upload']
+        ) >> stage
+    else:
+        preprocess >> stage
+
+    return preprocess, stage
 
-stage_generation_to_redshift = StageCSVToRedshiftOperator(
-    task_id='stage_generation',
-    dag=dag,
-    table="staging_energy_generation",
-    create_table_sql=EuroEnergyQueries.stage_energy_generation,
-    redshift_conn_id="redshift",
-    aws_credentials_id="aws_credentials",
-    s3_bucket="s3://energy-etl-processed/total_generation"
-)
 
-stage_day_ahead_prices_to_redshift = StageCSVToRedshiftOperator(
-    task_id='staging_day_ahead_prices',
+fact_table_size_check = DataQualityOperator(
+    task_id='fact_table_size_check',
     dag=dag,
-    table="staging_day_ahead_prices",
-    create_table_sql=EuroEnergyQueries.stage_day_ahead_prices,
-    redshift_conn_id="redshift",
-    aws_credentials_id="aws_credentials",
-    s3_bucket="s3://energy-etl-processed/day_ahead_prices"
+    redshift_conn_id='redshift',
+    sql_data_checks=[
+        {"check_sql": """SELECT CASE WHEN count(*)>1000000 THEN true ELSE false END FROM energy_loads""",
+         "expected_result": 'true'}
+    ],
+    pool=POOLS['warehouse']
 )
 
-stage_quality_checks = DataQualityOperator(
-    task_id='stage_quality_checks',
+capacity_quality_checks = DataQualityOperator(
+    task_id='capacity_quality_checks',
     dag=dag,
     redshift_conn_id='redshift',
+    aws_credentials_id='aws_credentials',
     sql_data_checks=[
-        {"check_sql": "SELECT count(*) FROM staging_day_ahead_prices WHERE event_date is NULL",
-         "expected_result": 0},
-        {"check_sql": "SELECT count(*) FROM staging_energy_generation WHERE event_date is NULL",
-         "expected_result": 0},
         {"check_sql": "SELECT count(*) FROM staging_installed_cap WHERE area_date is NULL",
          "expected_result": 0},
-        {"check_sql": "SELECT count(*) FROM staging_energy_loads WHERE event_date is NULL",
+        # every staged file loaded the rows its profile sidecar counted
+        {"type": "profiles", "table": "staging_installed_cap",
+         "source": "s3://energy-etl-processed/installed_capacity", "countries": CONFIG['countries'],
          "expected_result": 0}
-    ]
+    ],
+    pool=POOLS['warehouse']
+)
+
+preprocess_tasks = list()
+
+for country in CONFIG['countries']:
+    staged = dict()
+
+    for dataset in CONFIG['datasets']:
+        table, create_table_sql, windowed = STAGING[dataset]
+        preprocess, stage = preprocess_and_stage(dataset, country, table, create_table_sql,
+                                                 PARTITION_WINDOW if windowed else None)
+        start_operator >> preprocess
+        preprocess_tasks.append(preprocess)
+        staged[dataset] = (preprocess, stage)
+
+    if 'installed_capacity' in staged:
+        staged['installed_capacity'][1] >> capacity_quality_checks
+
+    if not all(dataset in staged for dataset in FACT_SOURCES):
+        continue
+
+    stage_quality_checks = DataQualityOperator(
+        task_id=f'stage_quality_checks_{country}',
+        dag=dag,
+        redshift_conn_id='redshift',
+        aws_credentials_id='aws_credentials',
+        sql_data_checks=[
+            {"check_sql": f"SELECT count(*) FROM {STAGING[dataset][0]} "
+                          f"WHERE event_date is NULL AND country_id = '{country}'",
+             "expected_result": 0}
+            for dataset in FACT_SOURCES
+        ] + [
+            {"type": "profiles", "table": STAGING[dataset][0], "source": f"s3://energy-etl-processed/{dataset}",
+             "partition_window": PARTITION_WINDOW, "countries": [country], "expected_result": 0}
+            for dataset in FACT_SOURCES
+        ],
+        pool=POOLS['warehouse']
+    )
+    [staged[dataset][1] for dataset in FACT_SOURCES] >> stage_quality_checks
+
+    if LOCAL_FACTS:
+        # the prebuilt rows of every partition of the country are reloaded, as COPY can't
+        # replace a window
+        build_energy_loads, load_energy_loads_table = preprocess_and_stage(
+            'energy_loads', country, 'energy_loads', EuroEnergyQueries.create_energy_loads)
+        [staged[dataset][0] for dataset in FACT_SOURCES] >> build_energy_loads
+        stage_quality_checks >> load_energy_loads_table
+    else:
+        load_energy_loads_table = LoadFactOperator(
+            task_id=f'load_energy_loads_table_{country}',
+            dag=dag,
+            table_id='energy_loads',
+            create_table_sql=EuroEnergyQueries.create_energy_loads,
+            redshift_conn_id='redshift',
+            sql_select=EuroEnergyQueries.energy_loads_table_insert,
+            incremental=True,
+            countries=[country],
+            pool=POOLS['warehouse']
+        )
+        stage_quality_checks >> load_energy_loads_table
+
+    load_energy_loads_table >> fact_table_size_check
+
+# the calendar covers the years of every preprocessed group, failed or not
+if WAREHOUSE is None:
+    upload_times = UploadToS3Operator(
+        task_id='upload_times',
+        dag=dag,
+        dataset='times',
+        aws_credentials_id='aws_credentials',
+        trigger_rule='all_done',
+        pool=POOLS['upload']
+    )
+    preprocess_tasks >> upload_times
+
+stage_times_to_redshift = StageCSVToRedshiftOperator(
+    task_id='stage_times',
+    dag=dag,
+    table="staging_times",
+    create_table_sql=EuroEnergyQueries.stage_times,
+    redshift_conn_id="redshift",
+    aws_credentials_id="aws_credentials",
+    s3_bucket="s3://energy-etl-processed/times",
+    trigger_rule='all_done' if WAREHOUSE is not None else 'all_success',
+    pool=POOLS['warehouse']
 )
 
+if WAREHOUSE is None:
+    upload_times >> stage_times_to_redshift
+else:
+    preprocess_tasks >> stage_times_to_redshift
+
 ## countries csv is already unique. No need to load after stage.
 create_load_countries_table = StageCSVToRedshiftOperator(
     task_id='load_countries_table',
@@ -89,26 +243,8 @@ create_load_countries_table = StageCSVToRedshiftOperator(
     create_table_sql=EuroEnergyQueries.create_countries,
     redshift_conn_id='redshift',
     aws_credentials_id='aws_credentials',
-    s3_bucket='s3://energy-etl-processed/countries'
-)
-
-load_energy_loads_table = LoadFactOperator(
-    task_id='load_energy_loads_table',
-    dag=dag,
-    table_id='energy_loads',
-    create_table_sql=EuroEnergyQueries.create_energy_loads,
-    redshift_conn_id='redshift',
-    sql_select=EuroEnergyQueries.energy_loads_table_insert
-)
-
-fact_table_size_check = DataQualityOperator(
-    task_id='fact_table_size_check',
-    dag=dag,
-    redshift_conn_id='redshift',
-    sql_data_checks=[
-        {"check_sql": """SELECT CASE WHEN count(*)>1000000 THEN true ELSE false END FROM energy_loads""",
-         "expected_result": 'true'}
-    ]
+    s3_bucket='s3://energy-etl-processed/countries',
+    pool=POOLS['warehouse']
 )
 
 load_installed_capacity_table = LoadDimensionOperator(
@@ -116,7 +252,8 @@ load_installed_capacity_table = LoadDimensionOperator(
     dag=dag,
     table_id='installed_capacity',
     redshift_conn_id='redshift',
-    sql_select=EuroEnergyQueries.installed_capacity_insert
+    sql_select=EuroEnergyQueries.installed_capacity_insert,
+    pool=POOLS['warehouse']
 )
 
 load_times_table = LoadDimensionOperator(
@@ -124,19 +261,19 @@ load_times_table = LoadDimensionOperator(
     dag=dag,
     table_id='times',
     redshift_conn_id='redshift',
-    sql_select=EuroEnergyQueries.times_table_insert
+    create_table_sql=EuroEnergyQueries.create_times,
+    append=True,
+    sql_select=EuroEnergyQueries.times_table_append,
+    pool=POOLS['warehouse']
 )
 
 end_operator = DummyOperator(task_id='Stop_execution', dag=dag)
 
 
-start_operator >> [create_load_countries_table,
-                   stage_demand_to_redshift,
-                   stage_installed_capacity_to_redshift,
-                   stage_generation_to_redshift,
-                   stage_day_ahead_prices_to_redshift] >> stage_quality_checks
+start_operator >> create_load_countries_table >> end_operator
+
+capacity_quality_checks >> load_installed_capacity_table >> end_operator
 
-stage_quality_checks >> load_energy_loads_table >> fact_table_size_check
+stage_times_to_redshift >> load_times_table >> end_operator
 
-fact_table_size_check >> [load_installed_capacity_table,
-                            load_times_table] >> end_operator
+fact_table_size_check >> end_operator
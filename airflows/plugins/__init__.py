@@ -12,7 +12,9 @@ class EntsoeETLPlugin(AirflowPlugin):
         operators.StageCSVToRedshiftOperator,
         operators.LoadFactOperator,
         operators.LoadDimensionOperator,
-        operators.DataQualityOperator
+        operators.DataQualityOperator,
+        operators.PreprocessOperator,
+        operators.UploadToS3Operator
     ]
     helpers = [
         helpers.EuroEnergyQueries
@@ -1,5 +1,10 @@
 from helpers.euro_energy_sql_queries import EuroEnergyQueries
+from helpers.warehouse import Warehouse, RedshiftWarehouse, DuckDBWarehouse, get_warehouse
 
 __all__ = [
     'EuroEnergyQueries',
-]
\ No newline at end of file
+    'Warehouse',
+    'RedshiftWarehouse',
+    'DuckDBWarehouse',
+    'get_warehouse',
+]
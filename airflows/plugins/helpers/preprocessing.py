@@ -0,0 +1,37 @@
+import os
+import sys
+import importlib
+
+# the repo's src/ and data/ directories, mounted into the Airflow containers by docker-compose
+SRC_PATH = os.environ.get('ENTSOE_SRC', '/usr/local/airflow/src')
+DATA_PATH = os.environ.get('ENTSOE_DATA', '/usr/local/airflow/data')
+
+
+def src_module(name, src_path=SRC_PATH):
+    """
+    A module of src/, imported from src_path.
+
+    Imported when a task runs rather than when the DAG is parsed, so the scheduler doesn't
+    load pandas and pyarrow for every parse.
+    """
+
+    if src_path not in sys.path:
+        sys.path.insert(0, src_path)
+
+    return importlib.import_module(name)
+
+
+def preprocess_upload(src_path=SRC_PATH):
+    """
+    The src/preprocess_upload module, see src_module.
+    """
+
+    return src_module('preprocess_upload', src_path)
+
+
+def timezones(src_path=SRC_PATH):
+    """
+    The src/timezones module, see src_module.
+    """
+
+    return src_module('timezones', src_path)
@@ -0,0 +1,149 @@
+from collections import namedtuple
+
+# A column of a warehouse table, in COPY order.
+#   encode: Redshift compression encoding. The leading sort key column is left RAW so range
+#       restricted scans don't decompress more blocks than the other columns they read.
+#   not_null: declare the column NOT NULL
+Column = namedtuple('Column', ['name', 'type', 'encode', 'not_null'], defaults=[False])
+
+# Physical design of a table.
+#   diststyle: KEY, ALL or EVEN
+#   distkey: distribution column of DISTSTYLE KEY tables. Redshift distributes on one column only.
+#   sortkey: compound sort key columns. Processed files are written in this order.
+#   primary_key: informational, Redshift doesn't enforce it but the planner trusts it
+Table = namedtuple('Table', ['columns', 'diststyle', 'distkey', 'sortkey', 'primary_key'],
+                   defaults=[None, (), ()])
+
+# The staging tables are joined on (ts, country_id) into energy_loads. Distributing them all on
+# ts keeps the joined rows on the same slice, and the country_id, ts sort key lets the join
+# merge instead of hash. ts rather than country_id is the distribution key as a few dozen
+# countries would skew the slices.
+TABLES = {
+    'staging_energy_loads': Table([
+        Column('event_date', 'VARCHAR(256)', 'zstd'),
+        Column('total_demand', 'NUMERIC(12,2)', 'az64'),
+        Column('country_id', 'VARCHAR(256)', 'raw'),
+        Column('ts', 'int8', 'az64'),
+    ], 'KEY', 'ts', ('country_id', 'ts')),
+
+    'staging_energy_generation': Table([
+        Column('event_date', 'VARCHAR(256)', 'zstd'),
+        Column('ts', 'int8', 'az64'),
+        Column('country_id', 'VARCHAR(256)', 'raw'),
+        Column('area', 'VARCHAR(256)', 'bytedict'),
+        Column('generation_type', 'VARCHAR(256)', 'bytedict'),
+        Column('generation_load', 'NUMERIC(12,2)', 'az64'),
+    ], 'KEY', 'ts', ('country_id', 'ts')),
+
+    'staging_day_ahead_prices': Table([
+        Column('event_date', 'VARCHAR(256)', 'zstd'),
+        Column('day_ahead_price', 'NUMERIC(8,2)', 'az64'),
+        Column('country_id', 'VARCHAR(256)', 'raw'),
+        Column('ts', 'int8', 'az64'),
+    ], 'KEY', 'ts', ('country_id', 'ts')),
+
+    'staging_installed_cap': Table([
+        Column('area_date', 'VARCHAR(256)', 'bytedict'),
+        Column('production_type', 'VARCHAR(256)', 'bytedict'),
+        Column('code', 'VARCHAR(256)', 'zstd'),
+        Column('name', 'VARCHAR(256)', 'zstd'),
+        Column('installed_capacity_year_start', 'NUMERIC(10,1)', 'az64'),
+        Column('current_installed_capacity', 'NUMERIC(10,1)', 'az64'),
+        Column('location', 'VARCHAR(256)', 'bytedict'),
+        Column('voltage_connection_level', 'INT4', 'az64'),
+        Column('commissioning_date', 'VARCHAR(256)', 'zstd'),
+        Column('decommissioning_date', 'VARCHAR(256)', 'zstd'),
+        Column('country_id', 'VARCHAR(256)', 'bytedict'),
+    ], 'EVEN'),
+
+    'staging_times': Table([
+        Column('event_date', 'TIMESTAMP', 'az64'),
+        Column('ts', 'int8', 'az64'),
+        Column('country_id', 'VARCHAR(256)', 'raw'),
+        Column('timezone', 'VARCHAR(256)', 'bytedict'),
+        Column('year', 'INT4', 'az64'),
+        Column('month', 'INT2', 'az64'),
+        Column('day', 'INT2', 'az64'),
+        Column('hour', 'INT2', 'az64'),
+        Column('minute', 'INT2', 'az64'),
+        Column('dayofweek', 'INT2', 'az64'),
+        Column('iso_week', 'INT2', 'az64'),
+        Column('is_dst', 'BOOLEAN', 'raw'),
+    ], 'EVEN', None, ('country_id', 'ts')),
+
+    # Rows are not unique on any subset of these columns: event_date is the local wall clock,
+    # which repeats in the autumn DST hour, and pumped storage generation and consumption share
+    # a generation_type. So no primary key is declared.
+    'energy_loads': Table([
+        Column('event_date', 'TIMESTAMP', 'az64', not_null=True),
+        Column('country_id', 'VARCHAR(256)', 'raw', not_null=True),
+        Column('generation_type', 'VARCHAR(256)', 'bytedict'),
+        Column('day_ahead_price', 'NUMERIC(8,2)', 'az64'),
+        Column('demand_load', 'NUMERIC(12,2)', 'az64'),
+        Column('generation_load', 'NUMERIC(12,2)', 'az64'),
+    ], 'KEY', 'event_date', ('country_id', 'event_date')),
+
+    # dimensions are small, a copy on every node joins them to the facts without redistribution
+    'times': Table([
+        Column('event_date', 'TIMESTAMP', 'az64', not_null=True),
+        Column('ts', 'int8', 'az64', not_null=True),
+        Column('country_id', 'VARCHAR(256)', 'raw', not_null=True),
+        Column('timezone', 'VARCHAR(256)', 'bytedict'),
+        Column('year', 'INT4', 'az64'),
+        Column('month', 'INT2', 'az64'),
+        Column('day', 'INT2', 'az64'),
+        Column('hour', 'INT2', 'az64'),
+        Column('minute', 'INT2', 'az64'),
+        Column('dayofweek', 'INT2', 'az64'),
+        Column('iso_week', 'INT2', 'az64'),
+        Column('is_dst', 'BOOLEAN', 'raw'),
+    ], 'ALL', None, ('country_id', 'ts'), ('country_id', 'ts')),
+
+    'countries': Table([
+        Column('country_id', 'VARCHAR(256)', 'raw', not_null=True),
+        Column('latitude', 'NUMERIC(18,0)', 'az64'),
+        Column('longitude', 'NUMERIC(18,0)', 'az64'),
+        Column('country_name', 'VARCHAR(256)', 'zstd'),
+    ], 'ALL', None, ('country_id',), ('country_id',)),
+
+    'installed_capacity': Table([
+        Column('generation_type', 'VARCHAR(256)', 'bytedict'),
+        Column('station_name', 'VARCHAR(256)', 'zstd'),
+        Column('country_id', 'VARCHAR(256)', 'raw'),
+        Column('installed_capacity', 'INT4', 'az64'),
+        Column('connection_voltage', 'INT4', 'az64'),
+        Column('commission_date', 'VARCHAR(256)', 'zstd'),
+        Column('control_area', 'VARCHAR(256)', 'bytedict'),
+        Column('code', 'VARCHAR(256)', 'zstd'),
+    ], 'ALL', None, ('country_id',), ('country_id', 'generation_type', 'station_name')),
+}
+
+
+def create_table_sql(table):
+    """
+    CREATE TABLE IF NOT EXISTS statement of a table in TABLES, with its encodings, distribution
+    and sort key.
+    """
+
+    design = TABLES[table]
+
+    lines = [f'{column.name} {column.type} ENCODE {column.encode}' + (' NOT NULL' if column.not_null else '')
+             for column in design.columns]
+    if len(design.primary_key) > 0:
+        lines.append(f'PRIMARY KEY ({", ".join(design.primary_key)})')
+
+    attributes = [f'DISTSTYLE {design.diststyle}']
+    if design.distkey is not None:
+        attributes.append(f'DISTKEY ({design.distkey})')
+    if len(design.sortkey) > 0:
+        attributes.append(f'COMPOUND SORTKEY ({", ".join(design.sortkey)})')
+
+    body = ',\n        '.join(lines)
+    table_attributes = '\n    '.join(attributes)
+
+    return f"""
+    CREATE TABLE IF NOT EXISTS {table} (
+        {body}
+    )
+    {table_attributes};
+    """
@@ -0,0 +1,567 @@
+import os
+import re
+import json
+import glob
+import time
+import hashlib
+import logging
+import datetime
+from abc import ABC, abstractmethod
+from fnmatch import fnmatch
+
+# processed files are profiled into JSON sidecars below profiles/, under the path of the file
+# they describe plus .json. Same as preprocess_upload.PROFILES.
+PROFILES = 'profiles'
+
+
+class Warehouse(ABC):
+    """
+    SQL backend the operators run against.
+
+    run executes one or more statements, get_records returns the rows of a query and copy bulk
+    loads processed files into a table.
+    """
+
+    @abstractmethod
+    def run(self, sql):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_records(self, sql):
+        raise NotImplementedError
+
+    @abstractmethod
+    def copy(self, table, source, file_format='CSV', compression='AUTO', manifest=None, partitions=None):
+        """
+        Loads the files under source, or the ones listed in manifest, into table.
+
+        partitions restricts the files to the ones whose path below source matches one of these
+        glob patterns, i.e. ['country=*/year=2020/month=05/*'].
+
+        Returns the number of files loaded, None if the backend can't tell.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def profiles(self, source, partitions=None):
+        """
+        Rows of each file under source, or matching partitions, counted by its profile sidecar.
+        Returns a dict of file, named like the load log names it, to rows.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def load_counts_sql(self, table):
+        """
+        Query of the rows the latest load of each file into table loaded, as (filename,
+        lines_scanned), from the backend's load log.
+        """
+        raise NotImplementedError
+
+    def reconcile_sql(self, table, source, partitions=None):
+        """
+        Query counting the files under source, or matching partitions, whose latest load into
+        table didn't load the rows of their profile, or that weren't loaded. Rows loaded come
+        from the load log, so the table itself isn't scanned.
+        """
+
+        profiled = self.profiles(source, partitions)
+        logging.info(f'{len(profiled)} profiled files under {source} to reconcile with {table}')
+        if len(profiled) == 0:
+            return 'SELECT 0'
+
+        expected = '\n            UNION ALL '.join(
+            "SELECT '" + file.replace("'", "''") + f"' AS filename, {rows} AS profiled_rows"
+            for file, rows in sorted(profiled.items()))
+
+        return f"""SELECT COUNT(*) FROM (
+            {expected}
+        ) AS profiled
+        LEFT JOIN ({self.load_counts_sql(table)}) AS loaded ON loaded.filename = profiled.filename
+        WHERE loaded.lines_scanned IS NULL OR loaded.lines_scanned <> profiled.profiled_rows"""
+
+
+def profile_source(source):
+    """
+    Location of the profile sidecars of the files under source, see PROFILES.
+    """
+
+    if source.startswith('s3://'):
+        bucket, _, prefix = source[len('s3://'):].partition('/')
+        return f's3://{bucket}/{PROFILES}/{prefix}'
+
+    source = os.path.normpath(source)
+
+    return os.path.join(os.path.dirname(source), PROFILES, os.path.basename(source))
+
+
+def local_window(start, end, tz):
+    """
+    A [start, end) window of UTC ISO timestamps as naive wall clock times of tz, the way event
+    dates are stored. Timestamps without an offset are UTC, like Airflow's execution dates.
+    """
+
+    import pandas as pd
+
+    bounds = list()
+    for value in (start, end):
+        value = pd.Timestamp(str(value))
+        value = value.tz_localize('UTC') if value.tz is None else value
+        bounds.append(value.tz_convert(tz).tz_localize(None).to_pydatetime())
+
+    return tuple(bounds)
+
+
+def country_timezones(countries=None):
+    """
+    Timezones of countries as a dict of timezone to the countries in it. None groups every
+    country of AREA_TIMEZONES in src/timezones.py.
+    """
+
+    from helpers.preprocessing import timezones
+
+    zones = timezones()
+    if countries is None:
+        countries = zones.AREA_TIMEZONES.keys()
+
+    grouped = dict()
+    for country in countries:
+        grouped.setdefault(zones.area_timezone(country), list()).append(country)
+
+    return grouped
+
+
+def window_partitions(start, end, countries=None):
+    """
+    Glob patterns of the month partitions a [start, end) window of UTC ISO timestamps overlaps.
+
+    Partitions hold the local event dates of their month, which can fall in the next or
+    previous month in UTC, so the window is converted to the local time of each country.
+    Without countries it is widened by a day on each side instead, which covers every timezone.
+    """
+
+    if countries is None:
+        windows = [('*', datetime.datetime.fromisoformat(str(start)) - datetime.timedelta(days=1),
+                    datetime.datetime.fromisoformat(str(end)) + datetime.timedelta(days=1))]
+    else:
+        from helpers.preprocessing import timezones
+
+        windows = [(country,) + local_window(start, end, timezones().area_timezone(country))
+                   for country in countries]
+
+    patterns = list()
+    for country, first, last in windows:
+        # end is exclusive
+        last = last - datetime.timedelta(microseconds=1)
+
+        year, month = first.year, first.month
+        while (year, month) <= (last.year, last.month):
+            patterns.append(f'country={country}/year={year}/month={month:02d}/*')
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+    return patterns
+
+
+def window_sql(column, start, end, countries=None):
+    """
+    SQL condition on the rows whose local time column falls in a [start, end) window of UTC ISO
+    timestamps, with the window converted to the timezone of their country_id.
+
+    Without countries the condition covers every country of AREA_TIMEZONES by the code before
+    any _, i.e. DE of DE_LU, and the default timezone for the others.
+    """
+
+    country = 'country_id' if countries is not None else "SPLIT_PART(country_id, '_', 1)"
+    grouped = country_timezones(countries)
+
+    def condition(tz, codes, operator='IN'):
+        first, last = local_window(start, end, tz)
+        codes = ', '.join(f"'{code}'" for code in codes)
+
+        return f"({country} {operator} ({codes}) AND {column} >= '{first:%Y-%m-%d %H:%M:%S}' " \
+               f"AND {column} < '{last:%Y-%m-%d %H:%M:%S}')"
+
+    conditions = [condition(tz, codes) for tz, codes in sorted(grouped.items())]
+    if countries is None:
+        from helpers.preprocessing import timezones
+
+        conditions.append(condition(timezones().DEFAULT_TIMEZONE,
+                                    [code for codes in grouped.values() for code in codes], 'NOT IN'))
+
+    return '(' + '\n                OR '.join(conditions) + ')'
+
+
+def staged_partitions(partition_window=None, countries=None):
+    """
+    Partition patterns a stage of the window and countries loads, None for everything.
+    """
+
+    if partition_window is not None:
+        return window_partitions(*partition_window, countries=countries)
+    if countries is not None:
+        return [f'country={country}/*' for country in countries]
+
+    return None
+
+
+def partition_match(relpath, partitions):
+    """
+    Whether a file path relative to the staged source matches one of the partition patterns.
+    Hidden and partially written files never do.
+    """
+
+    if os.path.basename(relpath).startswith('.'):
+        return False
+
+    return any(fnmatch(relpath, pattern) for pattern in partitions)
+
+
+class RedshiftWarehouse(Warehouse):
+    """
+    Redshift through PostgresHook. Files are loaded from S3 with COPY.
+    """
+
+    COPY_SQL = """
+            COPY {}
+            FROM '{}'
+            ACCESS_KEY_ID '{}'
+            SECRET_ACCESS_KEY '{}'
+            {}
+            {}
+            {}
+            REGION 'us-west-2'
+            """
+
+    # parquet files are typed, DATEFORMAT only applies to text formats. Only \N is read as
+    # NULL so codes like Namibia's NA load as text. Empty numeric fields are NULL either way.
+    FORMAT_SQL = {
+        'CSV': """FORMAT AS CSV
+            NULL AS '\\N'
+            DATEFORMAT 'auto'""",
+        'PARQUET': "FORMAT AS PARQUET",
+    }
+
+    # compression keyword for each compressed file extension
+    COMPRESSION_EXTENSIONS = {
+        '.gz': 'GZIP',
+        '.zst': 'ZSTD',
+        '.bz2': 'BZIP2',
+    }
+
+    def __init__(self, redshift_conn_id, aws_credentials_id=None):
+        # imported here so the embedded backend works without the postgres and AWS hooks
+        from airflow.hooks.postgres_hook import PostgresHook
+
+        self.hook = PostgresHook(redshift_conn_id)
+        self.aws_credentials_id = aws_credentials_id
+
+    def run(self, sql):
+        self.hook.run(sql)
+
+    def get_records(self, sql):
+        return self.hook.get_records(sql)
+
+    def manifest_keys(self, manifest):
+        """
+        Keys of the files listed in a manifest on S3.
+        """
+
+        from airflow.hooks.S3_hook import S3Hook
+
+        bucket, key = S3Hook.parse_s3_url(manifest)
+        manifest = json.loads(S3Hook(aws_conn_id=self.aws_credentials_id).read_key(key, bucket_name=bucket))
+
+        return [S3Hook.parse_s3_url(entry['url'])[1] for entry in manifest['entries']]
+
+    def detect_compression(self, source, keys=None):
+        """
+        Finds the compression of the files under source, or the given keys, from their extensions.
+        """
+
+        from airflow.hooks.S3_hook import S3Hook
+
+        if keys is None:
+            bucket, prefix = S3Hook.parse_s3_url(source)
+            keys = S3Hook(aws_conn_id=self.aws_credentials_id).list_keys(bucket_name=bucket, prefix=prefix) or []
+
+        compressions = {RedshiftWarehouse.COMPRESSION_EXTENSIONS.get(os.path.splitext(key)[1])
+                        for key in keys if not key.endswith('/')}
+
+        if len(compressions) > 1:
+            raise ValueError(f'Mixed compression under {source}: {compressions}')
+
+        return compressions.pop() if compressions else None
+
+    def partition_manifest(self, table, source, partitions):
+        """
+        Writes a manifest of the files under source matching partitions next to the run
+        manifests, as manifests/partitions/<table>-<hash of the patterns>.json in the source
+        bucket. Returns its url and the matched keys.
+        """
+
+        from airflow.hooks.S3_hook import S3Hook
+
+        hook = S3Hook(aws_conn_id=self.aws_credentials_id)
+        bucket, prefix = S3Hook.parse_s3_url(source)
+        prefix = prefix.rstrip('/') + '/'
+
+        objects = [(obj.key, obj.size) for obj in hook.get_bucket(bucket).objects.filter(Prefix=prefix)
+                   if partition_match(obj.key[len(prefix):], partitions)]
+
+        # content_length is required to COPY parquet from a manifest
+        entries = [{'url': f's3://{bucket}/{key}', 'mandatory': True, 'meta': {'content_length': size}}
+                   for key, size in objects]
+        digest = hashlib.sha1('|'.join(sorted(partitions)).encode()).hexdigest()[:12]
+        key = f'manifests/partitions/{table}-{digest}.json'
+        hook.load_string(json.dumps({'entries': entries}), key, bucket_name=bucket, replace=True)
+
+        return f's3://{bucket}/{key}', [key for key, _ in objects]
+
+    def copy(self, table, source, file_format='CSV', compression='AUTO', manifest=None, partitions=None):
+        from airflow.contrib.hooks.aws_hook import AwsHook
+
+        keys = None
+        if partitions is not None:
+            manifest, keys = self.partition_manifest(table, source, partitions)
+            logging.info(f'{len(keys)} files under {source} match {partitions}')
+            if len(keys) == 0:
+                return 0
+        elif manifest is not None:
+            keys = self.manifest_keys(manifest)
+            logging.info(f'Manifest {manifest} lists {len(keys)} files')
+            if len(keys) == 0:
+                return 0
+
+        # parquet compression is internal to the files
+        if file_format == 'PARQUET':
+            compression = None
+        elif compression == 'AUTO':
+            compression = self.detect_compression(source, keys)
+        logging.info(f'Compression: {compression}')
+
+        credentials = AwsHook(self.aws_credentials_id).get_credentials()
+
+        self.run(RedshiftWarehouse.COPY_SQL.format(
+            table,
+            manifest or source,
+            credentials.access_key,
+            credentials.secret_key,
+            RedshiftWarehouse.FORMAT_SQL[file_format],
+            compression or '',
+            'MANIFEST' if manifest is not None else ''
+        ))
+
+        return len(keys) if keys is not None else None
+
+    def profiles(self, source, partitions=None):
+        from airflow.hooks.S3_hook import S3Hook
+
+        hook = S3Hook(aws_conn_id=self.aws_credentials_id)
+        bucket, prefix = S3Hook.parse_s3_url(profile_source(source))
+        prefix = prefix.rstrip('/') + '/'
+        _, source_prefix = S3Hook.parse_s3_url(source)
+
+        profiled = dict()
+        for obj in hook.get_bucket(bucket).objects.filter(Prefix=prefix):
+            relpath = obj.key[len(prefix):]
+            if not relpath.endswith('.json') or \
+                    (partitions is not None and not partition_match(relpath[:-len('.json')], partitions)):
+                continue
+            profile = json.loads(obj.get()['Body'].read())
+            profiled[f's3://{bucket}/{source_prefix.rstrip("/")}/{relpath[:-len(".json")]}'] = profile['rows']
+
+        return profiled
+
+    def load_counts_sql(self, table):
+        # COPY logs the lines it scanned of every file in STL_LOAD_COMMITS. The COPYs into table
+        # are found by their query text.
+        return f"""
+            SELECT filename, lines_scanned FROM (
+                SELECT filename, lines_scanned,
+                       ROW_NUMBER() OVER (PARTITION BY filename ORDER BY query DESC) AS recency
+                FROM (
+                    SELECT c.query, TRIM(c.filename) AS filename, SUM(c.lines_scanned) AS lines_scanned
+                    FROM stl_load_commits c
+                    JOIN stl_query q ON q.query = c.query
+                    WHERE q.aborted = 0 AND q.querytxt ~* 'COPY[[:space:]]+{table}[[:space:]]'
+                    GROUP BY c.query, TRIM(c.filename)
+                ) AS loads
+            ) AS latest
+            WHERE recency = 1"""
+
+
+class DuckDBWarehouse(Warehouse):
+    """
+    Embedded DuckDB database, i.e. for development runs of the whole DAG on one machine.
+
+    Loads the processed files straight from disk with read_csv/read_parquet. S3 urls are
+    mapped below s3_root, so s3://energy-etl-processed/total_demand is read from
+    <s3_root>/total_demand, with the same for the urls inside manifests.
+
+    The Redshift dialect of EuroEnergyQueries is translated with the rules in TRANSLATIONS.
+    Only one process can write to a DuckDB file at a time, so run the DAG with the
+    SequentialExecutor.
+
+    copy logs the rows it loads of every file in LOAD_COMMITS, standing in for Redshift's
+    STL_LOAD_COMMITS.
+    """
+
+    LOAD_COMMITS = 'CREATE TABLE IF NOT EXISTS load_commits ' \
+                   '(tbl VARCHAR, filename VARCHAR, lines_scanned BIGINT, curtime TIMESTAMP)'
+
+    # (pattern, replacement) rewriting Redshift only SQL into DuckDB SQL, applied in order
+    TRANSLATIONS = [
+        # Redshift doesn't enforce keys, DuckDB does. Drop them to keep the Redshift semantics.
+        (r',\s*CONSTRAINT\s+\w+\s+PRIMARY\s+KEY\s*\([^)]*\)', ''),
+        (r',\s*PRIMARY\s+KEY\s*\([^)]*\)', ''),
+        (r'\s+PRIMARY\s+KEY\b', ''),
+        # physical design only Redshift has, see helpers.table_design
+        (r'\s+ENCODE\s+\w+', ''),
+        (r'\s+DISTSTYLE\s+\w+', ''),
+        (r'\s+DISTKEY\s*\([^)]*\)', ''),
+        (r'\s+(COMPOUND\s+|INTERLEAVED\s+)?SORTKEY\s*\([^)]*\)', ''),
+        (r'APPROXIMATE\s+COUNT\s*\(\s*DISTINCT\s+([^)]+)\)', r'approx_count_distinct(\1)'),
+        # staged event dates are "YYYYmmdd HHMMSS", which Redshift casts and DuckDB doesn't
+        (r'cast\s*\(\s*([\w.]+)\s+as\s+timestamp\s*\)',
+         r"coalesce(try_cast(\1 AS TIMESTAMP), try_strptime(\1, '%Y%m%d %H%M%S'))"),
+    ]
+
+    def __init__(self, database='./data/warehouse.duckdb', s3_root='./data/processed', threads=None):
+        self.database = database
+        self.s3_root = s3_root
+        self.threads = threads
+
+    def connect(self):
+        import duckdb
+
+        config = {'threads': self.threads} if self.threads is not None else {}
+        conn = duckdb.connect(self.database, config=config)
+        conn.execute('SET enable_progress_bar = false')
+        return conn
+
+    @staticmethod
+    def translate(sql):
+        for pattern, replacement in DuckDBWarehouse.TRANSLATIONS:
+            sql = re.sub(pattern, replacement, sql, flags=re.IGNORECASE)
+        return sql
+
+    def run(self, sql):
+        start = time.perf_counter()
+        conn = self.connect()
+        try:
+            conn.execute(DuckDBWarehouse.translate(sql))
+        finally:
+            conn.close()
+        logging.info(f'DuckDB ran in {time.perf_counter() - start:.2f}s')
+
+    def get_records(self, sql):
+        conn = self.connect()
+        try:
+            return conn.execute(DuckDBWarehouse.translate(sql)).fetchall()
+        finally:
+            conn.close()
+
+    def local_path(self, url):
+        if url.startswith('s3://') and self.s3_root is not None:
+            _, _, key = url[len('s3://'):].partition('/')
+            return os.path.join(self.s3_root, key)
+        return url
+
+    def files(self, source, file_format='CSV', manifest=None, partitions=None):
+        """
+        Local files under source, or listed in manifest, skipping hidden and partially written
+        ones. partitions keeps only the files matching one of these glob patterns below source.
+        """
+
+        if manifest is not None:
+            with open(self.local_path(manifest)) as f:
+                return [self.local_path(entry['url']) for entry in json.load(f)['entries']]
+
+        path = self.local_path(source)
+        if not os.path.isdir(path):
+            return sorted(glob.glob(path))
+
+        pattern = '*.parquet' if file_format == 'PARQUET' else '*.csv*'
+        files = sorted(file for file in glob.glob(os.path.join(path, '**', pattern), recursive=True)
+                       if not os.path.basename(file).startswith('.'))
+        if partitions is not None:
+            files = [file for file in files if partition_match(os.path.relpath(file, path), partitions)]
+
+        return files
+
+    def copy(self, table, source, file_format='CSV', compression='AUTO', manifest=None, partitions=None):
+        files = self.files(source, file_format, manifest, partitions)
+        logging.info(f'{len(files)} files to load into {table}')
+        if len(files) == 0:
+            return 0
+
+        file_list = '[' + ', '.join("'" + file.replace("'", "''") + "'" for file in files) + ']'
+
+        # compression is detected from the extensions. Values are read as text and cast to the
+        # table's column types on insert, like COPY does. Only empty fields, which is how missing
+        # values are written, are NULL, so Namibia's NA is a value. The country=XX/year=YYYY/month=MM
+        # directories are not columns of the files.
+        if file_format == 'PARQUET':
+            select = f'SELECT * FROM read_parquet({file_list}, hive_partitioning = false, filename = true)'
+        else:
+            select = f"SELECT * FROM read_csv({file_list}, header = false, all_varchar = true, " \
+                     "nullstr = '', hive_partitioning = false, filename = true)"
+
+        # rows are read once, with the file they came from for the load log
+        self.run(f"""
+            CREATE TEMP TABLE copied AS {select};
+            INSERT INTO {table} SELECT * EXCLUDE (filename) FROM copied;
+            {DuckDBWarehouse.LOAD_COMMITS};
+            INSERT INTO load_commits SELECT '{table}', filename, COUNT(*), now() FROM copied GROUP BY filename;
+        """)
+
+        return len(files)
+
+    def profiles(self, source, partitions=None):
+        path, profile_path = self.local_path(source), self.local_path(profile_source(source))
+
+        profiled = dict()
+        for sidecar in sorted(glob.glob(os.path.join(profile_path, '**', '*.json'), recursive=True)):
+            relpath = os.path.relpath(sidecar, profile_path)[:-len('.json')]
+            if os.path.basename(relpath).startswith('.') or \
+                    (partitions is not None and not partition_match(relpath, partitions)):
+                continue
+            with open(sidecar) as f:
+                # named like files names them
+                profiled[os.path.join(path, relpath)] = json.load(f)['rows']
+
+        return profiled
+
+    def load_counts_sql(self, table):
+        self.run(DuckDBWarehouse.LOAD_COMMITS)
+
+        return f"""
+            SELECT filename, lines_scanned FROM load_commits
+            WHERE tbl = '{table}'
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY filename ORDER BY curtime DESC) = 1"""
+
+
+# backends selectable with the operators' warehouse argument
+WAREHOUSES = {
+    'redshift': RedshiftWarehouse,
+    'duckdb': DuckDBWarehouse,
+}
+
+
+def get_warehouse(redshift_conn_id, warehouse=None, aws_credentials_id=None):
+    """
+    The backend an operator runs against.
+
+    Input:
+        redshift_conn_id: str. connection of the default Redshift backend
+        warehouse: dict. None for Redshift, otherwise the backend name under 'backend' and its
+            arguments, i.e. {'backend': 'duckdb', 'database': './data/warehouse.duckdb'}
+        aws_credentials_id: str. credentials Redshift reads S3 with
+    """
+
+    if warehouse is None or warehouse.get('backend', 'redshift') == 'redshift':
+        return RedshiftWarehouse(redshift_conn_id, aws_credentials_id)
+
+    options = {key: value for key, value in warehouse.items() if key != 'backend'}
+
+    return WAREHOUSES[warehouse['backend']](**options)
@@ -2,10 +2,14 @@ from operators.stage_redshift import StageCSVToRedshiftOperator
 from operators.load_facts import LoadFactOperator
 from operators.load_dimensions import LoadDimensionOperator
 from operators.data_quality_check import DataQualityOperator
+from operators.preprocess import PreprocessOperator
+from operators.upload_s3 import UploadToS3Operator
 
 __all__ = [
     'StageCSVToRedshiftOperator',
     'LoadFactOperator',
     'LoadDimensionOperator',
-    'DataQualityOperator'
+    'DataQualityOperator',
+    'PreprocessOperator',
+    'UploadToS3Operator'
 ]
\ No newline at end of file
@@ -1,10 +1,40 @@
-from airflow.hooks.postgres_hook import PostgresHook
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from airflow.models import BaseOperator
 from airflow.utils.decorators import apply_defaults
 
+from helpers.warehouse import get_warehouse, staged_partitions
+
 
 class DataQualityOperator(BaseOperator):
+    """
+    Runs data quality checks against the warehouse and fails if any of them fail.
+
+    Each check is a dict with either
+        check_sql: a query returning a single value
+    or one of the cheap approximate checks for large tables
+        type: 'approx_distinct', table, column. APPROXIMATE COUNT(DISTINCT column)
+        type: 'null_rate', table, column, sample. share of NULLs in a random sample of rows
+    or a reconciliation of a staging table with the profile sidecars of the files staged into it
+        type: 'profiles', table, source, and the partition_window and countries of the stage.
+            Number of files whose rows loaded, from the warehouse's load log, differ from the
+            rows their profile counted, in one query without scanning the table. Expect 0.
+
+    and either an expected_result or min_result/max_result bounds.
+
+    Checks with numeric expectations are combined into one UNION ALL query. The others run
+    concurrently over up to max_connections connections.
+    """
     ui_color = '#89DA59'
+    # i.e. the partition_window of profile checks
+    template_fields = ('sql_data_checks',)
+
+    approx_sql = {
+        'approx_distinct': "SELECT APPROXIMATE COUNT(DISTINCT {column}) FROM {table}",
+        'null_rate': """SELECT AVG(CASE WHEN {column} IS NULL THEN 1.0 ELSE 0.0 END)
+            FROM {table} WHERE RANDOM() < {sample}""",
+    }
 
     @apply_defaults
     def __init__(self,
@@ -13,6 +43,10 @@ class DataQualityOperator(BaseOperator):
                  # conn_id = your-connection-name
                  redshift_conn_id="",
                  sql_data_checks=[],
+                 batch_checks=True,
+                 max_connections=4,
+                 aws_credentials_id=None,
+                 warehouse=None,
                  *args, **kwargs):
 
         super(DataQualityOperator, self).__init__(*args, **kwargs)
@@ -21,27 +55,136 @@ class DataQualityOperator(BaseOperator):
         # self.conn_id = conn_id
         self.redshift_conn_id = redshift_conn_id
         self.sql_data_checks = sql_data_checks
+        self.batch_checks = batch_checks
+        self.max_connections = max_connections
+        # credentials the profile sidecars are read from S3 with
+        self.aws_credentials_id = aws_credentials_id
+        # backend to check, see helpers.warehouse.get_warehouse. None is Redshift.
+        self.warehouse = warehouse
+
+    @staticmethod
+    def check_sql(check):
+        if 'type' in check:
+            return DataQualityOperator.approx_sql[check['type']].format(
+                table=check['table'],
+                column=check['column'],
+                sample=check.get('sample', 0.01))
+
+        return check.get('check_sql').strip().rstrip(';')
+
+    @staticmethod
+    def is_numeric(check):
+        """
+        Numeric checks return comparable numbers and can share a UNION ALL query.
+        """
+
+        expectations = [check.get(key) for key in ('expected_result', 'min_result', 'max_result')
+                        if check.get(key) is not None]
+
+        return len(expectations) > 0 and \
+            all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in expectations)
+
+    @staticmethod
+    def expectation(check):
+        if check.get('expected_result') is not None:
+            return check['expected_result']
+        return f"[{check.get('min_result')}, {check.get('max_result')}]"
+
+    @staticmethod
+    def passed(check, result):
+        if check.get('expected_result') is not None:
+            expected = check['expected_result']
+            if DataQualityOperator.is_numeric(check):
+                return result is not None and float(result) == float(expected)
+            # booleans come back as True/False, expectations are often written as 'true'
+            return str(result).lower() == str(expected).lower()
+
+        if result is None:
+            return False
+        if check.get('min_result') is not None and float(result) < check['min_result']:
+            return False
+        if check.get('max_result') is not None and float(result) > check['max_result']:
+            return False
+
+        return True
+
+    def run_batch(self, checks):
+        """
+        Runs numeric checks as a single UNION ALL query. Returns (results by index, seconds).
+        """
+
+        sql = "\nUNION ALL\n".join(
+            f"SELECT {idx} AS check_id, CAST(({DataQualityOperator.check_sql(check)}) AS FLOAT8) AS result"
+            for idx, check in checks)
+
+        start = time.perf_counter()
+        records = get_warehouse(self.redshift_conn_id, self.warehouse).get_records(sql)
+        seconds = time.perf_counter() - start
+
+        return {check_id: result for check_id, result in records}, seconds
+
+    def run_single(self, check):
+        """
+        Runs a single check on its own connection. Returns (result, seconds).
+        """
+
+        start = time.perf_counter()
+        records = get_warehouse(self.redshift_conn_id, self.warehouse).get_records(DataQualityOperator.check_sql(check))
+        seconds = time.perf_counter() - start
+
+        return records[0][0] if len(records) > 0 else None, seconds
+
+    def reconciled(self, check):
+        """
+        A profiles check as the check_sql of its reconciliation query, other checks as they are.
+        """
+
+        if check.get('type') != 'profiles':
+            return check
+
+        warehouse = get_warehouse(self.redshift_conn_id, self.warehouse, self.aws_credentials_id)
+        partitions = staged_partitions(check.get('partition_window'), check.get('countries'))
+        reconciled = {key: value for key, value in check.items() if key != 'type'}
+        reconciled['check_sql'] = warehouse.reconcile_sql(check['table'], check['source'], partitions)
+
+        return reconciled
 
     def execute(self, context):
         self.log.info('Data Quality Checking ...')
 
-        redshift_hook = PostgresHook(self.redshift_conn_id)
+        checks = list(enumerate(self.reconciled(check) for check in self.sql_data_checks))
+        results = dict()
+
+        batched = [(idx, check) for idx, check in checks if self.batch_checks and self.is_numeric(check)]
+        single = [(idx, check) for idx, check in checks if not (self.batch_checks and self.is_numeric(check))]
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_connections)) as executor:
+            batch_future = executor.submit(self.run_batch, batched) if len(batched) > 0 else None
+            single_futures = [(idx, executor.submit(self.run_single, check)) for idx, check in single]
+
+            if batch_future is not None:
+                batch_results, seconds = batch_future.result()
+                for idx, _ in batched:
+                    # timing of a batched check is the time of the whole batch
+                    results[idx] = (batch_results.get(idx), seconds)
 
-        for check in self.sql_data_checks:
-            sql = check.get('check_sql')
-            exp_result = check.get('expected_result')
-            error_count = 0
-            failing_tests = list()
+            for idx, future in single_futures:
+                results[idx] = future.result()
 
-            records = redshift_hook.get_records(sql)[0]
+        failing_tests = list()
 
-            if exp_result != records[0]:
-                error_count += 1
-                failing_tests.append(sql)
+        for idx, check in checks:
+            result, seconds = results[idx]
+            ok = self.passed(check, result)
+            self.log.info(f'{"PASS" if ok else "FAIL"} ({seconds:.2f}s) {self.check_sql(check)} -> {result}')
+            if not ok:
+                failing_tests.append(f'{self.check_sql(check)}: got {result}, '
+                                     f'expected {self.expectation(check)} ({seconds:.2f}s)')
 
-        if error_count > 0:
-            self.log.info(f'Data quality check test failures {error_count}')
-            self.log.info(failing_tests)
-            raise ValueError('Data quality check failed')
+        if len(failing_tests) > 0:
+            self.log.info(f'Data quality check test failures {len(failing_tests)}')
+            for failing_test in failing_tests:
+                self.log.info(failing_test)
+            raise ValueError(f'Data quality check failed: {len(failing_tests)} of {len(checks)} checks')
         else:
-            self.log.info('All data quality checks passed')
\ No newline at end of file
+            self.log.info('All data quality checks passed')
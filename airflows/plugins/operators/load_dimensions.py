@@ -1,7 +1,8 @@
-from airflow.hooks.postgres_hook import PostgresHook
 from airflow.models import BaseOperator
 from airflow.utils.decorators import apply_defaults
 
+from helpers.warehouse import get_warehouse
+
 
 class LoadDimensionOperator(BaseOperator):
     ui_color = '#80BD9E'
@@ -13,6 +14,13 @@ class LoadDimensionOperator(BaseOperator):
         );
         COMMIT;"""
 
+    # keeps the table and only inserts what sql_select returns
+    append_sql = """BEGIN;
+        INSERT INTO {} (
+            {}
+        );
+        COMMIT;"""
+
     @apply_defaults
     def __init__(self,
                  # Define your operators params (with defaults) here
@@ -21,6 +29,9 @@ class LoadDimensionOperator(BaseOperator):
                  table_id='',
                  redshift_conn_id='',
                  sql_select='',
+                 create_table_sql=None,
+                 append=False,
+                 warehouse=None,
                  *args, **kwargs):
         super(LoadDimensionOperator, self).__init__(*args, **kwargs)
         # Map params here
@@ -29,11 +40,24 @@ class LoadDimensionOperator(BaseOperator):
         self.table = table_id
         self.redshift_conn_id = redshift_conn_id
         self.sql_select = sql_select
+        self.create_table_sql = create_table_sql
+        self.append = append
+        # backend to load into, see helpers.warehouse.get_warehouse. None is Redshift.
+        self.warehouse = warehouse
 
     def execute(self, context):
         self.log.info(f'Loading table {self.table}')
 
-        redshift_hook = PostgresHook(self.redshift_conn_id)
+        redshift_hook = get_warehouse(self.redshift_conn_id, self.warehouse)
+
+        if self.append:
+            if self.create_table_sql is not None:
+                redshift_hook.run(self.create_table_sql)
+
+            redshift_hook.run(LoadDimensionOperator.append_sql.format(self.table, self.sql_select))
+            self.log.info(f'Table Appended {self.table}')
+            return
+
         sql_stmt = LoadDimensionOperator.sql.format(
             self.table,
             self.table,
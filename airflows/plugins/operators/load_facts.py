@@ -1,10 +1,12 @@
-from airflow.hooks.postgres_hook import PostgresHook
 from airflow.models import BaseOperator
 from airflow.utils.decorators import apply_defaults
 
+from helpers.warehouse import get_warehouse, window_sql
+
 
 class LoadFactOperator(BaseOperator):
     ui_color = '#F98866'
+    template_fields = ('window_start', 'window_end')
 
     sql = """BEGIN;
         INSERT INTO {} (
@@ -12,6 +14,24 @@ class LoadFactOperator(BaseOperator):
         );
         COMMIT;"""
 
+    # replaces the rows of the countries present in the window with the newly selected ones.
+    # window is a condition on the local time column, see helpers.warehouse.window_sql.
+    incremental_sql = """BEGIN;
+        CREATE TEMP TABLE {table}_window AS (
+            SELECT * FROM (
+                {select}
+            ) AS s
+            WHERE {window}
+        );
+        DELETE FROM {table}
+        WHERE {window}
+            AND country_id IN (SELECT DISTINCT country_id FROM {table}_window);
+        INSERT INTO {table} (
+            SELECT * FROM {table}_window
+        );
+        DROP TABLE {table}_window;
+        COMMIT;"""
+
     @apply_defaults
     def __init__(self,
                  # Define your operators params (with defaults) here
@@ -21,6 +41,12 @@ class LoadFactOperator(BaseOperator):
                  create_table_sql=None,
                  redshift_conn_id='',
                  sql_select='',
+                 incremental=False,
+                 time_column='event_date',
+                 window_start="{{ execution_date.strftime('%Y-%m-%d %H:%M:%S') }}",
+                 window_end="{{ next_execution_date.strftime('%Y-%m-%d %H:%M:%S') }}",
+                 countries=None,
+                 warehouse=None,
                  *args, **kwargs):
         super(LoadFactOperator, self).__init__(*args, **kwargs)
         # Map params here
@@ -30,11 +56,36 @@ class LoadFactOperator(BaseOperator):
         self.create_table_sql=create_table_sql
         self.redshift_conn_id = redshift_conn_id
         self.sql_select = sql_select
+        # only replace rows inside [window_start, window_end) instead of appending everything
+        self.incremental = incremental
+        self.time_column = time_column
+        self.window_start = window_start
+        self.window_end = window_end
+        # only replace the window of these countries, so each country loads on its own
+        self.countries = countries
+        # backend to load into, see helpers.warehouse.get_warehouse. None is Redshift.
+        self.warehouse = warehouse
 
     def execute(self, context):
         self.log.info(f'Loading table {self.table}')
 
-        redshift_hook = PostgresHook(self.redshift_conn_id)
+        redshift_hook = get_warehouse(self.redshift_conn_id, self.warehouse)
+
+        if self.incremental:
+            if self.create_table_sql is not None:
+                redshift_hook.run(f"{self.create_table_sql}")
+
+            # the window is in UTC and the time column in the local time of each country
+            self.log.info(f'Replacing {self.table} rows from {self.window_start} to {self.window_end} UTC')
+            sql_stmt = LoadFactOperator.incremental_sql.format(
+                table=self.table,
+                select=self.sql_select,
+                window=window_sql(self.time_column, self.window_start, self.window_end, self.countries)
+            )
+            redshift_hook.run(sql_stmt)
+
+            self.log.info(f'Table Loaded {self.table}')
+            return
 
         if self.create_table_sql is not None:
             redshift_hook.run(f"DROP TABLE IF EXISTS {self.table}")
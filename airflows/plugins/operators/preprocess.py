@@ -0,0 +1,39 @@
+import os
+
+from airflow.models import BaseOperator
+from airflow.utils.decorators import apply_defaults
+
+from helpers.preprocessing import DATA_PATH, SRC_PATH, preprocess_upload
+
+
+class PreprocessOperator(BaseOperator):
+    ui_color = '#EDD6A4'
+
+    @apply_defaults
+    def __init__(self,
+                 dataset='',
+                 country='',
+                 data_path=DATA_PATH,
+                 src_path=SRC_PATH,
+                 options=None,
+                 *args, **kwargs):
+        super(PreprocessOperator, self).__init__(*args, **kwargs)
+
+        # the group of raw files preprocessed: data/raw/<dataset>/<country>/. A FACTS table of
+        # preprocess_upload as dataset builds its rows for the country instead.
+        self.dataset = dataset
+        self.country = country
+        self.data_path = data_path
+        self.src_path = src_path
+        # passed on to preprocess_upload.process_data, i.e. chunksize, output_format and compression
+        self.options = options or {}
+
+    def execute(self, context):
+        self.log.info(f'Preprocessing {self.dataset} {self.country}')
+
+        # raises if any file of the group fails, so the task retries on its own
+        preprocess_upload(self.src_path).process_data(datasets=[self.dataset], countries=[self.country],
+                                                      upload=False, data_path=self.data_path,
+                                                      report_path=os.path.join(self.data_path, 'reports'), **self.options)
+
+        self.log.info(f'Preprocessed {self.dataset} {self.country}')
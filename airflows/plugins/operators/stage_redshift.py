@@ -1,21 +1,12 @@
-from airflow.hooks.postgres_hook import PostgresHook
-from airflow.contrib.hooks.aws_hook import AwsHook
 from airflow.models import BaseOperator
 from airflow.utils.decorators import apply_defaults
 
+from helpers.warehouse import RedshiftWarehouse, get_warehouse, staged_partitions
+
 
 class StageCSVToRedshiftOperator(BaseOperator):
     ui_color = '#358140'
-
-    COPY_SQL = """
-            COPY {}
-            FROM '{}'
-            ACCESS_KEY_ID '{}'
-            SECRET_ACCESS_KEY '{}'
-            FORMAT AS CSV
-            DATEFORMAT 'auto'
-            REGION 'us-west-2'
-            """
+    template_fields = ('manifest', 'partition_window')
 
     @apply_defaults
     def __init__(self,
@@ -28,6 +19,13 @@ class StageCSVToRedshiftOperator(BaseOperator):
                  s3_key="",
                  aws_credentials_id="",
                  create_table_sql=None,
+                 file_format="CSV",
+                 compression="auto",
+                 manifest=None,
+                 slice_only=False,
+                 partition_window=None,
+                 countries=None,
+                 warehouse=None,
                  *args, **kwargs):
         super(StageCSVToRedshiftOperator, self).__init__(*args, **kwargs)
 
@@ -37,30 +35,56 @@ class StageCSVToRedshiftOperator(BaseOperator):
         self.s3_bucket = s3_bucket
         self.s3_key = s3_key
         self.aws_credentials_id = aws_credentials_id
+        self.file_format = file_format.upper()
+        # COPY only the files listed in this manifest instead of everything under s3_bucket
+        self.manifest = manifest
+        # keep the staging table and replace its rows with just the new slice
+        self.slice_only = slice_only
+        # (start, end) ISO timestamps, i.e. ('{{ execution_date }}', '{{ next_execution_date }}').
+        # COPY only the country=XX/year=YYYY/month=MM partitions of the months it overlaps.
+        self.partition_window = partition_window
+        # stage only the country=XX partitions of these countries and replace just their rows,
+        # so tasks of different countries share the table. None stages all countries.
+        self.countries = countries
+        # backend to load into, see helpers.warehouse.get_warehouse. None is Redshift.
+        self.warehouse = warehouse
 
-    def execute(self, context):
-        self.log.info('StageCSVToRedshiftOperator starting...')
-
-        aws_hook = AwsHook(self.aws_credentials_id)
-        credentials = aws_hook.get_credentials()
-        redshift_hook = PostgresHook(self.redshift_conn_id)
+        if self.file_format not in RedshiftWarehouse.FORMAT_SQL:
+            raise ValueError(f'Unsupported file format {file_format}')
 
-        if self.create_table_sql is not None:
-            #drop table
-            redshift_hook.run(f"DROP TABLE IF EXISTS {self.table}")
-            redshift_hook.run(self.create_table_sql)
+        # auto detects it from the staged file extensions, None means uncompressed
+        self.compression = compression.upper() if compression is not None else None
 
-        sql_stmt = StageCSVToRedshiftOperator.COPY_SQL.format(
-            self.table,
-            self.s3_bucket,
-            credentials.access_key,
-            credentials.secret_key,
-        )
-        redshift_hook.run(sql_stmt)
+        if self.compression not in (None, 'AUTO', *RedshiftWarehouse.COMPRESSION_EXTENSIONS.values()):
+            raise ValueError(f'Unsupported compression {compression}')
 
-        self.log.info(f'{self.table} Loaded')
+    def execute(self, context):
+        self.log.info('StageCSVToRedshiftOperator starting...')
 
+        warehouse = get_warehouse(self.redshift_conn_id, self.warehouse, self.aws_credentials_id)
 
+        if self.countries is not None:
+            if self.create_table_sql is not None:
+                warehouse.run(self.create_table_sql)
+            country_list = ', '.join(f"'{country}'" for country in self.countries)
+            warehouse.run(f"DELETE FROM {self.table} WHERE country_id IN ({country_list})")
+        elif self.slice_only:
+            if self.create_table_sql is not None:
+                warehouse.run(self.create_table_sql)
+            warehouse.run(f"TRUNCATE {self.table}")
+        elif self.create_table_sql is not None:
+            #drop table
+            warehouse.run(f"DROP TABLE IF EXISTS {self.table}")
+            warehouse.run(self.create_table_sql)
 
+        partitions = staged_partitions(self.partition_window, self.countries)
+        if partitions is not None:
+            self.log.info(f'Staging partitions {partitions}')
 
+        files = warehouse.copy(self.table, self.s3_bucket, self.file_format, self.compression, self.manifest,
+                               partitions)
+        if files == 0:
+            self.log.info(f'Nothing new to stage into {self.table}')
+            return
 
+        self.log.info(f'{self.table} Loaded')
@@ -0,0 +1,47 @@
+import os
+
+from airflow.models import BaseOperator
+from airflow.utils.decorators import apply_defaults
+
+from helpers.preprocessing import DATA_PATH, SRC_PATH, preprocess_upload
+
+
+class UploadToS3Operator(BaseOperator):
+    ui_color = '#A4C8ED'
+
+    @apply_defaults
+    def __init__(self,
+                 dataset='',
+                 country=None,
+                 s3_bucket='energy-etl-processed',
+                 aws_credentials_id='',
+                 data_path=DATA_PATH,
+                 src_path=SRC_PATH,
+                 *args, **kwargs):
+        super(UploadToS3Operator, self).__init__(*args, **kwargs)
+
+        self.dataset = dataset
+        # upload only the country=XX partitions of this country. None uploads the whole dataset.
+        self.country = country
+        self.s3_bucket = s3_bucket
+        self.aws_credentials_id = aws_credentials_id
+        self.data_path = data_path
+        self.src_path = src_path
+
+    def execute(self, context):
+        from airflow.contrib.hooks.aws_hook import AwsHook
+
+        prefix = self.dataset if self.country is None else f'{self.dataset}/country={self.country}'
+        self.log.info(f'Uploading {prefix} to {self.s3_bucket}')
+
+        module = preprocess_upload(self.src_path)
+
+        credentials = AwsHook(self.aws_credentials_id).get_credentials()
+        client = module.s3_client(credentials={'aws_access_key_id': credentials.access_key,
+                                               'aws_secret_access_key': credentials.secret_key})
+
+        # with the profile sidecars of the files, see preprocess_upload.PROFILES
+        module.upload_data(os.path.join(self.data_path, 'processed'), self.s3_bucket, client=client,
+                           prefixes=[prefix, f'{module.PROFILES}/{prefix}'])
+
+        self.log.info(f'Uploaded {prefix}')
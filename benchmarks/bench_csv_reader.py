@@ -0,0 +1,132 @@
+"""
+Benchmarks the raw csv readers: the multithreaded pyarrow reader against pd.read_csv.
+
+Generates synthetic exports and joins the years of each country into one multi-year file,
+like a portal download spanning several years. Each file is then read through its dataset
+schema with both readers, timing the read alone (read_export) and process_*_file end to end,
+and checking both readers produce the same frames.
+
+Usage:
+    python3 benchmarks/bench_csv_reader.py --countries BE DE --years 2016 2017 2018 2019 --freq 15min
+"""
+import argparse
+import contextlib
+import glob
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import preprocess_upload
+from synthetic_entsoe import generate
+
+# time series datasets and the function processing one of their files
+DATASETS = {
+    'total_generation': preprocess_upload.process_total_generation_file,
+    'total_demand': preprocess_upload.process_total_demand_file,
+    'day_ahead_prices': preprocess_upload.process_day_ahead_prices_file,
+}
+
+
+def join_years(raw_path, dataset, first, last):
+    """
+    Concatenates the yearly exports of each country of a dataset into one file per country.
+    Returns the list of joined files.
+    """
+
+    joined = list()
+
+    for path in sorted(glob.glob(os.path.join(raw_path, dataset, '*'))):
+        files = sorted(glob.glob(os.path.join(path, '*.csv')))
+        output_file = os.path.join(path, f'{dataset}_{first}01010000-{last + 1}01010000.csv')
+
+        with open(output_file, 'w') as out:
+            for i, file in enumerate(files):
+                with open(file) as f:
+                    header = f.readline()
+                    if i == 0:
+                        out.write(header)
+                    shutil.copyfileobj(f, out)
+                os.remove(file)
+
+        joined.append(output_file)
+
+    return joined
+
+
+def read_all(files, dataset, reader):
+    """
+    Reads files through the dataset schema. Returns (seconds, frames).
+    """
+
+    frames = list()
+    start = time.perf_counter()
+    for path_in_str in files:
+        dfs, _ = preprocess_upload.read_export(path_in_str, dataset, path_in_str.split(os.sep)[-2], reader=reader)
+        frames.extend(dfs)
+
+    return time.perf_counter() - start, frames
+
+
+def process_all(files, dataset, reader, output_path):
+    """
+    Processes files end to end. Returns the seconds taken.
+    """
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for path_in_str in files:
+            DATASETS[dataset](path_in_str, path_in_str.split(os.sep)[-2], output_path, reader=reader)
+
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--countries', nargs='+', default=['BE', 'DE'])
+    parser.add_argument('--years', nargs='+', type=int, default=[2016, 2017, 2018, 2019])
+    parser.add_argument('--freq', default='15min')
+    parser.add_argument('--datasets', nargs='+', choices=list(DATASETS.keys()), default=list(DATASETS.keys()))
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='entsoe-bench-reader-')
+    try:
+        raw_path = os.path.join(workdir, 'raw')
+        generate(raw_path, args.countries, args.years, args.freq)
+
+        print(f'{len(args.countries)} countries, {len(args.years)} years per file at {args.freq}, '
+              f'{os.cpu_count()} cpus')
+        print(f'{"dataset":<20}{"MB":>8}{"pandas read s":>15}{"arrow read s":>14}{"ratio":>8}'
+              f'{"pandas total s":>16}{"arrow total s":>15}{"ratio":>8}')
+
+        for dataset in args.datasets:
+            files = join_years(raw_path, dataset, min(args.years), max(args.years))
+            nbytes = sum(os.path.getsize(file) for file in files)
+
+            seconds, frames = dict(), dict()
+            for reader in preprocess_upload.RAW_READERS:
+                seconds[reader], frames[reader] = read_all(files, dataset, reader)
+            for pandas_frame, arrow_frame in zip(frames['pandas'], frames['arrow']):
+                pd.testing.assert_frame_equal(pandas_frame, arrow_frame, check_dtype=False,
+                                              check_categorical=False)
+            del frames
+
+            totals = {reader: process_all(files, dataset, reader, os.path.join(workdir, 'processed', reader))
+                      for reader in preprocess_upload.RAW_READERS}
+
+            print(f'{dataset:<20}{nbytes / 1e6:>8.1f}{seconds["pandas"]:>15.2f}{seconds["arrow"]:>14.2f}'
+                  f'{seconds["pandas"] / seconds["arrow"]:>7.1f}x{totals["pandas"]:>16.2f}{totals["arrow"]:>15.2f}'
+                  f'{totals["pandas"] / totals["arrow"]:>7.1f}x')
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+
+    main()
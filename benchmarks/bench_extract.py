@@ -0,0 +1,90 @@
+"""
+Benchmarks the ENTSO-E extraction against the local mock API: serial against concurrent.
+
+Starts benchmarks/mock_entsoe_api.py in its own process with a fixed latency per request
+and a share of failing requests, then extracts every dataset for the given areas and years
+once with one request in flight and one parsing process, and once with --concurrency
+requests and --parse-workers processes, each without a response cache. A third run repeats
+the concurrent one from the response cache. The concurrent output is then preprocessed with
+process_data to check it is read like portal downloads.
+
+Usage:
+    python3 benchmarks/bench_extract.py --areas BE NL DE_LU FR --years 2019 2020 --latency 1.0
+"""
+import argparse
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import extract
+import preprocess_upload
+from mock_entsoe_api import serve_process
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def timed_extract(url, areas, years, output, cache_dir=None, concurrency=1, parse_workers=1):
+    start = time.perf_counter()
+    extract.extract(areas, years, output=output, api_url=url, cache_dir=cache_dir, concurrency=concurrency,
+                    parse_workers=parse_workers, rate=6000, retries=10, backoff=0.1)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--areas', nargs='+', default=['BE', 'NL', 'DE_LU', 'FR'])
+    parser.add_argument('--years', nargs='+', type=int, default=[2019])
+    parser.add_argument('--latency', type=float, default=1.0, help='seconds the mock waits per request')
+    parser.add_argument('--error-rate', type=float, default=0.05, help='share of requests failing with 503')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--parse-workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    process, url = serve_process(free_port(), args.latency, args.error_rate)
+    workdir = tempfile.mkdtemp(prefix='entsoe-bench-extract-')
+
+    try:
+        # the mock builds every document once, keep that out of the timings
+        timed_extract(url, args.areas, args.years, os.path.join(workdir, 'warmup'),
+                      concurrency=args.concurrency)
+
+        serial = timed_extract(url, args.areas, args.years, os.path.join(workdir, 'serial'))
+
+        output = os.path.join(workdir, 'data', 'raw')
+        cache_dir = os.path.join(workdir, 'cache')
+        concurrent = timed_extract(url, args.areas, args.years, output, cache_dir,
+                                   args.concurrency, args.parse_workers)
+        shutil.rmtree(output)
+        cached = timed_extract(url, args.areas, args.years, output, cache_dir,
+                               args.concurrency, args.parse_workers)
+
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            preprocess_upload.process_data(full_refresh=True, upload=False)
+        finally:
+            os.chdir(cwd)
+    finally:
+        process.terminate()
+        shutil.rmtree(workdir)
+
+    print(f'\n{len(args.areas)} areas x {len(args.years)} years, {args.latency}s latency, '
+          f'{args.error_rate:.0%} failing requests')
+    print(f'serial:       {serial:8.2f}s')
+    print(f'concurrent:   {concurrent:8.2f}s  {serial / concurrent:6.1f}x '
+          f'({args.concurrency} requests in flight, {args.parse_workers} parse workers)')
+    print(f'from cache:   {cached:8.2f}s')
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmarks the total generation unpivot: the legacy object melt against clean_total_generation.
+
+Generates multi-country synthetic generation exports, then reads and unpivots each one with
+both implementations, reporting read + clean time, peak traced memory of read + unpivot and
+the deep memory of the resulting long frame. The legacy clean reads the whole file untyped,
+the current one only the declared columns straight to float32 (see schemas.SCHEMAS).
+
+Usage:
+    python3 benchmarks/bench_generation_melt.py --countries AT BE DE FR NL --years 2019 --freq 15min
+"""
+import argparse
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from preprocess_upload import clean_total_generation, parse_mtu, read_export
+from synthetic_entsoe import generate
+
+
+def legacy_clean(path_in_str, country):
+    """
+    The untyped read and object dtype melt clean_total_generation used before.
+    """
+    df = pd.read_csv(path_in_str)
+    df['country_id'] = country
+    df.columns = [x[0].strip().lower() for x in df.columns.str.split("-")]
+    times = parse_mtu(df.pop('mtu'))
+    df.insert(0, 'event_date', times['event_date'])
+    df.insert(1, 'ts', times['ts'])
+
+    df = df.melt(id_vars=['event_date', 'ts', 'country_id', 'area'],
+                 var_name='generation_type',
+                 value_name='generation_load')
+    df['generation_load'] = df['generation_load'].replace('n/e', 0).astype('float').fillna(0)
+    return df
+
+
+def compact_clean(path_in_str, country):
+    """
+    Reads through the generation schema and unpivots with clean_total_generation.
+    """
+    frames, tz = read_export(path_in_str, 'total_generation', country)
+    return clean_total_generation(next(frames), country, tz)
+
+
+def run(files, clean):
+    """
+    Returns (seconds reading and cleaning, peak traced bytes, bytes of the largest long frame, rows).
+
+    Each file is cleaned twice, once timed and once under tracemalloc, which slows it down.
+    """
+
+    seconds, peak, frame_bytes, rows = 0.0, 0, 0, 0
+
+    for path_in_str in files:
+        country = path_in_str.split(os.sep)[-2]
+
+        start = time.perf_counter()
+        df = clean(path_in_str, country)
+        seconds += time.perf_counter() - start
+        frame_bytes = max(frame_bytes, int(df.memory_usage(deep=True).sum()))
+        rows += len(df)
+        del df
+
+        tracemalloc.start()
+        clean(path_in_str, country)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return seconds, peak, frame_bytes, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--countries', nargs='+', default=['AT', 'BE', 'DE', 'FR', 'NL'])
+    parser.add_argument('--years', nargs='+', type=int, default=[2019])
+    parser.add_argument('--freq', default='15min')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='entsoe-bench-melt-')
+    try:
+        generate(workdir, args.countries, args.years, args.freq)
+        files = sorted(glob.glob(os.path.join(workdir, 'total_generation', '*', '*.csv')))
+
+        legacy = run(files, legacy_clean)
+        compact = run(files, compact_clean)
+    finally:
+        shutil.rmtree(workdir)
+
+    print(f'{len(files)} files, {compact[3]:,} long rows ({len(args.countries)} countries at {args.freq})')
+    print(f'{"":<10}{"read+clean s":>14}{"peak MB":>10}{"frame MB":>10}')
+    for name, (seconds, peak, frame_bytes, _) in [('legacy', legacy), ('compact', compact)]:
+        print(f'{name:<10}{seconds:>14.2f}{peak / 1e6:>10.1f}{frame_bytes / 1e6:>10.1f}')
+    print(f'{"ratio":<10}{legacy[0] / compact[0]:>13.1f}x{legacy[1] / compact[1]:>9.1f}x'
+          f'{legacy[2] / compact[2]:>9.1f}x')
+
+
+if __name__ == '__main__':
+
+    main()
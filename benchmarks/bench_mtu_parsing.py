@@ -0,0 +1,100 @@
+"""
+Benchmarks MTU timestamp parsing: the legacy per-row apply against parse_mtu.
+
+Builds a synthetic multi-year ENTSO-E MTU column (including both DST transitions)
+and reports rows/sec for each path, plus the localization step alone: timezones.localize
+against pandas tz_localize with ambiguous='infer'.
+
+Usage:
+    python3 benchmarks/bench_mtu_parsing.py --years 3 --freq 15min
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from preprocess_upload import parse_mtu
+from timezones import localize
+
+
+def make_mtu(years, freq, tz='Europe/Brussels'):
+    """
+    Builds MTU interval strings the way the ENTSO-E transparency portal exports them.
+    """
+    starts = pd.date_range('2015-01-01', f'{2015 + years}-01-01', freq=freq, tz=tz)[:-1]
+    ends = starts + pd.Timedelta(freq)
+    mtu = starts.strftime('%d.%m.%Y %H:%M') + ' - ' + ends.strftime('%d.%m.%Y %H:%M') + ' (CET)'
+    return pd.Series(mtu)
+
+
+def legacy_parse(mtu):
+    """
+    The per-row parsing previously inlined in every process_* function.
+    dayfirst is set so the result is comparable.
+    """
+    df = pd.DataFrame({'mtu': mtu})
+    df['event_date'] = df['mtu'].apply(lambda x: pd.to_datetime(x.split("-")[0], dayfirst=True))
+    df = df.set_index('event_date')
+    df.index = df.index.tz_localize(tz='Europe/Brussels',
+                                    ambiguous='infer',
+                                    nonexistent='shift_backward')
+    df['ts'] = df.index.asi8
+    df.index = df.index.strftime("%Y%m%d %H%M%S")
+    return df
+
+
+def infer_localize(wall, tz):
+    """
+    The tz_localize call parse_mtu used before timezones.localize.
+    """
+    index = pd.DatetimeIndex(wall).tz_localize(tz=tz, ambiguous='infer', nonexistent='shift_backward')
+    return index.tz_convert('UTC').tz_localize(None).values.astype('datetime64[ns]').astype('int64')
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--freq', default='15min')
+    parser.add_argument('--skip-legacy', action='store_true')
+    args = parser.parse_args()
+
+    mtu = make_mtu(args.years, args.freq)
+    rows = len(mtu)
+    print(f'{rows} rows ({args.years} years at {args.freq})')
+
+    new, new_secs = timed(parse_mtu, mtu)
+    print(f'parse_mtu:    {new_secs:8.3f}s  {rows / new_secs:12,.0f} rows/sec')
+
+    if not args.skip_legacy:
+        old, old_secs = timed(legacy_parse, mtu)
+        print(f'legacy apply: {old_secs:8.3f}s  {rows / old_secs:12,.0f} rows/sec')
+        print(f'speedup:      {old_secs / new_secs:8.1f}x')
+
+        assert (old.index.values == new['event_date'].values).all(), 'event_date mismatch'
+
+    wall = new['interval_start'].dt.tz_localize(None).to_numpy(dtype='datetime64[ns]')
+    # warm the transition cache, it is built once per timezone and range of years
+    localize(wall, 'Europe/Brussels')
+    (ts, _), localize_secs = timed(localize, wall, 'Europe/Brussels')
+    inferred, infer_secs = timed(infer_localize, wall, 'Europe/Brussels')
+    print(f'localize:     {localize_secs:8.3f}s  {rows / localize_secs:12,.0f} rows/sec')
+    print(f'infer:        {infer_secs:8.3f}s  {rows / infer_secs:12,.0f} rows/sec')
+    print(f'speedup:      {infer_secs / localize_secs:8.1f}x')
+
+    assert np.array_equal(ts, inferred), 'ts mismatch'
+
+
+if __name__ == '__main__':
+
+    main()
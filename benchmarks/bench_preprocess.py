@@ -0,0 +1,161 @@
+"""
+Benchmarks the preprocessing steps on synthetic ENTSO-E data at several scales.
+
+For every scale a raw data tree is generated with synthetic_entsoe, then traverse_path, each
+process_* function and process_data end to end (without the S3 upload) are timed. With
+--memory each step runs a second time under tracemalloc to report its peak allocation.
+
+Usage:
+    python3 benchmarks/bench_preprocess.py --scales small medium --memory --json results.json
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import preprocess_upload
+from synthetic_entsoe import generate
+
+# (countries, years, resolution) of each scale
+SCALES = {
+    'small': (['BE', 'NL'], [2019], '60min'),
+    'medium': (['BE', 'DE', 'FR', 'NL'], [2019, 2020], '15min'),
+    'large': (['AT', 'BE', 'CH', 'DE', 'ES', 'FR', 'IT', 'NL', 'PL', 'PT'], [2018, 2019, 2020], '15min'),
+}
+
+
+def measure(func, memory=False):
+    """
+    Times a call and optionally repeats it under tracemalloc.
+
+    Returns a tuple of (seconds, peak bytes or None).
+    """
+
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return seconds, peak
+
+
+def steps(raw_path, output_path, reader=preprocess_upload.RAW_READER, resolution=None):
+    """
+    The benchmarked steps as (name, dataset, callable) tuples, reading the raw files with reader
+    and resampling to resolution minutes.
+    """
+
+    def country_paths(dataset):
+        return preprocess_upload.traverse_path(os.path.join(raw_path, dataset), -2)
+
+    def output(dataset):
+        path = os.path.join(output_path, dataset)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    capacity_kwargs = preprocess_upload.DATASETS['installed_capacity'][1]
+    options = {'reader': reader, 'resolution': resolution}
+
+    return [
+        ('traverse_path', None, lambda: preprocess_upload.traverse_path(raw_path, -2)),
+        ('process_total_demand', 'total_demand',
+         lambda: preprocess_upload.process_total_demand(country_paths('total_demand'), output('total_demand'),
+                                                        **options)),
+        ('process_capacity_demand', 'installed_capacity',
+         lambda: preprocess_upload.process_capacity_demand(country_paths('installed_capacity'),
+                                                           output('installed_capacity'), **capacity_kwargs, **options)),
+        ('process_total_generation', 'total_generation',
+         lambda: preprocess_upload.process_total_generation(country_paths('total_generation'),
+                                                            output('total_generation'), **options)),
+        ('process_day_ahead_prices', 'day_ahead_prices',
+         lambda: preprocess_upload.process_day_ahead_prices(country_paths('day_ahead_prices'),
+                                                            output('day_ahead_prices'), **options)),
+        ('process_data', None,
+         lambda: preprocess_upload.process_data(full_refresh=True, upload=False, **options)),
+    ]
+
+
+def run_scale(scale, workdir, memory=False, reader=preprocess_upload.RAW_READER, resolution=None):
+    countries, years, freq = SCALES[scale]
+    raw_path = os.path.join(workdir, 'data', 'raw')
+    output_path = os.path.join(workdir, 'bench')
+
+    files = generate(raw_path, countries, years, freq)
+    raw_bytes = sum(os.path.getsize(path) for path in files)
+    print(f'\n{scale}: {len(countries)} countries, {len(years)} years at {freq}, '
+          f'{len(files)} files, {raw_bytes / 1e6:.1f} MB raw')
+
+    results = list()
+    cwd = os.getcwd()
+    # process_data works on ./data
+    os.chdir(workdir)
+
+    try:
+        for name, dataset, func in steps(raw_path, output_path, reader, resolution):
+            seconds, peak = measure(func, memory)
+            if dataset is None:
+                size = raw_bytes if name == 'process_data' else 0
+            else:
+                size = sum(os.path.getsize(path) for path in files if f'{os.sep}{dataset}{os.sep}' in path)
+            results.append({'scale': scale, 'step': name, 'seconds': seconds, 'peak_bytes': peak,
+                            'raw_bytes': size})
+    finally:
+        os.chdir(cwd)
+
+    return results
+
+
+def report(results):
+    print(f'{"step":<28}{"seconds":>10}{"MB/sec":>10}{"peak MB":>10}')
+    for result in results:
+        throughput = result['raw_bytes'] / 1e6 / result['seconds'] if result['raw_bytes'] else float('nan')
+        peak = result['peak_bytes'] / 1e6 if result['peak_bytes'] is not None else float('nan')
+        print(f'{result["step"]:<28}{result["seconds"]:>10.3f}{throughput:>10.1f}{peak:>10.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES.keys()), default=['small', 'medium'])
+    parser.add_argument('--memory', action='store_true', help='also measure peak memory with tracemalloc')
+    parser.add_argument('--json', default=None, help='write the results to this file')
+    parser.add_argument('--keep', action='store_true', help='keep the generated data')
+    parser.add_argument('--reader', choices=preprocess_upload.RAW_READERS, default=preprocess_upload.RAW_READER,
+                        help='csv parser of the raw files')
+    parser.add_argument('--resolution', type=int, choices=preprocess_upload.RESOLUTIONS, default=None,
+                        help='resample every time series to this many minutes')
+    args = parser.parse_args()
+
+    results = list()
+
+    for scale in args.scales:
+        workdir = tempfile.mkdtemp(prefix=f'entsoe-bench-{scale}-')
+        try:
+            scale_results = run_scale(scale, workdir, args.memory, args.reader, args.resolution)
+        finally:
+            if args.keep:
+                print(f'Data kept in {workdir}')
+            else:
+                shutil.rmtree(workdir)
+        report(scale_results)
+        results.extend(scale_results)
+
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,242 @@
+"""
+Local stand-in for the ENTSO-E transparency API, to run src/extract.py against.
+
+Answers the documents extract.queries asks for (A44 prices, A65 load, A75 generation per
+type and A71 installed capacity per unit) with synthetic XML for any period and domain, and
+anything else with a "no matching data" acknowledgement. A fixed latency, a share of 503
+errors, a per second request limit answered with 429 and scripted failures can be simulated
+to exercise the client's concurrency, retries and rate limiting.
+
+Usage:
+    python3 benchmarks/mock_entsoe_api.py --port 8765 --latency 0.2 --error-rate 0.05
+"""
+import argparse
+import hashlib
+import multiprocessing
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+NAMESPACE = 'urn:iec62325.351:tc57wg16:451-6:generationloaddocument:3:0'
+
+# generation types of the synthetic areas, B10 pumped storage also reports consumption
+PSR_TYPES = ['B01', 'B04', 'B05', 'B10', 'B11', 'B14', 'B16', 'B17', 'B19']
+
+ACKNOWLEDGEMENT = b'''<?xml version="1.0" encoding="UTF-8"?>
+<Acknowledgement_MarketDocument xmlns="urn:iec62325.351:tc57wg16:451-1:acknowledgementdocument:7:0">
+    <Reason><code>999</code><text>No matching data found</text></Reason>
+</Acknowledgement_MarketDocument>'''
+
+
+def _rng(*parts):
+    return np.random.default_rng(int(hashlib.sha256('|'.join(parts).encode()).hexdigest()[:8], 16))
+
+
+def _period(start, end, resolution, values, value_tag='quantity'):
+    points = ''.join(f'<Point><position>{i + 1}</position><{value_tag}>{value}</{value_tag}></Point>'
+                     for i, value in enumerate(values))
+    return (f'<Period><timeInterval><start>{start:%Y-%m-%dT%H:%MZ}</start><end>{end:%Y-%m-%dT%H:%MZ}</end>'
+            f'</timeInterval><resolution>{resolution}</resolution>{points}</Period>')
+
+
+def _profile(starts, base, rng):
+    hours = starts.hour.values + starts.minute.values / 60
+    return np.round(base * (1 + 0.3 * np.sin((hours - 6) / 24 * 2 * np.pi)) *
+                    (1 + 0.05 * rng.standard_normal(len(starts))))
+
+
+def document(params):
+    """
+    Synthetic XML answering the query params, a dict of single values.
+    """
+
+    return _document(tuple(sorted((key, value) for key, value in params.items() if key != 'securityToken')))
+
+
+@lru_cache(maxsize=256)
+def _document(items):
+    params = dict(items)
+
+    start = pd.Timestamp(params['periodStart'], tz='UTC')
+    end = pd.Timestamp(params['periodEnd'], tz='UTC')
+    document_type = params['documentType']
+    domain = params.get('in_Domain', params.get('outBiddingZone_Domain', ''))
+    rng = _rng(domain, document_type, params.get('processType', ''), params['periodStart'])
+    series = list()
+
+    if document_type == 'A44':
+        # prices come as one series per day
+        for day in pd.date_range(start, end, freq='1D')[:-1]:
+            starts = pd.date_range(day, periods=24, freq='60min')
+            series.append(f'<TimeSeries><curveType>A01</curveType>'
+                          f'{_period(day, day + pd.Timedelta(days=1), "PT60M", _profile(starts, 45, rng), "price.amount")}'
+                          f'</TimeSeries>')
+
+    elif document_type == 'A65':
+        starts = pd.date_range(start, end, freq='15min')[:-1]
+        series.append(f'<TimeSeries><outBiddingZone_Domain.mRID>{domain}</outBiddingZone_Domain.mRID>'
+                      f'<curveType>A01</curveType>{_period(start, end, "PT15M", _profile(starts, 10000, rng))}'
+                      f'</TimeSeries>')
+
+    elif document_type == 'A75':
+        starts = pd.date_range(start, end, freq='15min')[:-1]
+        for psr_type in PSR_TYPES:
+            values = _profile(starts, rng.uniform(10, 3000), rng)
+            series.append(f'<TimeSeries><inBiddingZone_Domain.mRID>{domain}</inBiddingZone_Domain.mRID>'
+                          f'<curveType>A01</curveType><MktPSRType><psrType>{psr_type}</psrType></MktPSRType>'
+                          f'{_period(start, end, "PT15M", values)}</TimeSeries>')
+        series.append(f'<TimeSeries><outBiddingZone_Domain.mRID>{domain}</outBiddingZone_Domain.mRID>'
+                      f'<curveType>A01</curveType><MktPSRType><psrType>B10</psrType></MktPSRType>'
+                      f'{_period(start, end, "PT15M", _profile(starts, 200, rng))}</TimeSeries>')
+
+    elif document_type == 'A71':
+        for unit in range(20):
+            series.append(f'<TimeSeries><registeredResource.mRID>{unit:02d}W-MOCK-{unit:04d}</registeredResource.mRID>'
+                          f'<registeredResource.name>Mock plant {unit}</registeredResource.name>'
+                          f'<MktPSRType><psrType>{PSR_TYPES[unit % len(PSR_TYPES)]}</psrType>'
+                          f'<voltage_PowerSystemResources.highVoltageLimit>380</voltage_PowerSystemResources.highVoltageLimit>'
+                          f'</MktPSRType><curveType>A01</curveType>'
+                          f'{_period(start, end, "P1Y", [int(rng.uniform(50, 1500))])}</TimeSeries>')
+
+    else:
+        return ACKNOWLEDGEMENT
+
+    return (f'<?xml version="1.0" encoding="UTF-8"?><GL_MarketDocument xmlns="{NAMESPACE}">'
+            f'{"".join(series)}</GL_MarketDocument>').encode()
+
+
+class MockHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        server = self.server
+
+        with server.lock:
+            server.requests += 1
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            server.started.append(time.monotonic())
+        try:
+            self.answer(server)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def answer(self, server):
+        time.sleep(server.latency)
+
+        with server.lock:
+            now = time.monotonic()
+            server.window = [t for t in server.window if now - t < 1.0] + [now]
+            throttled = server.max_per_second is not None and len(server.window) > server.max_per_second
+            failed = server.rng.random() < server.error_rate
+            scripted = server.script.pop(0) if server.script else None
+
+        if scripted is not None:
+            status = scripted
+        elif throttled:
+            status = 429
+        elif failed:
+            status = 503
+        else:
+            params = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+            body = document(params)
+            # like the API, "no matching data" is a 400 acknowledgement
+            return self.reply(400 if body == ACKNOWLEDGEMENT else 200, body)
+
+        if status == 429:
+            server.throttled += 1
+            return self.reply(429, b'Too many requests', {'Retry-After': server.retry_after})
+        server.failed += 1
+        self.reply(status, b'Service unavailable' if status == 503 else b'Error')
+
+    def reply(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/xml')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port=0, latency=0.0, error_rate=0.0, max_per_second=None, seed=0):
+    """
+    Starts the mock API on a background thread.
+
+    Returns the server, with its url and request, failed and throttled counters as attributes.
+    Stop it with server.shutdown().
+
+    Failures can be scripted by appending statuses to server.script, i.e. [503, 429], which
+    answer the next requests in order. Throttled requests are told to come back after
+    server.retry_after seconds. server.started holds the start time of every request and
+    server.max_active the most requests handled at once.
+    """
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), MockHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.error_rate = error_rate
+    server.max_per_second = max_per_second
+    server.rng = np.random.default_rng(seed)
+    server.lock = threading.Lock()
+    server.window = list()
+    server.requests = server.failed = server.throttled = 0
+    server.script = list()
+    server.retry_after = '1'
+    server.started = list()
+    server.active = server.max_active = 0
+    server.url = f'http://127.0.0.1:{server.server_address[1]}/api'
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
+
+def _serve_forever(port, latency, error_rate, max_per_second):
+    serve(port, latency, error_rate, max_per_second)
+    while True:
+        time.sleep(60)
+
+
+def serve_process(port, latency=0.0, error_rate=0.0, max_per_second=None):
+    """
+    Starts the mock API in its own process, so building documents doesn't take the GIL from
+    the client under test. Returns the process and the url; stop it with process.terminate().
+    """
+
+    process = multiprocessing.Process(target=_serve_forever, args=(port, latency, error_rate, max_per_second),
+                                      daemon=True)
+    process.start()
+    time.sleep(1.0)
+
+    return process, f'http://127.0.0.1:{port}/api'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds before each answer')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with 503')
+    parser.add_argument('--max-per-second', type=int, default=None, help='answer requests above this with 429')
+    args = parser.parse_args()
+
+    server = serve(args.port, args.latency, args.error_rate, args.max_per_second)
+    print(f'Serving {server.url}, stop with Ctrl-C')
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,212 @@
+"""
+Writes synthetic raw ENTSO-E transparency exports for all four datasets.
+
+Files follow the layout traverse_path expects, data/raw/<dataset>/<country>/<export name>.csv,
+with one export per country and year like the portal downloads. The time series include the
+ENTSO-E quirks the preprocessing has to handle: 'n/e' columns, blank rows for the skipped
+spring DST hour, the repeated autumn hour and optionally price strings with units.
+
+Usage:
+    python3 benchmarks/synthetic_entsoe.py --output /tmp/entsoe --countries BE DE --years 2019 2020 --freq 15min
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+COUNTRY_NAMES = {
+    'AT': 'Austria', 'BE': 'Belgium', 'CH': 'Switzerland', 'DE': 'Germany', 'ES': 'Spain',
+    'FR': 'France', 'IT': 'Italy', 'NL': 'Netherlands', 'PL': 'Poland', 'PT': 'Portugal',
+}
+
+GENERATION_TYPES = [
+    'Biomass', 'Fossil Brown coal/Lignite', 'Fossil Coal-derived gas', 'Fossil Gas',
+    'Fossil Hard coal', 'Fossil Oil', 'Fossil Oil shale', 'Fossil Peat', 'Geothermal',
+    'Hydro Pumped Storage', 'Hydro Run-of-river and poundage', 'Hydro Water Reservoir',
+    'Marine', 'Nuclear', 'Other', 'Other renewable', 'Solar', 'Waste', 'Wind Offshore',
+    'Wind Onshore',
+]
+
+CAPACITY_COLUMNS = [
+    'Area/Year', 'Production Type', 'Code', 'Name', 'Installed Capacity Year Start [MW]',
+    'Current Installed Capacity [MW]', 'Location', 'Voltage Connection Level [kV]',
+    'Commissioning Date', 'Decommissioning Date',
+]
+
+EXPORT_NAMES = {
+    'total_generation': 'Actual Generation per Production Type',
+    'day_ahead_prices': 'Day-ahead Prices',
+    'total_demand': 'Total Load - Day Ahead _ Actual',
+    'installed_capacity': 'Installed Capacity Per Production Unit',
+}
+
+
+def local_periods(year, freq, tz='Europe/Brussels'):
+    """
+    Local wall clock interval starts of a year the way ENTSO-E lists them.
+
+    The skipped spring hour is kept (ENTSO-E exports it as a blank row) and the repeated
+    autumn hour is listed twice.
+
+    Returns a tuple of (naive interval starts, mask of rows without data).
+    """
+
+    utc = pd.date_range(pd.Timestamp(f'{year}-01-01', tz=tz), pd.Timestamp(f'{year + 1}-01-01', tz=tz),
+                        freq=freq)[:-1]
+    wall = utc.tz_localize(None)
+
+    naive = pd.date_range(f'{year}-01-01', f'{year + 1}-01-01', freq=freq)[:-1]
+    skipped = naive[~naive.isin(wall)]
+
+    # skipped periods go right before the first period after the switch
+    shifted = skipped.tz_localize(tz, nonexistent='shift_forward')
+    keys = np.concatenate([shifted.tz_convert(None).values.astype('datetime64[ns]'),
+                           utc.tz_convert(None).values.astype('datetime64[ns]')])
+    order = np.argsort(keys, kind='stable')
+
+    starts = skipped.append(wall)[order]
+    missing = np.arange(len(starts))[order] < len(skipped)
+
+    return starts, missing
+
+
+def mtu_strings(starts, freq, suffix=''):
+    ends = starts + pd.Timedelta(freq)
+    return starts.strftime('%d.%m.%Y %H:%M') + ' - ' + ends.strftime('%d.%m.%Y %H:%M') + suffix
+
+
+def daily_profile(starts, base, amplitude, rng, noise=0.05):
+    hours = starts.hour.values + starts.minute.values / 60
+    shape = 1 + amplitude * np.sin((hours - 6) / 24 * 2 * np.pi)
+    return base * shape * (1 + noise * rng.standard_normal(len(starts)))
+
+
+def generation_frame(country, year, freq, rng, ne_share=0.3):
+    starts, missing = local_periods(year, freq)
+    df = pd.DataFrame({'Area': f'{COUNTRY_NAMES.get(country, country)} ({country})',
+                       'MTU': mtu_strings(starts, freq, ' (CET)')})
+
+    for generation_type in GENERATION_TYPES:
+        column = f'{generation_type}  - Actual Aggregated [MW]'
+        if rng.random() < ne_share:
+            # type not produced in this area
+            df[column] = 'n/e'
+            continue
+        values = np.round(np.abs(daily_profile(starts, rng.uniform(10, 3000), rng.uniform(0, 0.5), rng))).astype(int)
+        values = pd.Series(values.astype(str), dtype=object)
+        # occasional gaps in reporting
+        values[rng.random(len(values)) < 0.001] = ''
+        values[missing] = ''
+        df[column] = values.values
+
+    consumption = 'Hydro Pumped Storage  - Actual Consumption [MW]'
+    df.insert(df.columns.get_loc('Hydro Pumped Storage  - Actual Aggregated [MW]') + 1, consumption,
+              np.where(missing, '', np.round(rng.uniform(0, 400, len(df))).astype(int).astype(str)))
+
+    return df
+
+
+def prices_frame(country, year, freq, rng, price_units=False):
+    starts, missing = local_periods(year, '60min' if freq == '15min' else freq)
+    prices = np.round(daily_profile(starts, 45, 0.3, rng, noise=0.2), 2)
+
+    if price_units:
+        values = pd.Series([f'{price:.2f} EUR' for price in prices], dtype=object)
+    else:
+        values = pd.Series([f'{price:.2f}' for price in prices], dtype=object)
+    values[missing] = ''
+
+    return pd.DataFrame({'MTU (CET)': mtu_strings(starts, '60min' if freq == '15min' else freq),
+                         'Day-ahead Price [EUR/MWh]': values.values})
+
+
+def demand_frame(country, year, freq, rng):
+    starts, missing = local_periods(year, freq)
+    actual = np.round(daily_profile(starts, rng.uniform(5000, 60000), 0.2, rng)).astype(int)
+    forecast = np.round(actual * (1 + 0.02 * rng.standard_normal(len(actual)))).astype(int)
+
+    df = pd.DataFrame({'Time (CET)': mtu_strings(starts, freq),
+                       f'Day-ahead Total Load Forecast [MW] - CTA|{country}': forecast.astype(str),
+                       f'Actual Total Load [MW] - CTA|{country}': actual.astype(str)})
+    df.loc[missing, df.columns[1:]] = ''
+
+    return df
+
+
+def capacity_frame(country, year, rng, units=40):
+    area = f'CTA|{country} / 01.01.{year} 00:00 - 01.01.{year + 1} 00:00'
+    capacity = np.round(rng.uniform(50, 1500, units)).astype(int)
+
+    return pd.DataFrame({
+        'Area/Year': area,
+        'Production Type': rng.choice(GENERATION_TYPES, units),
+        'Code': [f'{i:02d}W-SYNTH-{country}-{i:04d}' for i in range(units)],
+        'Name': [f'Synthetic plant {country} {i}' for i in range(units)],
+        'Installed Capacity Year Start [MW]': capacity,
+        'Current Installed Capacity [MW]': capacity,
+        'Location': 'intra_zonal',
+        'Voltage Connection Level [kV]': rng.choice([110, 220, 380], units),
+        'Commissioning Date': '01.07.2011',
+        'Decommissioning Date': '',
+    }, columns=CAPACITY_COLUMNS)
+
+
+def generate(output, countries, years, freq='60min', price_units=False, seed=0):
+    """
+    Writes raw exports for every country and year into output/<dataset>/<country>/.
+
+    Input:
+        output: str. the raw data directory
+        countries: list. two letter country codes
+        years: list. years to generate
+        freq: str or dict. resolution, either one for all countries or per country
+        price_units: bool. write prices as strings with a currency unit
+        seed: int. seed of the random generator
+
+    Returns a list of the files written.
+    """
+
+    rng = np.random.default_rng(seed)
+    written = list()
+
+    for country in countries:
+        country_freq = freq.get(country, '60min') if isinstance(freq, dict) else freq
+
+        for year in years:
+            period = f'{year}01010000-{year + 1}01010000'
+            frames = {
+                'total_generation': generation_frame(country, year, country_freq, rng),
+                'day_ahead_prices': prices_frame(country, year, country_freq, rng, price_units),
+                'total_demand': demand_frame(country, year, country_freq, rng),
+                'installed_capacity': capacity_frame(country, year, rng),
+            }
+
+            for dataset, df in frames.items():
+                path = os.path.join(output, dataset, country)
+                os.makedirs(path, exist_ok=True)
+                output_file = os.path.join(path, f'{EXPORT_NAMES[dataset]}_{period}.csv')
+                # the portal quotes every field
+                df.to_csv(output_file, index=False, quoting=1)
+                written.append(output_file)
+
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--output', required=True, help='raw data directory to write into')
+    parser.add_argument('--countries', nargs='+', default=['BE', 'DE'])
+    parser.add_argument('--years', nargs='+', type=int, default=[2019])
+    parser.add_argument('--freq', default='60min', help='resolution of the time series, i.e. 15min or 60min')
+    parser.add_argument('--price-units', action='store_true', help='write prices with a currency unit')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    written = generate(args.output, args.countries, args.years, args.freq, args.price_units, args.seed)
+    print(f'Wrote {len(written)} files to {args.output}')
+
+
+if __name__ == '__main__':
+
+    main()
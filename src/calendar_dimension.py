@@ -0,0 +1,117 @@
+import os
+import numpy as np
+import pandas as pd
+
+from catalog import parse_period
+from timezones import DEFAULT_TIMEZONE
+
+# column order of the times dimension table
+CALENDAR_COLUMNS = ['event_date', 'ts', 'country_id', 'timezone', 'year', 'month', 'day', 'hour', 'minute',
+                    'dayofweek', 'iso_week', 'is_dst']
+
+
+def build_calendar(start, end, freq='15min', tz=DEFAULT_TIMEZONE, country=None):
+    """
+    Computes the times dimension for every period in [start, end) in one vectorized pass.
+
+    Periods are generated in UTC so the repeated hour of the autumn DST change gets two rows,
+    told apart by ts and is_dst. All other attributes are local wall clock time.
+
+    Input:
+        start: str or Timestamp. first local period
+        end: str or Timestamp. local end, exclusive
+        freq: str. resolution of the periods, i.e. 15min or 1h
+        tz: str. timezone the attributes are computed in
+        country: str. country the rows describe the event dates of
+
+    Returns a DataFrame with CALENDAR_COLUMNS.
+    """
+
+    start = pd.Timestamp(start).tz_localize(tz, ambiguous=True, nonexistent='shift_forward')
+    end = pd.Timestamp(end).tz_localize(tz, ambiguous=True, nonexistent='shift_forward')
+
+    utc = pd.date_range(start.tz_convert('UTC'), end.tz_convert('UTC'), freq=freq)
+    utc = utc[utc < end.tz_convert('UTC')]
+    local = utc.tz_convert(tz)
+
+    wall = local.tz_localize(None).values.astype('datetime64[s]')
+    offset = (wall - utc.tz_localize(None).values.astype('datetime64[s]')).astype('int64')
+    standard_offset = pd.Timestamp('2000-01-01', tz=tz).utcoffset().total_seconds()
+
+    # "YYYY-mm-dd HH:MM:SS", the default Redshift timestamp format
+    event_date = np.datetime_as_string(wall, unit='s').astype('S19')
+    event_date.view('S1').reshape(-1, 19)[:, 10] = b' '
+
+    iso = local.isocalendar()
+
+    return pd.DataFrame({
+        'event_date': event_date.astype(str),
+        'ts': utc.tz_localize(None).values.astype('datetime64[ns]').astype('int64'),
+        'country_id': country,
+        'timezone': tz,
+        'year': local.year.values.astype('int16'),
+        'month': local.month.values.astype('int16'),
+        'day': local.day.values.astype('int16'),
+        'hour': local.hour.values.astype('int16'),
+        'minute': local.minute.values.astype('int16'),
+        # 1 for monday
+        'dayofweek': (local.dayofweek.values + 1).astype('int16'),
+        'iso_week': iso['week'].to_numpy().astype('int16'),
+        'is_dst': offset > standard_offset,
+    }, columns=CALENDAR_COLUMNS)
+
+
+def covered_years(units):
+    """
+    Years covered by the ENTSO-E periods in the file names of (dataset, country, file) units.
+
+    Returns a dict of country to its sorted years.
+    """
+
+    years = dict()
+
+    for _, country, path_in_str in units:
+        period_start, period_end = parse_period(path_in_str)
+        if period_start is None:
+            continue
+        # the period end is exclusive, 202001010000 closes 2019
+        last = pd.Timestamp(period_end) - pd.Timedelta(minutes=1)
+        years.setdefault(country, set()).update(range(int(period_start[:4]), last.year + 1))
+
+    return {country: sorted(covered) for country, covered in years.items()}
+
+
+def write_calendar(output_path, years, timezones, freq='15min'):
+    """
+    Writes one headerless calendar csv per country and year, skipping the ones already written.
+
+    Each country gets the rows of its own timezone, the one its exports were localized in, so
+    facts join their calendar rows on (country_id, event_date).
+
+    Input:
+        output_path: str. path to save
+        years: dict. years to cover of each country, see covered_years
+        timezones: dict. timezone of each country
+        freq: str. resolution of the periods
+
+    Returns a list of the files written in this call.
+    """
+
+    os.makedirs(output_path, exist_ok=True)
+    output_files = list()
+
+    for country, covered in sorted(years.items()):
+        for year in covered:
+            output_file = os.path.join(output_path, f'calendar-{country}-{year}.csv')
+            if os.path.exists(output_file):
+                continue
+
+            # concurrent preprocessing runs may cover the same year, the last rename wins
+            tmp_file = os.path.join(output_path, f'.{os.getpid()}.partial')
+            build_calendar(f'{year}-01-01', f'{year + 1}-01-01', freq, timezones[country], country) \
+                .to_csv(tmp_file, index=False, header=False)
+            os.replace(tmp_file, output_file)
+            output_files.append(output_file)
+            print(f'Saved: calendar {country} {year} ({timezones[country]})')
+
+    return output_files
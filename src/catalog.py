@@ -0,0 +1,208 @@
+import os
+import re
+import json
+import sqlite3
+import hashlib
+import datetime
+
+# ENTSO-E export names end with the covered period, i.e. _201901010000-202001010000 (1).csv
+PERIOD_PATTERN = re.compile(r'_(\d{12})-(\d{12})')
+
+
+def parse_period(path_in_str):
+    """
+    Parses the covered period out of an ENTSO-E export file name.
+
+    Input:
+        path_in_str: str. path to the raw csv
+
+    Returns a tuple of (start, end) as YYYYmmddHHMM strings, or (None, None) if the name has no period.
+    """
+
+    match = PERIOD_PATTERN.search(os.path.basename(path_in_str))
+    if match is None:
+        return None, None
+
+    return match.group(1), match.group(2)
+
+
+def file_hash(path_in_str, block_size=1 << 20):
+    """
+    sha256 of a file's content, read in blocks.
+    """
+
+    digest = hashlib.sha256()
+    with open(path_in_str, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+class RawFileCatalog:
+    """
+    Persistent SQLite index of the raw files, what they cover and what they produced.
+
+    Used to only process raw files that are new or changed since the last run and to skip
+    byte-identical duplicate downloads.
+    """
+
+    create_sql = """
+        CREATE TABLE IF NOT EXISTS raw_files (
+            path TEXT PRIMARY KEY,
+            dataset TEXT NOT NULL,
+            country TEXT NOT NULL,
+            period_start TEXT,
+            period_end TEXT,
+            size INTEGER NOT NULL,
+            mtime REAL NOT NULL,
+            sha256 TEXT NOT NULL,
+            duplicate_of TEXT,
+            outputs TEXT,
+            output_format TEXT,
+            processed_at TEXT
+        );
+        CREATE INDEX IF NOT EXISTS raw_files_sha256 ON raw_files (sha256);
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        # concurrent group runs of the DAG share the catalog, wait for each other's writes
+        self.conn = sqlite3.connect(db_path, timeout=60)
+        self.conn.executescript(RawFileCatalog.create_sql)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, path_in_str):
+        """
+        The catalog row of a raw file as a dict, or None if it was never seen.
+        """
+
+        cursor = self.conn.execute("SELECT * FROM raw_files WHERE path = ?", (path_in_str,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+
+        return dict(zip([col[0] for col in cursor.description], row))
+
+    def scan(self, unit):
+        """
+        Updates the catalog entry of a (dataset, country, file) unit from the file on disk.
+
+        The content hash is only recomputed when size or mtime changed. Entries whose content
+        changed lose their recorded outputs, which are returned so the caller removes them
+        before they are loaded along with the outputs of the new content.
+
+        Returns a tuple of (up to date catalog row, list of outputs of the replaced content).
+        """
+
+        dataset, country, path_in_str = unit
+        stat = os.stat(path_in_str)
+        entry = self.get(path_in_str)
+
+        if entry is not None and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+            return entry, list()
+
+        sha256 = file_hash(path_in_str)
+        period_start, period_end = parse_period(path_in_str)
+        stale = list()
+
+        if entry is not None and entry['sha256'] == sha256:
+            # touched but not changed
+            self.conn.execute("UPDATE raw_files SET size = ?, mtime = ? WHERE path = ?",
+                              (stat.st_size, stat.st_mtime, path_in_str))
+        else:
+            if entry is not None and entry['outputs'] is not None:
+                stale = json.loads(entry['outputs'])
+            self.conn.execute("""
+                INSERT OR REPLACE INTO raw_files
+                    (path, dataset, country, period_start, period_end, size, mtime, sha256,
+                     duplicate_of, outputs, output_format, processed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, NULL, NULL, NULL, NULL)
+                """, (path_in_str, dataset, country, period_start, period_end,
+                      stat.st_size, stat.st_mtime, sha256))
+        self.conn.commit()
+
+        return self.get(path_in_str), stale
+
+    def plan(self, units, output_format='csv'):
+        """
+        Splits units into the ones that need processing and the ones that can be skipped.
+
+        A unit is skipped if it was processed before into the same output format with unchanged
+        content and all of its outputs still exist, or if it is byte-identical to another raw
+        file of the same dataset and country that is processed or being processed in this run.
+
+        Input:
+            units: list. (dataset, country, file) tuples from build_work_units
+            output_format: str. output format and compression of this run, i.e. csv or csv.gzip
+
+        Returns a tuple of (todo, skipped) lists of units and a list of (unit, outputs) of the
+        units whose content changed since their outputs were written, see scan.
+        """
+
+        todo, skipped, stale = list(), list(), list()
+        claimed = dict()
+
+        for unit in units:
+            dataset, country, path_in_str = unit
+            entry, outputs = self.scan(unit)
+            if len(outputs) > 0:
+                stale.append((unit, outputs))
+            key = (dataset, country, entry['sha256'])
+
+            if key in claimed:
+                self.mark_duplicate(path_in_str, claimed[key])
+                skipped.append(unit)
+                continue
+
+            original = self.conn.execute("""
+                SELECT path FROM raw_files
+                WHERE sha256 = ? AND dataset = ? AND country = ? AND path != ?
+                    AND outputs IS NOT NULL AND output_format = ? AND duplicate_of IS NULL
+                """, (entry['sha256'], dataset, country, path_in_str, output_format)).fetchone()
+
+            if original is not None and os.path.exists(original[0]):
+                self.mark_duplicate(path_in_str, original[0])
+                skipped.append(unit)
+                continue
+
+            claimed[key] = path_in_str
+
+            if entry['outputs'] is not None and entry['duplicate_of'] is None and \
+                    entry['output_format'] == output_format and \
+                    all(os.path.exists(output) for output in json.loads(entry['outputs'])):
+                skipped.append(unit)
+            else:
+                todo.append(unit)
+
+        return todo, skipped, stale
+
+    def mark_duplicate(self, path_in_str, original):
+        self.conn.execute("UPDATE raw_files SET duplicate_of = ?, outputs = NULL WHERE path = ?",
+                          (original, path_in_str))
+        self.conn.commit()
+
+    def record(self, unit, output_files, output_format='csv'):
+        """
+        Records the outputs a processed unit produced.
+
+        Returns the outputs of an earlier content of the unit that it didn't write again, i.e.
+        when it changed without being planned. The caller removes them, see scan.
+        """
+
+        _, stale = self.scan(unit)
+        self.conn.execute("""
+            UPDATE raw_files SET outputs = ?, output_format = ?, duplicate_of = NULL, processed_at = ?
+            WHERE path = ?
+            """, (json.dumps(output_files), output_format, datetime.datetime.now().isoformat(), unit[2]))
+        self.conn.commit()
+
+        return [output for output in stale if output not in output_files]
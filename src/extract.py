@@ -0,0 +1,558 @@
+import os
+import re
+import json
+import random
+import asyncio
+import hashlib
+import argparse
+import logging
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import requests
+
+from timezones import area_timezone
+
+API_URL = 'https://transparency.entsoe.eu/api'
+
+# EIC codes of the areas queried, by the folder name used in data/raw/<dataset>/<area>/
+DOMAINS = {
+    'AL': '10YAL-KESH-----5', 'AT': '10YAT-APG------L', 'BA': '10YBA-JPCC-----D', 'BE': '10YBE----------2',
+    'BG': '10YCA-BULGARIA-R', 'CH': '10YCH-SWISSGRIDZ', 'CZ': '10YCZ-CEPS-----N', 'DE': '10Y1001A1001A82H',
+    'DE_LU': '10Y1001A1001A82H', 'DK_1': '10YDK-1--------W', 'DK_2': '10YDK-2--------M',
+    'EE': '10Y1001A1001A39I', 'ES': '10YES-REE------0', 'FI': '10YFI-1--------U', 'FR': '10YFR-RTE------C',
+    'GB': '10YGB----------A', 'GR': '10YGR-HTSO-----Y', 'HR': '10YHR-HEP------M', 'HU': '10YHU-MAVIR----U',
+    'IE': '10Y1001A1001A59C', 'IT': '10YIT-GRTN-----B', 'IT_NORD': '10Y1001A1001A73I',
+    'LT': '10YLT-1001A0008Q', 'LU': '10YLU-CEGEDEL-NQ', 'LV': '10YLV-1001A00074', 'ME': '10YCS-CG-TSO---S',
+    'MK': '10YMK-MEPSO----8', 'NL': '10YNL----------L', 'NO_1': '10YNO-1--------2', 'NO_2': '10YNO-2--------T',
+    'NO_3': '10YNO-3--------J', 'NO_4': '10YNO-4--------9', 'NO_5': '10Y1001A1001A48H',
+    'PL': '10YPL-AREA-----S', 'PT': '10YPT-REN------W', 'RO': '10YRO-TEL------P', 'RS': '10YCS-SERBIATSOV',
+    'SE_1': '10Y1001A1001A44P', 'SE_2': '10Y1001A1001A45N', 'SE_3': '10Y1001A1001A46L',
+    'SE_4': '10Y1001A1001A47J', 'SI': '10YSI-ELES-----O', 'SK': '10YSK-SEPS-----K',
+}
+
+# production types of the generation documents, in the column order of the portal exports
+PSR_TYPES = {
+    'B01': 'Biomass', 'B02': 'Fossil Brown coal/Lignite', 'B03': 'Fossil Coal-derived gas',
+    'B04': 'Fossil Gas', 'B05': 'Fossil Hard coal', 'B06': 'Fossil Oil', 'B07': 'Fossil Oil shale',
+    'B08': 'Fossil Peat', 'B09': 'Geothermal', 'B10': 'Hydro Pumped Storage',
+    'B11': 'Hydro Run-of-river and poundage', 'B12': 'Hydro Water Reservoir', 'B13': 'Marine',
+    'B14': 'Nuclear', 'B20': 'Other', 'B15': 'Other renewable', 'B16': 'Solar', 'B17': 'Waste',
+    'B18': 'Wind Offshore', 'B19': 'Wind Onshore',
+}
+
+# file names the portal gives its downloads, completed with _<start>-<end>.csv
+EXPORT_NAMES = {
+    'total_generation': 'Actual Generation per Production Type',
+    'day_ahead_prices': 'Day-ahead Prices',
+    'total_demand': 'Total Load - Day Ahead _ Actual',
+    'installed_capacity': 'Installed Capacity Per Production Unit',
+}
+
+CAPACITY_COLUMNS = [
+    'Area/Year', 'Production Type', 'Code', 'Name', 'Installed Capacity Year Start [MW]',
+    'Current Installed Capacity [MW]', 'Location', 'Voltage Connection Level [kV]',
+    'Commissioning Date', 'Decommissioning Date',
+]
+
+# throttled or temporarily failing requests worth retrying
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# the API allows 400 requests per minute and token
+RATE_LIMIT = 400
+RATE_PERIOD = 60.0
+
+# byte positions of dd.mm.YYYY HH:MM inside numpy's "YYYY-mm-ddTHH:MM"
+_MTU_BYTES = [8, 9, 7, 5, 6, 7, 0, 1, 2, 3, 10, 11, 12, 13, 14, 15]
+
+_DURATION = re.compile(r'^P(?:(\d+)Y)?(?:(\d+)M)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?)?$')
+
+
+def queries(dataset, domain, period_start, period_end):
+    """
+    API parameters of the documents making up one raw export, by the name of each part.
+
+    Input:
+        dataset: str. one of EXPORT_NAMES
+        domain: str. EIC code of the area
+        period_start, period_end: str. UTC period as YYYYmmddHHMM
+    """
+
+    period = {'periodStart': period_start, 'periodEnd': period_end}
+
+    if dataset == 'day_ahead_prices':
+        return {'prices': dict(period, documentType='A44', in_Domain=domain, out_Domain=domain)}
+    if dataset == 'total_demand':
+        return {'forecast': dict(period, documentType='A65', processType='A01', outBiddingZone_Domain=domain),
+                'actual': dict(period, documentType='A65', processType='A16', outBiddingZone_Domain=domain)}
+    if dataset == 'total_generation':
+        return {'generation': dict(period, documentType='A75', processType='A16', in_Domain=domain)}
+    if dataset == 'installed_capacity':
+        return {'units': dict(period, documentType='A71', processType='A33', in_Domain=domain)}
+
+    raise ValueError(f'Unknown dataset {dataset}')
+
+
+def request_key(params):
+    """
+    Cache key of a request: sha256 of its parameters without the security token.
+    """
+
+    params = {key: value for key, value in params.items() if key != 'securityToken'}
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+class RateLimiter:
+    """
+    Spaces requests out evenly so no more than rate start within any period seconds.
+    """
+
+    def __init__(self, rate=RATE_LIMIT, period=RATE_PERIOD):
+        self.interval = period / rate
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self.lock:
+            now = asyncio.get_event_loop().time()
+            delay = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class EntsoeClient:
+    """
+    Fetches documents from the ENTSO-E transparency API concurrently.
+
+    Requests run on a thread pool driven from asyncio: at most concurrency at a time, started
+    no faster than the rate limit allows. Throttled, failing and timed out requests are retried
+    with exponential backoff and jitter, honouring Retry-After. Responses are cached on disk
+    as <cache_dir>/<request_key>.xml, except for periods that haven't ended yet.
+
+    Create it inside a running event loop, i.e. in the coroutine passed to asyncio.run.
+    """
+
+    def __init__(self, token=None, api_url=API_URL, cache_dir='./data/cache/entsoe', rate=RATE_LIMIT,
+                 period=RATE_PERIOD, concurrency=8, retries=5, backoff=1.0, timeout=60):
+        self.token = token
+        self.api_url = api_url
+        self.cache_dir = cache_dir
+        self.limiter = RateLimiter(rate, period)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.sessions = threading.local()
+        self.stats = {'requests': 0, 'cached': 0, 'retries': 0, 'bytes': 0}
+
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    def _get(self, params):
+        # requests sessions aren't thread safe, keep one per worker thread
+        session = getattr(self.sessions, 'session', None)
+        if session is None:
+            session = self.sessions.session = requests.Session()
+
+        query = dict(params, securityToken=self.token) if self.token is not None else params
+        response = session.get(self.api_url, params=query, timeout=self.timeout)
+        return response.status_code, response.headers.get('Retry-After'), response.content
+
+    def cache_path(self, params):
+        return os.path.join(self.cache_dir, f'{request_key(params)}.xml')
+
+    async def fetch(self, params):
+        """
+        Returns the document for params as bytes, from the cache when possible.
+        """
+
+        cacheable = self.cache_dir is not None and \
+            pd.Timestamp(params['periodEnd']) <= pd.Timestamp.now('UTC').tz_localize(None)
+
+        if cacheable and os.path.exists(self.cache_path(params)):
+            self.stats['cached'] += 1
+            with open(self.cache_path(params), 'rb') as f:
+                return f.read()
+
+        loop = asyncio.get_event_loop()
+
+        for attempt in range(self.retries + 1):
+            retry_after = None
+            async with self.semaphore:
+                await self.limiter.wait()
+                self.stats['requests'] += 1
+                try:
+                    status, retry_after, content = await loop.run_in_executor(self.executor, self._get, params)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    status, content = None, str(e).encode()
+
+            # "no matching data" comes back as a 400 acknowledgement, which is an empty answer
+            if status == 200 or (status == 400 and b'Acknowledgement_MarketDocument' in content):
+                break
+
+            if status is not None and status not in RETRY_STATUS:
+                raise RuntimeError(f'ENTSO-E request {params} failed with {status}: {content[:200]}')
+            if attempt == self.retries:
+                raise RuntimeError(f'ENTSO-E request {params} failed after {attempt + 1} attempts, '
+                                   f'last status {status}')
+
+            delay = float(retry_after) if retry_after is not None and retry_after.isdigit() else \
+                self.backoff * 2 ** attempt * (1 + random.random())
+            logging.info(f'Retrying {params["documentType"]} in {delay:.1f}s, status {status}')
+            self.stats['retries'] += 1
+            await asyncio.sleep(delay)
+
+        self.stats['bytes'] += len(content)
+
+        if cacheable:
+            partial = f'{self.cache_path(params)}.{os.getpid()}.partial'
+            with open(partial, 'wb') as f:
+                f.write(content)
+            os.replace(partial, self.cache_path(params))
+
+        return content
+
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _duration(text):
+    """
+    pandas frequency of an ISO 8601 duration like PT15M, PT60M, P1D or P1Y.
+    """
+
+    match = _DURATION.match(text)
+    if match is None:
+        raise ValueError(f'Unknown resolution {text}')
+
+    years, months, days, hours, minutes = (int(group or 0) for group in match.groups())
+    if years or months:
+        return pd.DateOffset(years=years, months=months)
+    # fixed durations keep date_range vectorized
+    return pd.Timedelta(days=days, hours=hours, minutes=minutes)
+
+
+def parse_timeseries(content):
+    """
+    Parses the TimeSeries of an ENTSO-E document.
+
+    Returns a list of (fields, values) tuples: the series' own elements by tag name, i.e.
+    psrType or registeredResource.name, and a float Series indexed by naive UTC interval
+    starts. Points left out of A03 (variable sized block) curves repeat the previous value.
+    """
+
+    root = ET.fromstring(content)
+    parsed = list()
+
+    for series in root:
+        if _local(series.tag) != 'TimeSeries':
+            continue
+
+        fields = dict()
+        periods = list()
+        pending = list(series)
+        while pending:
+            element = pending.pop()
+            tag = _local(element.tag)
+            if tag == 'Period':
+                periods.append(element)
+            elif len(element) > 0:
+                pending.extend(element)
+            else:
+                fields[tag] = (element.text or '').strip()
+
+        values = list()
+        for period in periods:
+            # a Period starts with its timeInterval and resolution, followed by the Points
+            interval = {_local(child.tag): child.text for child in period[0]}
+            start = pd.Timestamp(interval['start']).tz_convert('UTC').tz_localize(None)
+            end = pd.Timestamp(interval['end']).tz_convert('UTC').tz_localize(None)
+            resolution = _duration(period[1].text)
+
+            # a Point holds its position and then its quantity or price.amount
+            points = [point for point in period if point.tag.endswith('Point')]
+            positions = np.array([point[0].text for point in points], dtype='int64')
+            amounts = np.array([point[1].text for point in points], dtype='float64')
+
+            index = pd.date_range(start, end, freq=resolution)
+            index = index[index < end]
+            period_values = np.full(len(index), np.nan)
+            inside = (positions >= 1) & (positions <= len(index))
+            period_values[positions[inside] - 1] = amounts[inside]
+            if fields.get('curveType') == 'A03':
+                period_values = pd.Series(period_values).ffill().to_numpy()
+            values.append(pd.Series(period_values, index=index))
+
+        values = pd.concat(values) if values else pd.Series([], dtype='float64')
+        parsed.append((fields, values[~values.index.duplicated(keep='last')].sort_index()))
+
+    return parsed
+
+
+def _wall_bytes(wall):
+    """
+    Naive datetime64 values as a matrix of "dd.mm.YYYY HH:MM" bytes.
+    """
+
+    iso = np.datetime_as_string(wall.astype('datetime64[m]'), unit='m').astype('S16').view('S1').reshape(-1, 16)
+    chars = iso[:, _MTU_BYTES]
+    chars[:, [2, 5]] = b'.'
+    chars[:, 10] = b' '
+    return chars
+
+
+def _mtu(index, tz, freq):
+    """
+    Portal style "dd.mm.YYYY HH:MM - dd.mm.YYYY HH:MM" local intervals of naive UTC starts.
+
+    Like the portal the end is the start plus the resolution on the wall clock, so intervals
+    of the repeated autumn hour don't end before they start. Built from the bytes of numpy's
+    ISO strings instead of calling strftime per row.
+    """
+
+    wall = index.tz_localize('UTC').tz_convert(tz).tz_localize(None)
+    separator = np.full((len(index), 3), b' ', dtype='S1')
+    separator[:, 1] = b'-'
+    chars = np.hstack([_wall_bytes(wall.values), separator, _wall_bytes((wall + freq).values)])
+    return np.ascontiguousarray(chars).view('S35').ravel().astype(str)
+
+
+def _combine(series):
+    values = pd.concat(series) if series else pd.Series([], dtype='float64')
+    return values[~values.index.duplicated(keep='last')].sort_index()
+
+
+def _resolution(index):
+    deltas = index.to_series().diff().dropna()
+    return deltas.min() if len(deltas) > 0 else pd.Timedelta(minutes=60)
+
+
+def _text(values):
+    """
+    Values as the portal writes them: blank when missing, integral loads without a decimal point.
+    """
+
+    values = np.asarray(values, dtype='float64')
+    missing = np.isnan(values)
+    filled = np.where(missing, 0, values)
+    integral = filled == np.round(filled)
+
+    text = np.where(integral, np.round(filled).astype('int64').astype(str), filled.astype(str))
+    return pd.Series(np.where(missing, '', text))
+
+
+def build_export(dataset, area, documents, year):
+    """
+    Lays parsed documents out like the portal's csv export of a dataset.
+
+    MTU intervals are written in the local time of the area without a timezone label, so
+    timezones.export_timezone localizes them with the area's zone.
+
+    Input:
+        dataset: str. one of EXPORT_NAMES
+        area: str. area code, i.e. BE
+        documents: dict. parse_timeseries output of each part of queries()
+        year: int. the year the export covers
+    """
+
+    tz = area_timezone(area)
+
+    if dataset == 'day_ahead_prices':
+        prices = _combine([values for _, values in documents['prices']])
+        return pd.DataFrame({'MTU': _mtu(prices.index, tz, _resolution(prices.index)),
+                             'Day-ahead Price [EUR/MWh]': _text(prices).to_numpy()})
+
+    if dataset == 'total_demand':
+        actual = _combine([values for _, values in documents['actual']])
+        forecast = _combine([values for _, values in documents['forecast']])
+        index = actual.index.union(forecast.index)
+        return pd.DataFrame({'Time': _mtu(index, tz, _resolution(index)),
+                             f'Day-ahead Total Load Forecast [MW] - BZN|{area}':
+                                 _text(forecast.reindex(index)).to_numpy(),
+                             f'Actual Total Load [MW] - BZN|{area}': _text(actual.reindex(index)).to_numpy()})
+
+    if dataset == 'total_generation':
+        aggregated, consumption = dict(), dict()
+        for fields, values in documents['generation']:
+            # consumption, i.e. pumping, is published with the area as out domain
+            target = consumption if 'outBiddingZone_Domain.mRID' in fields else aggregated
+            target.setdefault(fields.get('psrType'), []).append(values)
+
+        aggregated = {psr: _combine(series) for psr, series in aggregated.items()}
+        consumption = {psr: _combine(series) for psr, series in consumption.items()}
+        index = pd.DatetimeIndex(np.unique(np.concatenate([v.index.values for v in aggregated.values()] or [[]])))
+
+        columns = {'Area': f'BZN|{area}',
+                   'MTU': _mtu(index, tz, _resolution(index))}
+        for psr, name in PSR_TYPES.items():
+            # types not produced in the area are 'n/e'
+            columns[f'{name}  - Actual Aggregated [MW]'] = \
+                _text(aggregated[psr].reindex(index)).to_numpy() if psr in aggregated else 'n/e'
+            if psr in consumption:
+                columns[f'{name}  - Actual Consumption [MW]'] = _text(consumption[psr].reindex(index)).to_numpy()
+
+        return pd.DataFrame(columns)
+
+    if dataset == 'installed_capacity':
+        rows = list()
+        for fields, values in documents['units']:
+            capacity = _text(values.iloc[:1]).iloc[0] if len(values) > 0 else ''
+            rows.append([f'BZN|{area} / 01.01.{year} 00:00 - 01.01.{year + 1} 00:00',
+                         PSR_TYPES.get(fields.get('psrType'), fields.get('psrType', '')),
+                         fields.get('registeredResource.mRID', fields.get('mRID', '')),
+                         fields.get('registeredResource.name', fields.get('name', '')),
+                         capacity, capacity, '',
+                         fields.get('voltage_PowerSystemResources.highVoltageLimit', ''),
+                         '', ''])
+        return pd.DataFrame(rows, columns=CAPACITY_COLUMNS)
+
+    raise ValueError(f'Unknown dataset {dataset}')
+
+
+def year_period(year, tz):
+    """
+    A local calendar year as the UTC query period and the local period of the export name.
+    """
+
+    start = pd.Timestamp(f'{year}-01-01').tz_localize(tz).tz_convert('UTC')
+    end = pd.Timestamp(f'{year + 1}-01-01').tz_localize(tz).tz_convert('UTC')
+
+    return (start.strftime('%Y%m%d%H%M'), end.strftime('%Y%m%d%H%M')), f'{year}01010000-{year + 1}01010000'
+
+
+def write_export(dataset, area, year, documents, output_file):
+    """
+    Parses the fetched documents by part and writes them out as a portal style csv.
+    """
+
+    documents = {part: parse_timeseries(content) for part, content in documents.items()}
+    df = build_export(dataset, area, documents, year)
+
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    partial = f'{output_file}.partial'
+    # the portal quotes every field
+    df.to_csv(partial, index=False, quoting=1)
+    os.replace(partial, output_file)
+
+    return output_file
+
+
+async def extract_export(client, dataset, area, year, output='./data/raw', overwrite=False, executor=None):
+    """
+    Fetches one year of a dataset for an area and writes it as output/<dataset>/<area>/<export>.csv.
+
+    The documents are parsed and written on executor, the event loop's default one if None.
+
+    Returns the path written, None if it already existed.
+    """
+
+    (period_start, period_end), name_period = year_period(year, area_timezone(area))
+    output_file = os.path.join(output, dataset, area, f'{EXPORT_NAMES[dataset]}_{name_period}.csv')
+
+    if os.path.exists(output_file) and not overwrite:
+        return None
+
+    parts = queries(dataset, DOMAINS[area], period_start, period_end)
+    contents = await asyncio.gather(*[client.fetch(params) for params in parts.values()])
+
+    # parsing runs off the event loop so it keeps requests going in the meantime
+    return await asyncio.get_event_loop().run_in_executor(
+        executor, write_export, dataset, area, year, dict(zip(parts, contents)), output_file)
+
+
+async def extract_all(areas, years, datasets=None, output='./data/raw', overwrite=False, parse_workers=1,
+                      **client_options):
+    """
+    Fetches every (dataset, area, year) export concurrently, parsing them on parse_workers processes.
+
+    Returns a tuple of (files written, failed (dataset, area, year, error) tuples, client stats).
+    """
+
+    datasets = list(EXPORT_NAMES) if datasets is None else datasets
+    unknown = [area for area in areas if area not in DOMAINS]
+    if unknown:
+        raise ValueError(f'No EIC code for {unknown}, add them to DOMAINS')
+
+    client = EntsoeClient(**client_options)
+    # parsing is CPU bound, a single worker parses on a thread of the event loop
+    executor = ProcessPoolExecutor(max_workers=parse_workers) if parse_workers > 1 else None
+    units = [(dataset, area, year) for dataset in datasets for area in areas for year in years]
+
+    try:
+        results = await asyncio.gather(*[extract_export(client, dataset, area, year, output, overwrite, executor)
+                                         for dataset, area, year in units],
+                                       return_exceptions=True)
+    finally:
+        client.close()
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    written = [result for result in results if isinstance(result, str)]
+    failed = [unit + (result,) for unit, result in zip(units, results) if isinstance(result, Exception)]
+
+    return written, failed, client.stats
+
+
+def extract(areas, years, datasets=None, output='./data/raw', overwrite=False, parse_workers=1, **client_options):
+    """
+    Fills output/<dataset>/<area>/ with raw exports from the ENTSO-E API, ready for process_data.
+
+    Input:
+        areas: list. area codes with an entry in DOMAINS, i.e. BE or DE_LU
+        years: list. local calendar years to fetch
+        datasets: list. subset of EXPORT_NAMES, all of them by default
+        output: str. the raw data directory
+        overwrite: bool. fetch exports that already exist again
+        parse_workers: int. processes parsing the fetched documents
+        client_options: passed on to EntsoeClient, i.e. token, rate or concurrency
+
+    Returns a list of the files written. Raises if any export failed after retrying.
+    """
+
+    start = time.perf_counter()
+    written, failed, stats = asyncio.run(extract_all(areas, years, datasets, output, overwrite, parse_workers,
+                                                        **client_options))
+
+    print(f'Extracted {len(written)} files in {time.perf_counter() - start:.1f}s: {stats["requests"]} requests, '
+          f'{stats["cached"]} cached, {stats["retries"]} retries, {stats["bytes"] / 1e6:.1f} MB')
+
+    for dataset, area, year, error in failed:
+        print(f'Failed: {dataset} {area} {year}: {error}')
+    if failed:
+        raise RuntimeError(f'{len(failed)} exports failed')
+
+    return written
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Download raw ENTSO-E exports into data/raw.')
+    parser.add_argument('--areas', nargs='+', required=True, help='area codes, i.e. BE DE_LU NO_2')
+    parser.add_argument('--years', nargs='+', type=int, required=True)
+    parser.add_argument('--datasets', nargs='+', choices=list(EXPORT_NAMES), default=None)
+    parser.add_argument('--output', default='./data/raw')
+    parser.add_argument('--overwrite', action='store_true', help='fetch exports that already exist again')
+    parser.add_argument('--api-url', default=API_URL)
+    parser.add_argument('--cache-dir', default='./data/cache/entsoe',
+                        help='directory caching the raw API responses')
+    parser.add_argument('--rate', type=int, default=RATE_LIMIT, help='requests allowed per minute')
+    parser.add_argument('--concurrency', type=int, default=8, help='requests in flight at once')
+    parser.add_argument('--retries', type=int, default=5)
+    parser.add_argument('--parse-workers', type=int, default=os.cpu_count(),
+                        help='processes parsing the fetched documents')
+    args = parser.parse_args()
+
+    extract(args.areas, args.years, args.datasets, args.output, args.overwrite, args.parse_workers,
+            token=os.environ.get('ENTSOE_TOKEN'), api_url=args.api_url, cache_dir=args.cache_dir,
+            rate=args.rate, period=RATE_PERIOD, concurrency=args.concurrency, retries=args.retries)
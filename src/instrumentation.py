@@ -0,0 +1,247 @@
+import os
+import re
+import sys
+import json
+import time
+import socket
+import pstats
+import cProfile
+import resource
+import threading
+from contextlib import contextmanager
+
+import psutil
+
+# pipeline stages in the order a raw file passes through them
+STAGES = ['read', 'parse', 'localize', 'melt', 'write', 'upload']
+
+
+def current_rss():
+    """
+    Current resident set size of this process in bytes.
+    """
+
+    # not cached, a worker forked from the parent would report the parent
+    return psutil.Process(os.getpid()).memory_info().rss
+
+
+def process_peak_rss():
+    """
+    Peak resident set size in bytes of this process or its largest finished child process,
+    over the whole run. It can't be attributed to a stage.
+    """
+
+    rss = max(resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN))
+    # kilobytes on linux, bytes on macOS
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class StageMetrics:
+    """
+    Accumulates wall time, rows in/out, bytes and resident memory per (dataset, country, stage).
+
+    Memory is sampled with current_rss as each call of a stage starts and ends: rss is the
+    largest of the samples and rss_growth the largest growth over one call, i.e. what the
+    stage allocated and kept until it ended.
+
+    The preprocessing functions time their work with stage() on the module level METRICS
+    collector. Worker processes collect the records of each unit with unit() and hand them
+    back to the parent, which merges them into one run report.
+
+    With profile_dir set every stage also runs under cProfile and the profiles are dumped
+    per dataset, country, stage and process as <profile_dir>/<dataset>.<country>.<stage>.<pid>.prof.
+    """
+
+    fields = ['calls', 'seconds', 'rows_in', 'rows_out', 'bytes']
+
+    def __init__(self, profile_dir=None):
+        self.records = dict()
+        self.dataset = None
+        self.country = None
+        self.profile_dir = profile_dir
+        self.profiles = dict()
+        self._profiling = False
+        self._lock = threading.Lock()
+
+    def configure(self, profile_dir=None):
+        """
+        Sets where stage profiles are dumped, None disables profiling. Used as worker initializer.
+        """
+
+        self.profile_dir = profile_dir
+        if profile_dir is not None:
+            os.makedirs(profile_dir, exist_ok=True)
+
+    def add(self, stage, seconds=0.0, rows_in=0, rows_out=0, nbytes=0, calls=1, dataset=None, country=None,
+            rss=0, rss_growth=0):
+        key = (dataset or self.dataset, country or self.country, stage)
+
+        with self._lock:
+            record = self.records.setdefault(key, dict.fromkeys(StageMetrics.fields, 0))
+            record['calls'] += calls
+            record['seconds'] += seconds
+            record['rows_in'] += rows_in
+            record['rows_out'] += rows_out
+            record['bytes'] += nbytes
+            record['rss'] = max(record.get('rss', 0), rss)
+            record['rss_growth'] = max(record.get('rss_growth', 0), rss_growth)
+
+    @contextmanager
+    def stage(self, name, rows_in=0):
+        """
+        Times the enclosed block as one call of a stage of the current unit.
+
+        Yields a dict the block can set rows_out and bytes on.
+        """
+
+        counts = {'rows_in': rows_in, 'rows_out': 0, 'bytes': 0}
+        profiler = None
+
+        # cProfile can't nest, stages running inside another stage are only timed
+        if self.profile_dir is not None and not self._profiling:
+            profiler = self.profiles.setdefault((self.dataset, self.country, name), cProfile.Profile())
+            self._profiling = True
+            profiler.enable()
+
+        rss_start = current_rss()
+        start = time.perf_counter()
+        try:
+            yield counts
+        finally:
+            seconds = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+                self._profiling = False
+            rss_end = current_rss()
+            self.add(name, seconds, counts['rows_in'], counts['rows_out'], counts['bytes'],
+                     rss=max(rss_start, rss_end), rss_growth=max(rss_end - rss_start, 0))
+
+    @contextmanager
+    def unit(self, dataset, country):
+        """
+        Collects the stages of one (dataset, country) unit of work on their own.
+
+        Yields a list that holds the unit's records once the block exits.
+        """
+
+        saved = self.records, self.dataset, self.country
+        self.records, self.dataset, self.country = dict(), dataset, country
+        collected = list()
+
+        try:
+            yield collected
+        finally:
+            collected.extend(self.drain())
+            self.records, self.dataset, self.country = saved
+
+    def drain(self):
+        """
+        Returns the collected records as a list of dicts, dumps pending profiles and resets.
+        """
+
+        with self._lock:
+            records = [dict(zip(['dataset', 'country', 'stage'], key), **record)
+                       for key, record in self.records.items()]
+            self.records = dict()
+
+        self.dump_profiles()
+
+        return records
+
+    def merge(self, records):
+        """
+        Adds records collected elsewhere, i.e. in a worker process.
+        """
+
+        for record in records:
+            self.add(record['stage'], record['seconds'], record['rows_in'], record['rows_out'],
+                     record['bytes'], record['calls'], record['dataset'], record['country'], record['rss'],
+                     record['rss_growth'])
+
+    def dump_profiles(self):
+        for (dataset, country, stage), profiler in self.profiles.items():
+            output_file = os.path.join(self.profile_dir, f'{dataset}.{country}.{stage}.{os.getpid()}.prof')
+            stats = pstats.Stats(profiler)
+            # several units of the same dataset and country in one process share a file
+            if os.path.exists(output_file):
+                stats.add(output_file)
+            stats.dump_stats(output_file)
+
+        self.profiles = dict()
+
+    def report(self):
+        """
+        Per (dataset, country, stage) records and per stage totals, each with rows_per_sec.
+        """
+
+        def throughput(record):
+            rows = record['rows_in'] or record['rows_out']
+            return dict(record, rows_per_sec=rows / record['seconds'] if record['seconds'] > 0 else 0.0)
+
+        order = {stage: idx for idx, stage in enumerate(STAGES)}
+        stages = sorted(self.drain(), key=lambda r: (str(r['dataset']), str(r['country']),
+                                                     order.get(r['stage'], len(STAGES))))
+        self.merge(stages)
+
+        totals = dict()
+        for record in stages:
+            total = totals.setdefault(record['stage'], dict.fromkeys(StageMetrics.fields + ['rss', 'rss_growth'], 0))
+            for field in StageMetrics.fields:
+                total[field] += record[field]
+            total['rss'] = max(total['rss'], record['rss'])
+            total['rss_growth'] = max(total['rss_growth'], record['rss_growth'])
+
+        return {'stages': [throughput(record) for record in stages],
+                'totals': {stage: throughput(total) for stage, total in totals.items()}}
+
+    def write_report(self, output_file, **run):
+        """
+        Writes the report as JSON together with run level information, i.e. run_id and seconds,
+        and the peak_rss of the run, see process_peak_rss.
+        """
+
+        os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+        with open(output_file, 'w') as f:
+            json.dump(dict(run, peak_rss=process_peak_rss(), **self.report()), f, indent=2, default=str)
+
+        return output_file
+
+    def send_statsd(self, address, prefix='entsoe_etl.preprocess', packet_size=1400):
+        """
+        Sends the per stage records as StatsD metrics over UDP to host:port.
+
+        Metric names are <prefix>.<stage>.<dataset>.<country>.<metric>: seconds as a timer in ms,
+        rows_in, rows_out and bytes as counters and rss and rss_growth as gauges.
+        """
+
+        host, port = address.rsplit(':', 1)
+        lines = list()
+
+        for record in self.report()['stages']:
+            name = '.'.join([prefix] + [re.sub(r'[^A-Za-z0-9_-]', '_', str(part))
+                                        for part in (record['stage'], record['dataset'], record['country'])])
+            lines.extend([f'{name}.seconds:{record["seconds"] * 1000:.3f}|ms',
+                          f'{name}.rows_in:{record["rows_in"]}|c',
+                          f'{name}.rows_out:{record["rows_out"]}|c',
+                          f'{name}.bytes:{record["bytes"]}|c',
+                          f'{name}.rss:{record["rss"]}|g',
+                          f'{name}.rss_growth:{record["rss_growth"]}|g'])
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            packet = ''
+            for line in lines:
+                if packet and len(packet) + len(line) + 1 > packet_size:
+                    sock.sendto(packet.encode(), (host, int(port)))
+                    packet = ''
+                packet = f'{packet}\n{line}' if packet else line
+            if packet:
+                sock.sendto(packet.encode(), (host, int(port)))
+        finally:
+            sock.close()
+
+        return len(lines)
+
+
+# collector the preprocessing functions of this process report to
+METRICS = StageMetrics()
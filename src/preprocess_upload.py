@@ -1,9 +1,70 @@
 import os
+import io
+import gzip
+import json
+import argparse
+import numpy as np
 import pandas as pd
 from pathlib import Path
 import datetime
 import logging
+import time
+import hashlib
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+from catalog import RawFileCatalog, parse_period
+from calendar_dimension import covered_years, write_calendar
+from instrumentation import METRICS
+from schemas import resolve, to_output
+from timezones import DEFAULT_TIMEZONE, area_timezone, export_timezone, localize
+
+# ENTSO-E MTU strings are fixed width: "dd.mm.YYYY HH:MM - dd.mm.YYYY HH:MM" with an
+# optional " (CET)" suffix. Interval start and end are picked out by byte position and
+# rearranged into ISO "YYYY-mm-ddTHH:MM" so numpy can parse them without strptime.
+MTU_WIDTH = 35
+MTU_START = 0
+MTU_END = 19
+_MTU_ISO_BYTES = [6, 7, 8, 9, 5, 3, 4, 2, 0, 1, 10, 11, 12, 13, 14, 15]
+# byte positions of the digits and separators of "dd.mm.YYYY HH:MM"
+_MTU_DIGITS = [0, 1, 3, 4, 6, 7, 8, 9, 11, 12, 14, 15]
+_MTU_SEPARATORS = {2: b'.', 5: b'.', 10: b' ', 13: b':'}
+
+# concurrent uploads and the multipart settings each of them uses
+UPLOAD_WORKERS = 8
+UPLOAD_TRANSFER_CONFIG = TransferConfig(multipart_threshold=64 * 1024 * 1024,
+                                        multipart_chunksize=16 * 1024 * 1024,
+                                        max_concurrency=4)
+
+# byte positions of YYYYmmdd HHMMSS inside numpy's "YYYY-mm-ddTHH:MM:SS"
+_EVENT_DATE_BYTES = [0, 1, 2, 3, 5, 6, 8, 9, 10, 11, 12, 14, 15, 17, 18]
+
+# rows read ahead of each raw export to match its header and find its timezone
+SAMPLE_ROWS = 1
+
+# raw csv parsers: arrow parses with pyarrow.csv on all cores, pandas with the single threaded
+# C parser of pd.read_csv
+RAW_READERS = ['arrow', 'pandas']
+RAW_READER = 'arrow'
+
+# arrow type each schema dtype is parsed to. Categoricals are dictionary encoded after parsing
+# and nullable integers converted on the pandas side.
+ARROW_TYPES = {
+    'str': 'string',
+    'category': 'string',
+    'float32': 'float32',
+    'float64': 'float64',
+    'Int64': 'int64',
+}
+
+# bytes of the head of a csv sampled for its mean line length when streaming it with arrow,
+# and the smallest block streamed
+ARROW_SAMPLE_BYTES = 64 * 1024
+ARROW_MIN_BLOCK_BYTES = 64 * 1024
+
 
 def traverse_path(path, split_idx):
     """
@@ -29,287 +90,1883 @@ def traverse_path(path, split_idx):
     return country_paths
 
 
-def process_capacity_demand(country_paths, output_path, name, new_cols=None):
+def format_event_date(index):
+    """
+    Formats the wall clock time of a DatetimeIndex as "YYYYmmdd HHMMSS" strings.
+
+    Works on the raw bytes of numpy's ISO representation instead of calling strftime per row.
+
+    Input:
+        index: DatetimeIndex. naive or tz-aware index
+    """
+
+    if index.tz is not None:
+        index = index.tz_localize(None)
+
+    iso = np.datetime_as_string(index.values.astype('datetime64[s]'), unit='s').astype('S19')
+    chars = iso.view('S1').reshape(-1, 19)[:, _EVENT_DATE_BYTES]
+    chars[:, 8] = b' '
+
+    return np.ascontiguousarray(chars).view('S15').ravel().astype(str)
+
+
+def _mtu_to_datetime64(chars, offset):
+    """
+    Parses the "dd.mm.YYYY HH:MM" field starting at offset of each row of a byte matrix.
+    """
+
+    iso = chars[:, [offset + i for i in _MTU_ISO_BYTES]]
+    iso[:, 4] = b'-'
+    iso[:, 7] = b'-'
+    iso[:, 10] = b'T'
+
+    return np.ascontiguousarray(iso).view('S16').ravel().astype('datetime64[m]')
+
+
+def _mtu_malformed(chars, offset, optional=False):
+    """
+    Rows of a byte matrix whose "dd.mm.YYYY HH:MM" field starting at offset is malformed.
+    With optional, rows where the field is missing altogether are not.
+    """
+
+    codes = chars[:, offset:offset + 16].view('uint8')
+    # digits wrap around to above 9 when below '0'
+    malformed = ((codes[:, _MTU_DIGITS] - ord('0')) > 9).any(axis=1)
+    for position, separator in _MTU_SEPARATORS.items():
+        malformed |= codes[:, position] != ord(separator)
+
+    if optional:
+        malformed &= (codes != 0).any(axis=1)
+
+    return malformed
+
+
+def parse_mtu(mtu, tz=DEFAULT_TIMEZONE):
+    """
+    Parses a column of ENTSO-E MTU interval strings in one vectorized pass.
+
+    Input:
+        mtu: Series. strings like "01.01.2019 00:00 - 01.01.2019 01:00 (CET)"
+        tz: str. timezone the intervals are published in, see timezones.export_timezone
+
+    Returns a DataFrame aligned with mtu with columns
+        event_date: str. local interval start as "YYYYmmdd HHMMSS"
+        ts: int64. interval start as nanoseconds since the epoch (UTC)
+        interval_start: tz-aware interval start
+        interval_end: tz-aware interval end, NaT for a string without one
+
+    Raises ValueError on blank or malformed strings, naming the first of them.
+    """
+
+    with METRICS.stage('parse', rows_in=len(mtu)) as stage:
+        # blanks are empty strings, not "nan"
+        chars = (mtu.fillna('') if mtu.hasnans else mtu).to_numpy(dtype=f'S{MTU_WIDTH}').view('S1') \
+            .reshape(-1, MTU_WIDTH)
+        malformed = _mtu_malformed(chars, MTU_START) | _mtu_malformed(chars, MTU_END, optional=True)
+        if malformed.any():
+            row = np.flatnonzero(malformed)[0]
+            raise ValueError(f'Malformed MTU in {malformed.sum()} rows, the first at {mtu.index[row]}: '
+                             f'{mtu.iloc[row]!r}')
+        start = _mtu_to_datetime64(chars, MTU_START).astype('datetime64[ns]')
+        end = _mtu_to_datetime64(chars, MTU_END).astype('datetime64[ns]')
+        stage['rows_out'] = len(start)
+
+    with METRICS.stage('localize', rows_in=len(start)) as stage:
+        ts, local = localize(start, tz)
+
+        interval_start = pd.DatetimeIndex(ts.view('datetime64[ns]')).tz_localize('UTC').tz_convert(tz)
+        # the end is derived from the published duration so DST repeats don't need resolving twice
+        interval_end = interval_start + pd.TimedeltaIndex(end - start)
+
+        times = pd.DataFrame({'event_date': format_event_date(pd.DatetimeIndex(local.view('datetime64[ns]'))),
+                              'ts': ts,
+                              'interval_start': interval_start,
+                              'interval_end': interval_end},
+                             index=mtu.index)
+        stage['rows_out'] = len(times)
+
+    return times
+
+
+def read_raw_csv(path_in_str, chunksize=None, reader=RAW_READER, **read_options):
+    """
+    Reads a raw ENTSO-E csv whole or as a stream of row chunks.
+
+    Chunks are cut on local calendar day boundaries, carrying the trailing day of one chunk
+    into the next, so the repeated hour of a DST change is always localized together.
+
+    Input:
+        path_in_str: str. path to the raw csv
+        chunksize: int. approximate rows per chunk. None reads the whole file at once.
+        reader: str. arrow or pandas, see RAW_READERS
+        read_options: usecols, dtype and na_values as returned by schemas.resolve. The pandas
+            reader passes any other pd.read_csv option on.
+    """
+
+    if reader not in RAW_READERS:
+        raise ValueError(f'Unknown reader: {reader}')
+
+    if chunksize is None:
+        with METRICS.stage('read') as stage:
+            if reader == 'arrow':
+                df = arrow_to_pandas(read_arrow(path_in_str, **read_options), read_options.get('dtype'))
+            else:
+                df = pd.read_csv(path_in_str, **read_options)
+            stage['rows_out'] = len(df)
+            stage['bytes'] = os.path.getsize(path_in_str)
+        yield df
+        return
+
+    carry = None
+
+    for chunk in _read_chunks(path_in_str, chunksize, reader, **read_options):
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+
+        mtu_col = [col for col in chunk.columns if col.startswith(('MTU', 'Time'))]
+        if len(mtu_col) == 0:
+            # not a time series. nothing to keep together
+            yield chunk
+            continue
+
+        day = chunk[mtu_col[0]].str.slice(0, 10)
+        last_day = (day == day.iloc[-1]).to_numpy()
+
+        carry = chunk[last_day]
+        if not last_day.all():
+            yield chunk[~last_day]
+
+    if carry is not None and len(carry) > 0:
+        yield carry
+
+
+def read_arrow(path_in_str, usecols=None, dtype=None, na_values=None):
+    """
+    Parses a csv into an arrow Table with pyarrow.csv, splitting the file into blocks parsed
+    on all cores. The file is memory mapped instead of read into a buffer first.
+
+    Input:
+        path_in_str: str. path to the raw csv
+        usecols: list. headers of the columns to parse. None parses all of them.
+        dtype: dict. schema dtype of each header, see ARROW_TYPES. Others are inferred.
+        na_values: list. values read as missing on top of arrow's defaults, i.e. '' and 'N/A'
+    """
+
+    import pyarrow as pa
+    import pyarrow.csv as pv
+
+    with pa.memory_map(path_in_str) as source:
+        table = pv.read_csv(source, read_options=pv.ReadOptions(use_threads=True),
+                            convert_options=_arrow_convert_options(usecols, dtype, na_values))
+
+    return _dictionary_encode(table, dtype)
+
+
+def _arrow_convert_options(usecols=None, dtype=None, na_values=None):
+    """
+    pyarrow.csv.ConvertOptions parsing the columns of read_arrow.
+    """
+
+    import pyarrow as pa
+    import pyarrow.csv as pv
+
+    return pv.ConvertOptions(
+        column_types={col: getattr(pa, ARROW_TYPES[kind])() for col, kind in (dtype or dict()).items()},
+        null_values=pv.ConvertOptions().null_values + list(na_values or []),
+        strings_can_be_null=True,
+        include_columns=list(usecols or []))
+
+
+def _dictionary_encode(table, dtype=None):
+    """
+    Dictionary encodes the columns of an arrow Table declared as category.
+    """
+
+    for i, col in enumerate(table.column_names):
+        if (dtype or dict()).get(col) == 'category':
+            table = table.set_column(i, col, table.column(i).dictionary_encode())
+
+    return table
+
+
+def arrow_to_pandas(table, dtype=None):
+    """
+    Converts an arrow Table from read_arrow into a DataFrame with the schema dtypes.
+
+    Columns become separate blocks instead of being consolidated into one 2D array per type,
+    so numeric columns without missing values are handed over without a copy.
+    """
+
+    df = table.to_pandas(split_blocks=True)
+
+    nullable = {col: kind for col, kind in (dtype or dict()).items() if kind == 'Int64' and col in df.columns}
+
+    return df.astype(nullable) if len(nullable) > 0 else df
+
+
+def read_export(path_in_str, dataset, country, chunksize=None, reader=RAW_READER):
+    """
+    Reads a raw ENTSO-E export as declared by the schema of its dataset, see schemas.SCHEMAS.
+
+    The header and first rows are sampled to resolve which columns to read and the timezone
+    of the intervals. The file is then parsed with only those columns, straight to their
+    declared types, and renamed to the output names.
+
+    Input:
+        path_in_str: str. path to the raw csv
+        dataset: str. the dataset the csv belongs to
+        country: str. country the csv belongs to
+        chunksize: int. approximate rows per chunk. None reads the whole file at once.
+        reader: str. arrow or pandas, see RAW_READERS
+
+    Returns a tuple of (generator of frames, timezone of the export).
+    """
+
+    sample = pd.read_csv(path_in_str, nrows=SAMPLE_ROWS, dtype=str)
+    tz = export_timezone(sample, country)
+    read_options, names, units = resolve(dataset, sample.columns)
+
+    frames = (to_output(df, names, units) for df in read_raw_csv(path_in_str, chunksize, reader, **read_options))
+
+    return frames, tz
+
+
+def _arrow_chunks(path_in_str, chunksize, usecols=None, dtype=None, na_values=None):
+    """
+    Streams a csv with pyarrow.csv.open_csv in blocks of about chunksize rows, converting
+    each to pandas, so only one block of the file is held at a time.
+
+    Blocks are sized in bytes from the mean line length of the head of the file, so chunks
+    are only approximately chunksize rows. read_raw_csv re-cuts them on day boundaries.
+    """
+
+    import pyarrow as pa
+    import pyarrow.csv as pv
+
+    with open(path_in_str, 'rb') as f:
+        head = f.read(ARROW_SAMPLE_BYTES)
+    line_bytes = len(head) / max(head.count(b'\n'), 1)
+    read_options = pv.ReadOptions(block_size=max(int(chunksize * line_bytes), ARROW_MIN_BLOCK_BYTES))
+
+    reader = pv.open_csv(path_in_str, read_options=read_options,
+                         convert_options=_arrow_convert_options(usecols, dtype, na_values))
+    for batch in reader:
+        if batch.num_rows > 0:
+            yield arrow_to_pandas(_dictionary_encode(pa.Table.from_batches([batch]), dtype), dtype)
+
+
+def _read_chunks(path_in_str, chunksize, reader=RAW_READER, **read_options):
+    """
+    Iterates over the row chunks of a csv, timing each read as a read stage.
+    """
+
+    if reader == 'arrow':
+        chunks = _arrow_chunks(path_in_str, chunksize, **read_options)
+    else:
+        chunks = iter(pd.read_csv(path_in_str, chunksize=chunksize, **read_options))
+    nbytes = os.path.getsize(path_in_str)
+
+    while True:
+        with METRICS.stage('read') as stage:
+            chunk = next(chunks, None)
+            stage['rows_out'] = 0 if chunk is None else len(chunk)
+            # the file size is accounted once, with the first chunk
+            stage['bytes'], nbytes = nbytes, 0
+
+        if chunk is None:
+            return
+        yield chunk
+
+
+def open_output(path_in_str, compression=None):
+    """
+    Opens a text file for writing, compressed with gzip or zstd or uncompressed.
+    """
+
+    if compression is None:
+        return open(path_in_str, 'w')
+    elif compression == 'gzip':
+        return gzip.open(path_in_str, 'wt', compresslevel=6)
+    elif compression == 'zstd':
+        import zstandard
+        raw = open(path_in_str, 'wb')
+        return io.TextIOWrapper(zstandard.ZstdCompressor(level=3).stream_writer(raw))
+
+    raise ValueError(f'Unknown compression: {compression}')
+
+
+def _event_day(event_date):
+    """
+    YYYYmmdd of an event_date written either as "YYYYmmdd HHMMSS" or "YYYY-mm-dd HH:MM:SS".
+    """
+
+    return event_date[:10].replace('-', '')[:8]
+
+
+# output partitioning: by country and month for time series, by country for outputs without
+# an event time
+PARTITIONS = ['month', 'country']
+
+
+def partition_path(country, event_day=None):
+    """
+    Partition directory of the rows of a country on a YYYYmmdd day: country=XX/year=YYYY/month=MM,
+    or just country=XX without a day.
     """
-    Prepares capacity and demand csvs from the ENTOSE API for the data warehouse.
+
+    if event_day is None:
+        return f'country={country}'
+
+    return os.path.join(f'country={country}', f'year={event_day[:4]}', f'month={event_day[4:6]}')
+
+
+def _partition_keys(df, by='month'):
+    """
+    Integer key of the country and, partitioning by month, YYYYmm month partition of each row.
+    """
+
+    def codes(column):
+        # categoricals are keyed on their categories, so a month is parsed once per day
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            return column.cat.codes.to_numpy(), column.cat.categories
+        return pd.factorize(column)
+
+    country_codes, _ = codes(df['country_id'])
+    if by == 'country':
+        return country_codes.astype('int64')
+
+    event_date_codes, event_dates = codes(df['event_date'])
+    # YYYYmm of "YYYYmmdd HHMMSS" or "YYYY-mm-dd HH:MM:SS", see _event_day, parsed once per month
+    prefix_codes, prefixes = pd.factorize(pd.Index(event_dates).astype(str).str.slice(0, 7))
+    months = pd.Index(prefixes).str.replace('-', '').str.slice(0, 6).astype('int64').to_numpy()
+
+    return country_codes.astype('int64') * 1000000 + months[prefix_codes][event_date_codes]
+
+
+def split_partitions(df, by='month'):
+    """
+    Splits a processed frame into its country=XX/year=YYYY/month=MM partitions, or its
+    country=XX partitions by country.
+
+    Processed rows are in ts order (see ts_order), so each partition is normally a contiguous
+    run of rows sliced out without copying. Frames whose partitions interleave are regrouped
+    first, keeping the row order within each partition. Yields (partition path, frame) tuples.
+    """
+
+    keys = _partition_keys(df, by)
+    bounds = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+    if len(np.unique(keys[np.r_[0, bounds]])) <= len(bounds):
+        order = np.argsort(keys, kind='stable')
+        df, keys = df.iloc[order], keys[order]
+        bounds = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+
+    for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(df)]):
+        part = df.iloc[start:end]
+        event_day = _event_day(str(part['event_date'].iloc[0])) if by == 'month' else None
+        yield partition_path(part['country_id'].iloc[0], event_day), part
+
+
+# profile sidecars of the processed files, written below processed/profiles/ under the path of
+# the file they describe plus .json. Not next to the files themselves, as COPY loads every
+# object under the prefix it is given.
+PROFILES = 'profiles'
+
+
+def profile_file(output_path, output_file):
+    """
+    Sidecar path of a file written below the dataset directory output_path, see PROFILES.
+    """
+
+    output_path = os.path.normpath(output_path)
+
+    return os.path.join(os.path.dirname(output_path), PROFILES, os.path.basename(output_path),
+                        os.path.relpath(output_file, output_path) + '.json')
+
+
+def remove_outputs(stale, output_path):
+    """
+    Deletes the outputs of replaced raw file content and their profile sidecars, so they are
+    neither uploaded nor staged next to the outputs of the new content. See RawFileCatalog.scan.
+
+    Input:
+        stale: list. (unit, output files) tuples
+        output_path: str. path to save, formatted with the dataset name
+    """
+
+    for (dataset, _, _), output_files in stale:
+        for output_file in output_files:
+            for path in [output_file, profile_file(output_path.format(dataset), output_file)]:
+                if os.path.exists(path):
+                    os.remove(path)
+                    logging.info(f'Removed stale output {path}')
+
+
+def _json_number(value):
+    """
+    A numpy or pandas scalar as a JSON number, None when missing.
+    """
+
+    if pd.isna(value):
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+
+    return float(value)
+
+
+def profile_partitions(df, by='month', missing=None, sources=None, repeat=1, extrema=None):
+    """
+    Profiles every partition of a processed frame (see split_partitions) with grouped reductions
+    over whole columns, without looping over partitions or rows.
+
+    Profiles hold
+        rows: number of rows
+        missing: per column, values empty or n/e in the export. Counted before they are filled.
+        min, max: per numeric column, ignoring missing values
+        intervals: distinct interval starts (ts)
+        resolution_minutes: most common step between interval starts
+        duplicate_ts: interval starts repeated
+        gaps: intervals missing between the starts, at the resolution
+        source_resolution_minutes: interval lengths published in the export, with sources
+    The interval fields are left out for frames without a ts column.
+
+    A frame repeating each interval over several rows, i.e. once per generation type, is
+    profiled from its intervals instead, so nothing is reduced over the repeated rows.
+
+    Input:
+        df: DataFrame. processed rows with event_date and country_id columns, or the intervals
+            of a frame repeating them
+        by: str. month or country, see PARTITIONS
+        missing: dict. per column, boolean mask or count of the missing values of each row of df,
+            for columns already filled or not in df. The other columns count their NaNs.
+        sources: dict. partition path to the interval lengths of the export the frame was built
+            from, see source_resolutions
+        repeat: int. rows of the profiled frame per row of df
+        extrema: dict. per numeric column not in df, (minima, maxima) arrays over the repeated
+            rows of each row of df
+
+    Returns a dict of partition path to profile.
+    """
+
+    with METRICS.stage('profile', rows_in=len(df) * repeat) as stage:
+        keys = _partition_keys(df, by)
+        unique, first = np.unique(keys, return_index=True)
+        # partition path of each key, from the first row holding it
+        partitions = [partition_path(df['country_id'].iloc[i],
+                                     _event_day(str(df['event_date'].iloc[i])) if by == 'month' else None)
+                      for i in first]
+        index = np.searchsorted(unique, keys)
+
+        def grouped_sum(values):
+            return np.bincount(index, weights=values, minlength=len(unique)).astype('int64')
+
+        counts = {col: grouped_sum(df[col].isna().to_numpy()) * repeat for col in df.columns}
+        counts.update({col: grouped_sum(values) for col, values in (missing or {}).items()})
+        rows = np.bincount(index, minlength=len(unique)) * repeat
+
+        numeric = [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col].dtype)]
+        grouped = df[numeric].groupby(keys)
+        minima, maxima = grouped.min().reindex(unique), grouped.max().reindex(unique)
+        for col, (row_minima, row_maxima) in (extrema or {}).items():
+            minima[col] = pd.Series(row_minima).groupby(keys).min().reindex(unique).to_numpy()
+            maxima[col] = pd.Series(row_maxima).groupby(keys).max().reindex(unique).to_numpy()
+
+        profiles = dict()
+        for i, (key, partition) in enumerate(zip(unique, partitions)):
+            profiles[partition] = {
+                'rows': int(rows[i]),
+                'missing': {col: int(count[i]) for col, count in counts.items()},
+                # per column, rows of a frame mixing int and float columns are all float
+                'min': {col: _json_number(minima.at[key, col]) for col in minima.columns},
+                'max': {col: _json_number(maxima.at[key, col]) for col in maxima.columns},
+            }
+
+        if 'ts' in df.columns:
+            order = np.lexsort((df['ts'].to_numpy(), keys))
+            ts, sorted_keys = df['ts'].to_numpy()[order], keys[order]
+            steps, step_keys = np.diff(ts), sorted_keys[1:]
+            same = step_keys == sorted_keys[:-1]
+            repeated = pd.Series(same & (steps == 0)).groupby(step_keys).sum()
+
+            advancing = same & (steps > 0)
+            steps, step_keys = steps[advancing], step_keys[advancing]
+            # most common step of each partition, ties going to the shorter one
+            frequencies = pd.DataFrame({'key': step_keys, 'step': steps}).groupby(['key', 'step']).size()
+            frequencies = frequencies.reset_index(name='n').sort_values(['key', 'n', 'step'],
+                                                                        ascending=[True, False, True])
+            resolution = frequencies.drop_duplicates('key').set_index('key')['step']
+            missed = np.maximum(steps // resolution.reindex(step_keys).to_numpy() - 1, 0)
+            gaps = pd.Series(missed).groupby(step_keys).sum()
+            intervals = np.bincount(index, minlength=len(unique))
+
+            for i, (key, partition) in enumerate(zip(unique, partitions)):
+                duplicates = int(repeated.get(key, 0))
+                step = resolution.get(key)
+                profiles[partition].update({
+                    'intervals': int(intervals[i]) - duplicates,
+                    'resolution_minutes': None if step is None else _json_number(step / 60e9),
+                    'duplicate_ts': duplicates,
+                    'gaps': int(gaps.get(key, 0)),
+                })
+
+        for partition, resolutions in (sources or {}).items():
+            if partition in profiles:
+                profiles[partition]['source_resolution_minutes'] = resolutions
+
+        stage['rows_out'] = int(rows.sum())
+
+    return profiles
+
+
+def frame_profiles(df, by='month'):
+    """
+    Partition profiles of a frame to write: the ones its clean_* function profiled before
+    filling missing values, kept in df.attrs['profile'], otherwise profile_partitions of the frame.
+    """
+
+    return df.attrs.get('profile') or profile_partitions(df, by)
+
+
+def merge_profiles(first, second):
+    """
+    Profile of a file holding the rows of the first profile followed by those of the second, i.e.
+    two chunks appended to one partition. Chunks follow each other in ts order, so a repeated
+    or missing interval at the seam is found from the last start of the first and the first
+    start of the second.
+    """
+
+    def combine(a, b, how):
+        values = [value for value in (a, b) if value is not None]
+        return how(values) if len(values) > 0 else None
+
+    merged = {
+        'rows': first['rows'] + second['rows'],
+        'missing': {col: first['missing'].get(col, 0) + second['missing'].get(col, 0)
+                    for col in {**first['missing'], **second['missing']}},
+        'min': {col: combine(first['min'].get(col), second['min'].get(col), min)
+                for col in {**first['min'], **second['min']}},
+        'max': {col: combine(first['max'].get(col), second['max'].get(col), max)
+                for col in {**first['max'], **second['max']}},
+    }
+
+    if 'intervals' in first and 'intervals' in second:
+        resolution = first['resolution_minutes'] or second['resolution_minutes']
+        seam = second['min']['ts'] - first['max']['ts']
+        merged.update({
+            'intervals': first['intervals'] + second['intervals'] - int(seam == 0),
+            'resolution_minutes': resolution,
+            'duplicate_ts': first['duplicate_ts'] + second['duplicate_ts'] + int(seam == 0),
+            'gaps': first['gaps'] + second['gaps'] +
+            (max(int(seam // (resolution * 60e9)) - 1, 0) if resolution and seam > 0 else 0),
+        })
+
+    if 'source_resolution_minutes' in first or 'source_resolution_minutes' in second:
+        merged['source_resolution_minutes'] = sorted(set(first.get('source_resolution_minutes', [])) |
+                                                     set(second.get('source_resolution_minutes', [])))
+
+    return merged
+
+
+def write_profile(output_path, output_file, profile):
+    """
+    Writes the profile of a processed file as its JSON sidecar, see profile_file.
+    Returns the sidecar path.
+    """
+
+    sidecar = profile_file(output_path, output_file)
+    os.makedirs(os.path.dirname(sidecar), exist_ok=True)
+
+    with open(sidecar, 'w') as f:
+        json.dump(dict(profile, file=os.path.basename(output_file)), f, indent=2)
+
+    return sidecar
+
+
+def write_processed(frames, output_path, filename, output_format='csv', compression=None, parquet_types=None,
+                    partition_by='month'):
+    """
+    Writes processed frames one after another to csv or parquet partitioned by country and
+    month, under country=XX/year=YYYY/month=MM/. Staging COPYs pick the partitions of their
+    window by path (see StageCSVToRedshiftOperator in the plugins).
+
+    csv: each partition goes into a single headerless csv, optionally gzip or zstd compressed.
+    Its name may depend on the first and last event dates written, so frames are appended to
+    a temporary file per partition renamed after the last one.
+
+    parquet: each frame is split into its partitions, each written as its own typed,
+    compressed file with the same columns as the csv.
+
+    Every file gets a JSON profile sidecar below processed/profiles/, see profile_partitions.
+    Frames are profiled as they are written, the profiles of a partition's frames merged.
+
+    Input:
+        frames: iterable. processed DataFrames with event_date and country_id columns
+        output_path: str. path to save
+        filename: function. builds the file name (without extension) from the first and last
+            event date (YYYYmmdd) it holds
+        output_format: str. csv or parquet
+        compression: str. gzip or zstd. None writes plain csv and snappy parquet.
+        parquet_types: dict. column types overriding PARQUET_TYPES for this output
+        partition_by: str. month, or country for csvs without an event time, see PARTITIONS
+
+    Returns a list of the saved files.
+    """
+
+    if output_format == 'parquet':
+        return write_parquet_partitions(frames, output_path, filename, compression or 'snappy', parquet_types)
+    elif output_format != 'csv':
+        raise ValueError(f'Unknown output format: {output_format}')
+
+    # partition path: [temporary file, open file, first event day, last event day, profile]
+    outputs = dict()
+    output_files = list()
+
+    try:
+        for df in frames:
+            if len(df) == 0:
+                continue
+
+            profiles = frame_profiles(df, partition_by)
+
+            for partition, part in split_partitions(df, partition_by):
+                if partition not in outputs:
+                    part_path = os.path.join(output_path, partition)
+                    os.makedirs(part_path, exist_ok=True)
+                    tmp_file = os.path.join(part_path, f'.{os.getpid()}.partial')
+                    outputs[partition] = [tmp_file, open_output(tmp_file, compression),
+                                          _event_day(str(part['event_date'].iloc[0])), None, None]
+
+                output = outputs[partition]
+                output[3] = _event_day(str(part['event_date'].iloc[-1]))
+                output[4] = profiles[partition] if output[4] is None else merge_profiles(output[4], profiles[partition])
+                with METRICS.stage('write', rows_in=len(part)) as stage:
+                    part.to_csv(output[1], index=False, header=False)
+                    stage['rows_out'] = len(part)
+
+        for partition, (tmp_file, f, start, end, profile) in outputs.items():
+            f.close()
+            output_file = os.path.join(output_path, partition, f'{filename(start, end)}{CSV_EXTENSIONS[compression]}')
+            os.replace(tmp_file, output_file)
+            write_profile(output_path, output_file, profile)
+            METRICS.add('write', nbytes=os.path.getsize(output_file), calls=0)
+            output_files.append(output_file)
+    finally:
+        for tmp_file, f, _, _, _ in outputs.values():
+            f.close()
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+    return output_files
+
+
+# csv file extension for each output compression
+CSV_EXTENSIONS = {None: '.csv', 'gzip': '.csv.gz', 'zstd': '.csv.zst'}
+
+
+# Parquet types matching the staging tables. Columns not listed are written as strings.
+PARQUET_TYPES = {
+    'ts': ('int64',),
+    'total_demand': ('decimal128', 12, 2),
+    'demand_load': ('decimal128', 12, 2),
+    'generation_load': ('decimal128', 12, 2),
+    'day_ahead_price': ('decimal128', 8, 2),
+}
+
+
+def write_parquet_partitions(frames, output_path, filename, compression='snappy', types=None):
+    """
+    Writes processed frames as compressed parquet partitioned by country and month, see
+    split_partitions, each file with its profile sidecar.
+
+    Input:
+        frames: iterable. processed DataFrames with event_date and country_id columns
+        output_path: str. the dataset directory, partitions are created below it
+        filename: function. builds the file name (without extension) from the first and last
+            event date (YYYYmmdd) in each file
+        compression: str. parquet codec, i.e. snappy, gzip or zstd
+        types: dict. column types overriding PARQUET_TYPES, i.e. {'event_date': ('timestamp', 'us')}
+
+    Returns a list of the saved files.
+    """
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = dict(PARQUET_TYPES, **(types or {}))
+    output_files = list()
+
+    for df in frames:
+        if len(df) == 0:
+            continue
+
+        profiles = frame_profiles(df)
+
+        for partition, part in split_partitions(df):
+            columns = dict()
+            for col in part.columns:
+                kind = types.get(col, ('string',))
+                if kind[0] == 'timestamp':
+                    values = pd.to_datetime(part[col].astype(str)).to_numpy(dtype=f'datetime64[{kind[1]}]')
+                    columns[col] = pa.array(values, type=pa.timestamp(kind[1]))
+                elif kind[0] == 'decimal128':
+                    # widen float32 loads before rounding so 12.3 doesn't truncate to 12.29
+                    values = pa.array(part[col].to_numpy(dtype='float64').round(kind[2]))
+                    columns[col] = values.cast(pa.decimal128(kind[1], kind[2]), safe=False)
+                else:
+                    columns[col] = pa.array(part[col].to_numpy(), type=getattr(pa, kind[0])())
+
+            event_dates = part['event_date'].astype(str)
+            part_path = os.path.join(output_path, partition)
+            os.makedirs(part_path, exist_ok=True)
+
+            output_file = os.path.join(part_path,
+                                       f'{filename(_event_day(event_dates.min()), _event_day(event_dates.max()))}.parquet')
+            with METRICS.stage('write', rows_in=len(part)) as stage:
+                pq.write_table(pa.table(columns), output_file, compression=compression)
+                stage['rows_out'] = len(part)
+                stage['bytes'] = os.path.getsize(output_file)
+            write_profile(output_path, output_file, profiles[partition])
+            output_files.append(output_file)
+
+    return output_files
+
+
+def ts_order(ts):
+    """
+    Row order sorting ts ascending, None when it already is.
+
+    Processed rows are written in the (country_id, ts) sort key order of their staging table
+    (see helpers.table_design in the plugins), so COPY adds sorted blocks and loads don't need
+    a VACUUM. Every processed file holds one country, leaving ts to order on. Exports list
+    their intervals in time order, so this is normally a single pass over ts.
+    """
+
+    ts = np.asarray(ts)
+    if (ts[1:] >= ts[:-1]).all():
+        return None
+
+    return np.argsort(ts, kind='stable')
+
+
+def sort_on_ts(df):
+    """
+    Sorts a processed frame on its ts column, see ts_order.
+    """
+
+    order = ts_order(df['ts'])
+
+    return df if order is None else df.iloc[order]
+
+
+# target resolutions in minutes time series can be resampled to. Buckets are aligned to the
+# UTC epoch and divide an hour, so they never straddle the local day boundaries chunks are cut on.
+RESOLUTIONS = [15, 30, 60]
+
+
+def interval_minutes(times):
+    """
+    Length in minutes of each interval parsed by parse_mtu, as published in the MTU.
+    """
+
+    durations = (times['interval_end'] - times['interval_start']).to_numpy(dtype='timedelta64[ns]')
+
+    return durations.astype('int64') // (60 * 10**9)
+
+
+def source_resolutions(times, country, by='month'):
+    """
+    Distinct interval lengths in minutes of the raw intervals of each partition of an export.
+
+    Input:
+        times: DataFrame. parse_mtu output
+        country: str. country of the export
+        by: str. month or country, see PARTITIONS
+
+    Returns a dict of partition path to the sorted lengths.
+    """
+
+    intervals = pd.DataFrame({'event_date': times['event_date'].to_numpy(), 'country_id': country})
+    keys = _partition_keys(intervals, by)
+    lengths = pd.DataFrame({'key': keys, 'minutes': interval_minutes(times)}).drop_duplicates()
+    first = pd.Series(np.arange(len(keys))).groupby(keys).first()
+
+    resolutions = dict()
+    for key, group in lengths.groupby('key'):
+        event_day = _event_day(str(intervals['event_date'].iloc[first[key]])) if by == 'month' else None
+        resolutions[partition_path(country, event_day)] = sorted(int(minutes) for minutes in group['minutes'])
+
+    return resolutions
+
+
+def resample(times, values, resolution, tz=DEFAULT_TIMEZONE, how='mean'):
+    """
+    Aggregates the values of published intervals to buckets of a target resolution in one
+    vectorized pass.
+
+    Each interval is split at the bucket boundaries it crosses, so 15 minute intervals fall into
+    hourly buckets whole and an hourly interval repeats into four 15 minute ones. Missing values
+    are left out of their bucket, which is missing only when all of its values are.
+
+    Input:
+        times: DataFrame. parse_mtu output, in any order
+        values: array. one row of values per interval
+        resolution: int. target minutes, see RESOLUTIONS
+        tz: str. timezone the event dates of the buckets are written in
+        how: str. mean averages the pieces of a bucket, as for loads in MW. time weights them by
+            the minutes they cover, as for prices.
+
+    Returns a tuple of (times, values, first): event_date and ts of each bucket in ts order,
+    the aggregated values and the position in times of the first interval of each bucket, i.e.
+    to carry other columns along. Intervals already at the resolution are returned as they are.
+    """
+
+    step = resolution * 60 * 10**9
+    ts = times['ts'].to_numpy()
+    durations = interval_minutes(times) * 60 * 10**9
+
+    if (durations == step).all() and (ts % step == 0).all():
+        return times, values, np.arange(len(ts))
+
+    with METRICS.stage('resample', rows_in=len(ts)) as stage:
+        # pieces of each interval, one per bucket it overlaps
+        first_bucket = ts // step
+        pieces = (ts + durations - 1) // step - first_bucket + 1
+        rows = np.repeat(np.arange(len(ts)), pieces)
+        buckets = (first_bucket[rows] + np.arange(len(rows)) - np.repeat(np.cumsum(pieces) - pieces, pieces)) * step
+
+        order = ts_order(buckets)
+        if order is not None:
+            rows, buckets = rows[order], buckets[order]
+
+        piece_values = np.asarray(values, dtype='float64')[rows]
+        present = ~np.isnan(piece_values)
+        if how == 'time':
+            weights = np.minimum(ts[rows] + durations[rows], buckets + step) - np.maximum(ts[rows], buckets)
+        else:
+            weights = np.ones(len(rows))
+        weights = present * weights.reshape(-1, *([1] * (piece_values.ndim - 1)))
+
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        # shares of their bucket's weight, so a bucket of one interval keeps its value exactly.
+        # Buckets without values get 0 / 0, missing.
+        group = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(buckets)]))
+        with np.errstate(invalid='ignore'):
+            shares = weights / np.add.reduceat(weights, starts, axis=0)[group]
+        aggregated = np.add.reduceat(np.where(present, piece_values, 0) * shares, starts, axis=0)
+
+        local = pd.DatetimeIndex(buckets[starts].view('datetime64[ns]')).tz_localize('UTC').tz_convert(tz)
+        resampled = pd.DataFrame({'event_date': format_event_date(local), 'ts': buckets[starts]})
+        stage['rows_out'] = len(resampled)
+
+    return resampled, aggregated.astype(np.asarray(values).dtype), rows[starts]
+
+
+def clean_capacity_demand(df, country):
+    """
+    Appends country information and cleans the period of an installed capacity frame.
+    Columns are already named and typed by schemas.SCHEMAS.
+    """
+
+    # add country name
+    df['country_id'] = country
+
+    #gross quick solution. refactor total_demand into own function.
+    df['event_date'] = df['event_date'].str.replace("-", "") \
+        .str.replace(":", "") \
+        .str.split("+").str[0]
+
+    return df
+
+
+def process_capacity_demand_file(path_in_str, country, output_path, name, chunksize=None,
+                                 output_format='csv', compression=None, reader=RAW_READER, resolution=None):
+    """
+    Prepares a single capacity csv from the ENTOSE API for the data warehouse.
+    Appends country information and renames columns
+
+    Input:
+        path_in_str: str. path to the raw csv
+        country: str. country the csv belongs to
+        output_path: str. path to save
+        name: str. prefix of the saved file
+        chunksize: int. stream the csv in chunks of this many rows. None loads it whole.
+        output_format: str. ignored, capacity files have no event time to partition on and
+            are always written as csv
+        compression: str. gzip or zstd compress the csv. None leaves it uncompressed.
+        reader: str. arrow or pandas csv parser, see RAW_READERS
+        resolution: int. ignored, capacity files are not a time series
+
+    Returns a list of the saved files.
+    """
+
+    frames, _ = read_export(path_in_str, 'installed_capacity', country, chunksize, reader)
+    frames = (clean_capacity_demand(df, country) for df in frames)
+
+    # this datetime year reference also must be refactored.
+    output_files = write_processed(frames, output_path,
+                                   lambda start, end: f'{name}-{country}-{datetime.datetime.now().year}',
+                                   compression=compression, partition_by='country')
+    print(f'Saved: {country}')
+
+    return output_files
+
+
+def process_capacity_demand(country_paths, output_path, name, chunksize=None, reader=RAW_READER, resolution=None):
+    """
+    Prepares capacity csvs from the ENTOSE API for the data warehouse.
     Appends country information and renames columns
 
     country_paths: dict. country and path to csvs with installed capcity data
-    new_cols: list. list of new columns headers
+    chunksize: int. stream each csv in chunks of this many rows. None loads them whole.
+    reader: str. arrow or pandas csv parser, see RAW_READERS
+    resolution: int. ignored, capacity files are not a time series
     """
 
     for country, path_in_strs in country_paths.items():
         for path_in_str in path_in_strs:
-            # load dataframe
-            df = pd.read_csv(path_in_str)
+            process_capacity_demand_file(path_in_str, country, output_path, name, chunksize,
+                                         reader=reader, resolution=resolution)
+
+
+def clean_total_demand(df, country, tz=DEFAULT_TIMEZONE, resolution=None):
+    """
+    Parses times and fills missing values of a total demand frame read by read_export.
+    Loads are averaged to buckets of resolution minutes when given, see resample.
+    The partitions are profiled before filling, see profile_partitions.
+    """
+
+    times = parse_mtu(df.pop('mtu'), tz)
+    sources = source_resolutions(times, country)
+    if resolution is not None:
+        times, values, _ = resample(times, df.to_numpy(), resolution, tz)
+        df = pd.DataFrame(values, columns=df.columns)
+
+    # add country name
+    df['country_id'] = country
+
+    df.insert(0, 'event_date', times['event_date'].to_numpy())
+    df['ts'] = times['ts'].to_numpy()
+
+    profile = profile_partitions(df, sources=sources)
+    df = sort_on_ts(df.fillna(0))
+    df.attrs['profile'] = profile
+
+    return df
 
-            # add country name
-            df['country_id'] = country
 
-            # rename columns
-            if new_cols is not None:
-                if 'Unnamed: 0' in df.columns:
-                    df.drop('Unnamed: 0', axis=1, inplace=True)
+def process_total_demand_file(path_in_str, country, output_path, chunksize=None, output_format='csv',
+                              compression=None, reader=RAW_READER, resolution=None):
+    """
+    Prepares a single total demand csv from the ENTOSE database for the data warehouse.
+
+    Input:
+        path_in_str: str. path to the raw csv
+        country: str. country the csv belongs to
+        output_path: str. path to save
+        chunksize: int. stream the csv in chunks of this many rows. None loads it whole.
+        output_format: str. csv or parquet
+        compression: str. gzip or zstd. None writes plain csv and snappy parquet.
+        reader: str. arrow or pandas csv parser, see RAW_READERS
+        resolution: int. resample to this many minutes, see RESOLUTIONS. None keeps the export's.
+
+    Returns a list of the saved files.
+    """
+
+    frames, tz = read_export(path_in_str, 'total_demand', country, chunksize, reader)
+    frames = (clean_total_demand(df, country, tz, resolution) for df in frames)
 
-                assert len(new_cols) == len(df.columns), f'new_cols must be length {len(df.columns)}'
-                df.columns = new_cols
+    output_files = write_processed(frames, output_path,
+                                   lambda start, end: f'demand-{country}-{start}-{end}',
+                                   output_format, compression)
+    print(f'Saved: {country}')
 
-            #gross quick solution. refactor total_demand into own function.
-            if 'event_date' in df.columns:
-                df['event_date'] = df['event_date'].str.replace("-", "") \
-                    .str.replace(":", "") \
-                    .apply(lambda x: x.split("+")[0])
+    return output_files
 
-            # save dataframe
-            # this datetime year reference also must be refactored.
-            df.to_csv(os.path.join(output_path, f'{name}-{country}-{datetime.datetime.now().year}.csv'),
-                      index=False, header=False)
-            print(f'Saved: {country}')
 
-def process_total_demand(country_paths, output_path):
+def process_total_demand(country_paths, output_path, chunksize=None, output_format='csv', compression=None,
+                         reader=RAW_READER, resolution=None):
     """
      Prepares the total demand csvs from the ENTOSE database for the data warehouse.
 
      Input:
          country_paths: dict. dict. country and path to csvs with total generation data
          output_path: str. path to save
+         chunksize: int. stream each csv in chunks of this many rows. None loads them whole.
+         output_format: str. csv or parquet
+         compression: str. gzip or zstd. None writes plain csv and snappy parquet.
+         reader: str. arrow or pandas csv parser, see RAW_READERS
+         resolution: int. resample to this many minutes, see RESOLUTIONS. None keeps the
+             resolution of each export.
      """
 
-
     for country, path_in_strs in country_paths.items():
         for path_in_str in path_in_strs:
-            # load dataframe
-            df = pd.read_csv(path_in_str)
+            process_total_demand_file(path_in_str, country, output_path, chunksize, output_format, compression,
+                                      reader=reader, resolution=resolution)
 
-            # add country name
-            df['country_id'] = country
 
-            ## clean column headers
-            df.columns = [x[0].strip().lower() for x in df.columns.str.split(" ")]
-            df = df.drop('day-ahead', axis=1)
-            df.rename(columns={'actual': 'total_demand'}, inplace=True)
+def clean_total_generation(df, country, tz=DEFAULT_TIMEZONE, resolution=None):
+    """
+    Parses times and unpivots a wide total generation frame read by read_export into long format.
+
+    The long frame repeats every identifier once per generation type, so instead of melting
+    object columns it is built from integer codes: event_date, country_id, area and
+    generation_type are categoricals, ts stays int64 and loads are float32. 'n/e' is read as
+    missing already (see schemas.SCHEMAS). Missing loads are 0, counted in the partition
+    profiles first, which are built from the rows of the wide frame and their missing loads
+    rather than from the long frame (see profile_partitions).
+    Loads are averaged to buckets of resolution minutes when given, see resample.
+
+    Rows are unpivoted interval by interval, all generation types of one ts after another, so
+    the long frame is in ts order like the staging table's sort key (see ts_order).
+    """
 
-            df['event_date'] = df['time'].apply(lambda x: pd.to_datetime(x.split("-")[0]))
-            df = df.drop('time', axis=1)
-            df = df.set_index('event_date')
-            df.index = df.index.tz_localize(tz='Europe/Brussels',
-                                            ambiguous='infer',
-                                            nonexistent='shift_backward')
+    ## parse interval start into event_date and a timestamp column
+    times = parse_mtu(df.pop('mtu'), tz)
+    area = df.pop('area')
+    sources = source_resolutions(times, country)
+
+    values = df.to_numpy(dtype='float32')
+    if resolution is not None:
+        times, values, first = resample(times, values, resolution, tz)
+        area = area.iloc[first]
+
+    with METRICS.stage('melt', rows_in=len(values)) as stage:
+        rows, types = values.shape
+
+        order = ts_order(times['ts'])
+        if order is not None:
+            values, times, area = values[order], times.iloc[order], area.iloc[order]
+
+        ## unpivot data into long format, row by row
+        loads = values.ravel()
+        ## fill mising values
+        missing = np.isnan(loads)
+        loads[missing] = 0
+
+        event_date_codes, event_dates = pd.factorize(times['event_date'])
+        area_codes, areas = pd.factorize(area)
+        # pumped storage generation and consumption share a cleaned header
+        type_codes, generation_types = pd.factorize(df.columns)
+
+        df = pd.DataFrame({
+            'event_date': pd.Categorical.from_codes(np.repeat(event_date_codes, types), event_dates),
+            'ts': np.repeat(times['ts'].to_numpy(), types),
+            'country_id': pd.Categorical.from_codes(np.zeros(rows * types, dtype='int8'), [country]),
+            'area': pd.Categorical.from_codes(np.repeat(area_codes, types), areas),
+            'generation_type': pd.Categorical.from_codes(np.tile(type_codes, rows), generation_types),
+            'generation_load': loads,
+        })
+        stage['rows_out'] = len(df)
+
+    # profiled from the intervals of the wide frame, see profile_partitions
+    intervals = pd.DataFrame({
+        'event_date': pd.Categorical.from_codes(event_date_codes, event_dates),
+        'ts': times['ts'].to_numpy(),
+        'country_id': pd.Categorical.from_codes(np.zeros(rows, dtype='int8'), [country]),
+        'area': pd.Categorical.from_codes(area_codes, areas),
+    })
+    loads = loads.reshape(rows, types)
+    missing = {'generation_type': np.zeros(rows, dtype='int64'),
+               'generation_load': missing.reshape(rows, types).sum(axis=1)}
+    df.attrs['profile'] = profile_partitions(intervals, missing=missing, sources=sources, repeat=types,
+                                             extrema={'generation_load': (loads.min(axis=1), loads.max(axis=1))})
+
+    return df
+
+
+def process_total_generation_file(path_in_str, country, output_path, chunksize=None, output_format='csv',
+                                  compression=None, reader=RAW_READER, resolution=None):
+    """
+    Prepares a single total generation csv from the ENTOSE database for the data warehouse.
 
-            df['ts'] = df.index.asi8
-            df.index = df.index.strftime("%Y%m%d %H%M%S")
-            df.fillna(0, inplace=True)
+    Chunks are cut on day boundaries and unpivoted in ts order, so the output is the same
+    with or without chunksize.
 
-            # get date ranges
-            start = df.index[0].split(" ")[0]
-            end = df.index[-1].split(" ")[0]
+    Input:
+        path_in_str: str. path to the raw csv
+        country: str. country the csv belongs to
+        output_path: str. path to save
+        chunksize: int. stream the csv in chunks of this many rows. None loads it whole.
+        output_format: str. csv or parquet
+        compression: str. gzip or zstd. None writes plain csv and snappy parquet.
+        reader: str. arrow or pandas csv parser, see RAW_READERS
+        resolution: int. resample to this many minutes, see RESOLUTIONS. None keeps the export's.
 
-            # save dataframe
-            df = df.reset_index()
+    Returns a list of the saved files.
+    """
 
-            # save dataframe
-            df.to_csv(os.path.join(output_path, f'demand-{country}-{start}-{end}.csv'),
-                      index=False, header=False)
-            print(f'Saved: {country}')
+    frames, tz = read_export(path_in_str, 'total_generation', country, chunksize, reader)
+    frames = (clean_total_generation(df, country, tz, resolution) for df in frames)
 
+    output_files = write_processed(frames, output_path,
+                                   lambda start, end: f'generation-{country}-{start}-{end}',
+                                   output_format, compression)
+    print(f'Saved: {country}')
 
-def process_total_generation(country_paths, output_path):
+    return output_files
+
+
+def process_total_generation(country_paths, output_path, chunksize=None, output_format='csv', compression=None,
+                             reader=RAW_READER, resolution=None):
     """
     Prepares the total generation csvs from the ENTOSE database for the data warehouse.
 
     Input:
         country_paths: dict. dict. country and path to csvs with total generation data
         output_path: str. path to save
+        chunksize: int. stream each csv in chunks of this many rows. None loads them whole.
+        output_format: str. csv or parquet
+        compression: str. gzip or zstd. None writes plain csv and snappy parquet.
+        reader: str. arrow or pandas csv parser, see RAW_READERS
+        resolution: int. resample to this many minutes, see RESOLUTIONS. None keeps the
+            resolution of each export.
     """
 
     for country, path_in_strs in country_paths.items():
         for path_in_str in path_in_strs:
-            # load dataframe
-            df = pd.read_csv(path_in_str)
+            process_total_generation_file(path_in_str, country, output_path, chunksize, output_format, compression,
+                                          reader=reader, resolution=resolution)
+
+
+def clean_day_ahead_prices(df, country, tz=DEFAULT_TIMEZONE, resolution=None):
+    """
+    Parses times and fills missing values of a day ahead prices frame read by read_export.
+    Prices are weighted by the time they apply to in buckets of resolution minutes when given,
+    see resample. The partitions are profiled before filling, see profile_partitions.
+    """
+
+    ## parse interval start into event_date and a timestamp column to keep timezone information
+    times = parse_mtu(df.pop('mtu'), tz)
+    sources = source_resolutions(times, country)
+    if resolution is not None:
+        times, values, _ = resample(times, df.to_numpy(), resolution, tz, how='time')
+        df = pd.DataFrame(values, columns=df.columns)
 
-            # add country name
-            df['country_id'] = country
+    # add country name
+    df['country_id'] = country
 
-            ## clean column headers
-            df.columns = [x[0].strip().lower() for x in df.columns.str.split("-")]
+    df.insert(0, 'event_date', times['event_date'].to_numpy())
+    df['ts'] = times['ts'].to_numpy()
 
-            ## parse datetime and set index as dt object
-            df['event_date'] = df['mtu'].apply(lambda x: pd.to_datetime(x.split("-")[0]))
-            df = df.drop('mtu', axis=1)
-            df = df.set_index('event_date')
-            df.index = df.index.tz_localize(tz='Europe/Brussels',
-                                            ambiguous='infer',
-                                            nonexistent='shift_backward')
+    profile = profile_partitions(df, sources=sources)
+    ## fill missing values
+    df = sort_on_ts(df.fillna(0))
+    df.attrs['profile'] = profile
 
-            ## Add a timestamp column
-            df['ts'] = df.index.asi8
+    return df
 
-            ## format index times for aws YYYY-MM-DD HH:MM:SS
-            df.index = df.index.strftime("%Y%m%d %H%M%S")
 
-            # get date ranges
-            start = df.index[0].split(" ")[0]
-            end = df.index[-1].split(" ")[0]
+def process_day_ahead_prices_file(path_in_str, country, output_path, chunksize=None, output_format='csv',
+                                  compression=None, reader=RAW_READER, resolution=None):
+    """
+    Prepares a single day ahead prices csv from the ENTOSE database for the data warehouse.
 
-            ## unpivot data into long format
-            df = df.reset_index().melt(id_vars=['event_date', 'ts', 'country_id', 'area'],
-                                       var_name='generation_type',
-                                       value_name='generation_load')
+    Input:
+        path_in_str: str. path to the raw csv
+        country: str. country the csv belongs to
+        output_path: str. path to save
+        chunksize: int. stream the csv in chunks of this many rows. None loads it whole.
+        output_format: str. csv or parquet
+        compression: str. gzip or zstd. None writes plain csv and snappy parquet.
+        reader: str. arrow or pandas csv parser, see RAW_READERS
+        resolution: int. resample to this many minutes, see RESOLUTIONS. None keeps the export's.
 
-            ## fill mising values
-            df['generation_load'] = df['generation_load'].replace('n/e', 0).astype('float')
-            df['generation_load'].fillna(0, inplace=True)
+    Returns a list of the saved files.
+    """
 
-            # save dataframe
-            df.to_csv(os.path.join(output_path, f'generation-{country}-{start}-{end}.csv'),
-                      index=False, header=False)
-            print(f'Saved: {country}')
+    frames, tz = read_export(path_in_str, 'day_ahead_prices', country, chunksize, reader)
+    frames = (clean_day_ahead_prices(df, country, tz, resolution) for df in frames)
 
+    output_files = write_processed(frames, output_path,
+                                   lambda start, end: f'day-ahead-prices-{country}-{start}-{end}',
+                                   output_format, compression)
+    print(f'Saved: {country}')
 
-def process_day_ahead_prices(country_paths, output_path):
+    return output_files
+
+
+def process_day_ahead_prices(country_paths, output_path, chunksize=None, output_format='csv', compression=None,
+                             reader=RAW_READER, resolution=None):
     """
     Prepares the day ahead prices csvs from the ENTOSE database for the data warehouse.
 
     Input:
         country_paths: dict. dict. country and path to csvs with total generation data
         output_path: str. path to save
+        chunksize: int. stream each csv in chunks of this many rows. None loads them whole.
+        output_format: str. csv or parquet
+        compression: str. gzip or zstd. None writes plain csv and snappy parquet.
+        reader: str. arrow or pandas csv parser, see RAW_READERS
+        resolution: int. resample to this many minutes, see RESOLUTIONS. None keeps the
+            resolution of each export.
 
     """
 
     for country, path_in_strs in country_paths.items():
         for path_in_str in path_in_strs:
-            # load dataframe
-            df = pd.read_csv(path_in_str)
+            process_day_ahead_prices_file(path_in_str, country, output_path, chunksize, output_format, compression,
+                                          reader=reader, resolution=resolution)
+
+
+def overlapping_files(root_path, dataset, country, period_start, period_end):
+    """
+    Raw files of a dataset and country whose ENTSO-E period overlaps [period_start, period_end).
+    Files without a period in their name are always included.
+    """
+
+    path = os.path.join(root_path, dataset, country)
+    files = sorted(str(p) for p in Path(path).glob('*.csv'))
+
+    if period_start is None:
+        return files
+
+    overlapping = list()
+    for path_in_str in files:
+        start, end = parse_period(path_in_str)
+        if start is None or (start < period_end and end > period_start):
+            overlapping.append(path_in_str)
+
+    return overlapping
+
+
+def read_cleaned(path_in_strs, dataset, clean, country, reader=RAW_READER, resolution=None):
+    """
+    Reads and cleans whole raw files of a dataset into one frame, keeping the last row of each ts.
+    """
+
+    frames = list()
+    for path_in_str in path_in_strs:
+        dfs, tz = read_export(path_in_str, dataset, country, reader=reader)
+        frames.extend(clean(df, country, tz, resolution) for df in dfs)
+
+    if len(frames) == 0:
+        return None
+
+    # duplicate downloads and overlapping periods repeat rows
+    return pd.concat(frames, ignore_index=True).drop_duplicates('ts', keep='last')
+
+
+def join_energy_loads(generation, demand, prices):
+    """
+    Joins demand and prices onto long generation rows of one country by ts.
+
+    Same result as EuroEnergyQueries.energy_loads_table_insert: both are left joins and prices
+    only match rows that have a demand. Keys are aligned with a hash lookup of the generation
+    ts in the demand and price ts instead of a sort merge.
+
+    Input:
+        generation: DataFrame. clean_total_generation output
+        demand: DataFrame. clean_total_demand output with unique ts, or None
+        prices: DataFrame. clean_day_ahead_prices output with unique ts, or None
+
+    Returns a DataFrame with the energy_loads columns, event_date as "YYYY-mm-dd HH:MM:SS".
+    """
+
+    ts = generation['ts'].to_numpy()
+
+    def lookup(df, column):
+        """
+        Values of column at each generation ts, NaN where there is no row. Returns (values, matched).
+        """
+        if df is None:
+            return np.full(len(ts), np.nan), np.zeros(len(ts), dtype=bool)
+        idx = pd.Index(df['ts'].to_numpy()).get_indexer(ts)
+        values = df[column].to_numpy(dtype='float64')[idx]
+        values[idx < 0] = np.nan
+        return values, idx >= 0
+
+    demand_load, has_demand = lookup(demand, 'total_demand')
+    day_ahead_price, _ = lookup(prices, 'day_ahead_price')
+    # prices are joined on the demand row
+    day_ahead_price[~has_demand] = np.nan
+
+    # reformat only the distinct event dates, "YYYYmmdd HHMMSS" to "YYYY-mm-dd HH:MM:SS"
+    event_date = generation['event_date'].astype('category')
+    days = event_date.cat.categories.astype(str)
+    event_date = event_date.cat.rename_categories(
+        days.str.slice(0, 4) + '-' + days.str.slice(4, 6) + '-' + days.str.slice(6, 8) + ' ' +
+        days.str.slice(9, 11) + ':' + days.str.slice(11, 13) + ':' + days.str.slice(13, 15))
+
+    return pd.DataFrame({
+        'event_date': event_date.to_numpy(),
+        'country_id': generation['country_id'].to_numpy(),
+        'generation_type': generation['generation_type'].to_numpy(),
+        'day_ahead_price': day_ahead_price,
+        'demand_load': demand_load,
+        'generation_load': generation['generation_load'].to_numpy(),
+    })
+
+
+def process_energy_loads_file(path_in_str, country, output_path, root_path='./data/raw', chunksize=None,
+                              output_format='csv', compression=None, reader=RAW_READER, resolution=None):
+    """
+    Builds the energy_loads fact rows of a single total generation csv locally.
+
+    Demand and prices of the same country covering the generation file's period are read
+    whole and joined onto each generation chunk, so the output can be copied into energy_loads
+    as is instead of joining the staging tables in the warehouse. All three are resampled to the
+    same resolution first, so their ts line up.
+
+    Input:
+        path_in_str: str. path to the raw total generation csv
+        country: str. country the csv belongs to
+        output_path: str. path to save
+        root_path: str. the raw data directory to find demand and prices in
+        chunksize: int. stream the generation csv in chunks of this many rows. None loads it whole.
+        output_format: str. csv or parquet
+        compression: str. gzip or zstd. None writes plain csv and snappy parquet.
+        reader: str. arrow or pandas csv parser, see RAW_READERS
+        resolution: int. resample to this many minutes, see RESOLUTIONS. None keeps the export's.
+
+    Returns a list of the saved files.
+    """
+
+    period_start, period_end = parse_period(path_in_str)
+
+    demand = read_cleaned(overlapping_files(root_path, 'total_demand', country, period_start, period_end),
+                          'total_demand', clean_total_demand, country, reader, resolution)
+    prices = read_cleaned(overlapping_files(root_path, 'day_ahead_prices', country, period_start, period_end),
+                          'day_ahead_prices', clean_day_ahead_prices, country, reader, resolution)
+
+    frames, tz = read_export(path_in_str, 'total_generation', country, chunksize, reader)
+    frames = (join_energy_loads(clean_total_generation(df, country, tz, resolution), demand, prices)
+              for df in frames)
+
+    output_files = write_processed(frames, output_path,
+                                   lambda start, end: f'energy-loads-{country}-{start}-{end}',
+                                   output_format, compression, {'event_date': ('timestamp', 'us')})
+    print(f'Saved: {country}')
+
+    return output_files
+
+
+# Each dataset under data/raw and the per-file function (plus arguments) that processes it.
+# Datasets are processed in this order.
+DATASETS = {
+    'total_demand': (process_total_demand_file, {}),
+    'installed_capacity': (process_capacity_demand_file, {'name': 'capacity'}),
+    'total_generation': (process_total_generation_file, {}),
+    'day_ahead_prices': (process_day_ahead_prices_file, {}),
+}
+
+# Fact tables built locally from the raw datasets, one unit per raw file of the first dataset.
+FACTS = {
+    'energy_loads': (process_energy_loads_file, ['total_generation', 'total_demand', 'day_ahead_prices']),
+}
+
+
+def unit_timezones(units):
+    """
+    Timezone the event dates of each country of (dataset, country, file) units are in.
+
+    energy_loads takes its event dates from the generation exports, so their timezone wins,
+    then the one of the other time series. Countries with only installed capacity, which has
+    no event time, get the local zone of their area.
+
+    Returns a dict of country to timezone.
+    """
+
+    order = FACTS['energy_loads'][1]
+    rank = {dataset: i for i, dataset in enumerate(order)}
+    timezones = dict()
+
+    for dataset, country, path_in_str in sorted(units, key=lambda unit: rank.get(unit[0], len(order))):
+        if country in timezones:
+            continue
+        if dataset in rank:
+            timezones[country] = export_timezone(pd.read_csv(path_in_str, nrows=SAMPLE_ROWS, dtype=str), country)
+        else:
+            timezones[country] = area_timezone(country)
+
+    return timezones
+
+
+def build_work_units(root_path, datasets=None, countries=None):
+    """
+    Lists every (dataset, country, file) unit of work found under the raw data directory.
+
+    Input:
+        root_path: str. the raw data directory holding one folder per dataset
+        datasets: list. dataset names to include. Defaults to all of DATASETS.
+        countries: list. country folders to include. Defaults to all of them.
+    """
+
+    units = list()
+
+    for dataset in (DATASETS.keys() if datasets is None else datasets):
+        country_paths = traverse_path(os.path.join(root_path, dataset), -2)
+        for country, path_in_strs in country_paths.items():
+            if countries is not None and country not in countries:
+                continue
+            for path_in_str in sorted(path_in_strs):
+                units.append((dataset, country, path_in_str))
+
+    return units
+
+
+def build_fact_units(root_path, changed=None, facts=None, countries=None):
+    """
+    Lists the (fact, country, file) units of work of the FACTS tables.
+
+    Input:
+        root_path: str. the raw data directory holding one folder per dataset
+        changed: list. (dataset, country, file) units processed in this run. Only facts of
+            countries and periods touched by one of their source datasets are listed.
+            None lists them all.
+        facts: list. fact names to include. Defaults to all of FACTS.
+        countries: list. country folders to include. Defaults to all of them.
+    """
+
+    units = list()
+
+    for fact, (_, sources) in FACTS.items():
+        if facts is not None and fact not in facts:
+            continue
+
+        touched = None if changed is None else \
+            [(country, parse_period(path_in_str)) for dataset, country, path_in_str in changed if dataset in sources]
+
+        for _, country, path_in_str in build_work_units(root_path, sources[:1], countries):
+            if touched is not None:
+                start, end = parse_period(path_in_str)
+                if not any(country == other and (start is None or other_start is None or
+                                                 (other_start < end and other_end > start))
+                           for other, (other_start, other_end) in touched):
+                    continue
+            units.append((fact, country, path_in_str))
+
+    return units
 
-            # add country name
-            df['country_id'] = country
 
-            ## clean column headers
-            df.columns = [x[0].strip().lower() for x in df.columns.str.split(" ")]
-            df.rename(columns={'day-ahead': 'day_ahead_price'}, inplace=True)
+def process_unit(unit, output_path, **options):
+    """
+    Processes one (dataset, country, file) unit. Safe to run in a worker process.
+
+    Input:
+        unit: tuple. (dataset, country, path to raw csv)
+        output_path: str. output directory template formatted with the dataset name
+        options: passed on to the per-file function, i.e. chunksize, output_format and compression
+
+    Returns a tuple of (unit, list of saved files or None, error message or None, stage metrics).
+    """
+
+    dataset, country, path_in_str = unit
+    func, kwargs = DATASETS[dataset] if dataset in DATASETS else (FACTS[dataset][0], {})
+
+    with METRICS.unit(dataset, country) as metrics:
+        try:
+            output_files = func(path_in_str, country, output_path.format(dataset), **options, **kwargs)
+            error = None
+        except Exception as e:
+            output_files, error = None, f'{type(e).__name__}: {e}'
+
+    return unit, output_files, error, metrics
+
+
+def process_units(units, output_path, workers=1, profile_dir=None, **options):
+    """
+    Processes units of work serially or across a pool of worker processes.
+
+    Input:
+        units: list. (dataset, country, file) tuples from build_work_units
+        output_path: str. output directory template formatted with the dataset name
+        workers: int. number of worker processes. 1 processes in the current process.
+        profile_dir: str. dump cProfile stats of every stage into this directory
+        options: passed on to the per-file functions, i.e. chunksize, output_format and compression
+
+    Returns a tuple of (results, errors) lists, each holding process_unit tuples in unit order.
+    The stage metrics of all units are merged into METRICS.
+    """
 
-            if df['day_ahead_price'].dtype == 'O':
-                df['day_ahead_price'] = df['day_ahead_price'].apply(lambda x: str(x).split(" ")[0]).astype('float')
+    run = partial(process_unit, output_path=output_path, **options)
 
-            ## parse datetime and set index as dt object
-            df['event_date'] = df['mtu'].apply(lambda x: pd.to_datetime(x.split("-")[0]))
-            df = df.drop('mtu', axis=1)
-            df = df.set_index('event_date')
-            df.index = df.index.tz_localize(tz='Europe/Brussels',
-                                            ambiguous='infer',
-                                            nonexistent='shift_backward')
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=METRICS.configure,
+                                 initargs=(profile_dir,)) as executor:
+            outcomes = list(executor.map(run, units))
+    else:
+        METRICS.configure(profile_dir)
+        outcomes = [run(unit) for unit in units]
 
-            ## Add a timestamp column to keep timezone information
-            df['ts'] = df.index.asi8
+    for outcome in outcomes:
+        METRICS.merge(outcome[3])
 
-            ## format index times for aws YYYY-MM-DD HH:MM:SS
-            df.index = df.index.strftime("%Y%m%d %H%M%S")
+    results = [outcome for outcome in outcomes if outcome[2] is None]
+    errors = [outcome for outcome in outcomes if outcome[2] is not None]
 
-            ## fill missing values
-            df.fillna(0, inplace=True)
+    for (dataset, country, path_in_str), _, error, _ in errors:
+        logging.error(f'Processing failed: {dataset} {country} {path_in_str}: {error}')
 
-            # get date ranges
-            start = df.index[0].split(" ")[0]
-            end = df.index[-1].split(" ")[0]
+    return results, errors
 
-            # save dataframe
-            df = df.reset_index()
-            df.to_csv(os.path.join(output_path, f'day-ahead-prices-{country}-{start}-{end}.csv'),
-                      index=False, header=False)
-            print(f'Saved: {country}')
 
+def s3_client(workers=UPLOAD_WORKERS, endpoint_url=None, credentials=None):
+    """
+    A single S3 client shared by all upload threads. Uses the given credentials, else the
+    AWS_USER/AWS_KEY environment variables when set, otherwise the default boto3 credential chain.
+
+    Input:
+        workers: int. number of concurrent uploads the connection pool is sized for
+        endpoint_url: str. alternative S3 endpoint, i.e. a local stand-in for testing
+        credentials: dict. aws_access_key_id and aws_secret_access_key, i.e. of an Airflow connection
+    """
+
+    credentials = dict(credentials or {})
+    if len(credentials) == 0 and 'AWS_USER' in os.environ and 'AWS_KEY' in os.environ:
+        credentials = {'aws_access_key_id': os.environ['AWS_USER'],
+                       'aws_secret_access_key': os.environ['AWS_KEY']}
+
+    pool_size = workers * UPLOAD_TRANSFER_CONFIG.max_request_concurrency
+
+    return boto3.client('s3', endpoint_url=endpoint_url,
+                        config=Config(max_pool_connections=pool_size),
+                        **credentials)
 
 
-def upload_data(path, bucketname):
+def local_etag(path_in_str, chunksize=UPLOAD_TRANSFER_CONFIG.multipart_chunksize,
+               threshold=UPLOAD_TRANSFER_CONFIG.multipart_threshold):
+    """
+    The ETag S3 assigns to a file uploaded with the given multipart settings.
+    Single part uploads get the md5 of the content, multipart uploads the md5 of the part md5s.
+    """
+
+    if os.path.getsize(path_in_str) < threshold:
+        digest = hashlib.md5()
+        with open(path_in_str, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return f'"{digest.hexdigest()}"'
+
+    parts = list()
+    with open(path_in_str, 'rb') as f:
+        for block in iter(lambda: f.read(chunksize), b''):
+            parts.append(hashlib.md5(block).digest())
 
-    client = boto3.client(
-        's3',
-        aws_access_key_id=os.environ['AWS_USER'],
-        aws_secret_access_key=os.environ['AWS_KEY'])
-    s3c = boto3.client('s3')
-    s3 = boto3.resource('s3')
+    return f'"{hashlib.md5(b"".join(parts)).hexdigest()}-{len(parts)}"'
 
-    for root, dirs, files in os.walk(path):
 
-        head = ('/').join(root.split('/')[-1:])
+def list_bucket(client, bucketname, prefix):
+    """
+    Size and ETag of every object under a prefix, from one paginated listing.
+    """
+
+    objects = dict()
+    paginator = client.get_paginator('list_objects_v2')
 
-        objs = list(s3.Bucket(bucketname).objects.filter(Prefix=head))
+    for page in paginator.paginate(Bucket=bucketname, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            objects[obj['Key']] = (obj['Size'], obj['ETag'])
 
-        # skip enmpty head path
-        if len(head) == 0:
+    return objects
+
+
+def upload_data(path, bucketname, workers=UPLOAD_WORKERS, client=None, prefixes=None):
+    """
+    Uploads the processed files to S3, keyed by their path relative to the processed directory.
+
+    Each prefix is listed once and files whose size and ETag already match the object in the
+    bucket are skipped. The rest are uploaded concurrently over one shared client.
+
+    Input:
+        path: str. the processed data directory
+        bucketname: str. target bucket
+        workers: int. number of concurrent uploads
+        client: boto3 S3 client. Defaults to s3_client(workers)
+        prefixes: list. directories below path to upload, i.e. ['total_demand/country=BE'].
+            Defaults to every dataset.
+
+    Returns a dict with the number of files uploaded and skipped, bytes uploaded and seconds taken.
+    """
+
+    client = client or s3_client(workers)
+    start_time = time.perf_counter()
+
+    uploads, skipped = list(), 0
+
+    if prefixes is None:
+        prefixes = sorted(os.listdir(path))
+
+    for prefix in prefixes:
+        if not os.path.isdir(os.path.join(path, prefix)):
             continue
 
-        if len(objs) > 0:
-            aws_head = ('/').join(objs[0].key.split('/')[:2])
-            if aws_head != head:
-                s3c.put_object(Bucket=bucketname, Key=(head + '/'))
-                print(f'New directory: {head}')
-        elif len(objs) == 0:
-            s3c.put_object(Bucket=bucketname, Key=(head + '/'))
-            print(f'New directory: {head}')
+        existing = list_bucket(client, bucketname, f'{prefix.strip("/")}/')
+
+        for root, dirs, files in os.walk(os.path.join(path, prefix)):
+            for file in sorted(files):
+                # skip finder metadata and partially written outputs
+                if file.startswith('.'):
+                    continue
+
+                local = os.path.join(root, file)
+                key = os.path.relpath(local, path).replace(os.sep, '/')
+                size = os.path.getsize(local)
+
+                if existing.get(key, (None, None))[0] == size and \
+                        existing[key][1] == local_etag(local, UPLOAD_TRANSFER_CONFIG.multipart_chunksize,
+                                                       UPLOAD_TRANSFER_CONFIG.multipart_threshold):
+                    skipped += 1
+                    continue
+
+                uploads.append((local, key, size))
+
+    def upload(item):
+        local, key, size = item
+        start = time.perf_counter()
+        client.upload_file(local, bucketname, key, Config=UPLOAD_TRANSFER_CONFIG)
+        # uploads run concurrently, so upload seconds add up to more than the wall time
+        METRICS.add('upload', time.perf_counter() - start, nbytes=size, dataset=key.split('/')[0], country='all')
+        print(f'{key}')
+        return size
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        uploaded_bytes = sum(executor.map(upload, uploads))
+
+    seconds = time.perf_counter() - start_time
+    summary = {'uploaded': len(uploads),
+               'skipped': skipped,
+               'bytes': uploaded_bytes,
+               'seconds': seconds,
+               'bytes_per_sec': uploaded_bytes / seconds if seconds > 0 else 0.0}
+
+    print(f'Uploaded {len(uploads)} files ({uploaded_bytes / 1e6:.1f} MB) in {seconds:.1f}s '
+          f'at {summary["bytes_per_sec"] / 1e6:.2f} MB/s. {skipped} unchanged')
+    logging.info(f'Upload summary: {summary}')
+
+    return summary
+
+
+def build_manifests(output_files, path, bucketname):
+    """
+    Builds a Redshift COPY manifest per dataset listing exactly the given output files.
+
+    Input:
+        output_files: list. processed files written in this run
+        path: str. the processed data directory the files live under
+        bucketname: str. bucket the files are uploaded to
+
+    Returns a dict of dataset name to manifest.
+    """
+
+    manifests = dict()
 
-        for file in files:
-            if file != '.DS_Store':
-                print(f'{head}/{file}')
-                s3c.upload_file(os.path.join(root, file), bucketname, f'{head}/{file}')
+    for output_file in sorted(output_files):
+        key = os.path.relpath(output_file, path).replace(os.sep, '/')
+        dataset = key.split('/')[0]
 
+        entries = manifests.setdefault(dataset, {'entries': list()})['entries']
+        # content_length is required to COPY parquet from a manifest
+        entries.append({'url': f's3://{bucketname}/{key}',
+                        'mandatory': True,
+                        'meta': {'content_length': os.path.getsize(output_file)}})
 
-def process_data():
+    return manifests
 
-    root_path = './data/raw'
-    output_path = './data/processed/{}'
 
-    processed_path = './data/processed'
+def upload_manifests(manifests, bucketname, run_id, client=None):
+    """
+    Uploads COPY manifests as manifests/<dataset>/<run_id>.json and manifests/<dataset>/latest.json.
+
+    Input:
+        manifests: dict. dataset name to manifest from build_manifests
+        bucketname: str. target bucket
+        run_id: str. identifies this run's manifests
+        client: boto3 S3 client. Defaults to s3_client()
+
+    Returns a dict of dataset name to the s3 url of its run manifest.
+    """
+
+    client = client or s3_client()
+    urls = dict()
+
+    for dataset, manifest in manifests.items():
+        body = json.dumps(manifest, indent=2).encode('utf-8')
+        for name in [run_id, 'latest']:
+            client.put_object(Bucket=bucketname, Key=f'manifests/{dataset}/{name}.json', Body=body)
+
+        urls[dataset] = f's3://{bucketname}/manifests/{dataset}/{run_id}.json'
+        print(f'Manifest: {urls[dataset]} ({len(manifest["entries"])} files)')
+
+    return urls
+
+
+def process_data(workers=1, chunksize=None, output_format='csv', compression=None, full_refresh=False,
+                 upload_workers=UPLOAD_WORKERS, upload=True, report_path='./data/reports', statsd=None,
+                 profile_dir=None, build_facts=False, reader=RAW_READER, datasets=None, countries=None,
+                 data_path='./data', resolution=None):
+    """
+    Preprocesses new or changed raw files and uploads the results to S3.
+
+    datasets and countries restrict a run to one group of raw files, i.e. a single
+    (dataset, country) task of the DAG. Groups can run concurrently: they write to their own
+    partitions and share the catalog.
+
+    Input:
+        workers: int. number of worker processes used for preprocessing
+        chunksize: int. stream raw csvs in chunks of this many rows to bound memory
+        output_format: str. csv or parquet
+        compression: str. gzip or zstd. None writes plain csv and snappy parquet.
+        full_refresh: bool. reprocess every raw file, not only new or changed ones
+        upload_workers: int. number of concurrent S3 uploads
+        upload: bool. upload outputs and manifests to S3, False only preprocesses
+        report_path: str. directory the JSON run report is written to, None skips it
+        statsd: str. host:port to send the per stage metrics to as StatsD
+        profile_dir: str. dump cProfile stats of every stage into this directory
+        build_facts: bool. also build the FACTS tables locally, see process_energy_loads_file
+        reader: str. arrow or pandas csv parser for the raw files, see RAW_READERS
+        datasets: list. DATASETS to preprocess and FACTS to build in full. Defaults to all
+            DATASETS, and the FACTS with build_facts.
+        countries: list. country folders to preprocess. Defaults to all of them.
+        data_path: str. directory holding raw/, processed/ and the catalog
+        resolution: int. resample every time series to this many minutes, see RESOLUTIONS, so
+            the fact join lines up on ts. None keeps the resolution of each export.
+
+    Besides the processed files a COPY manifest per dataset listing only this run's outputs is
+    uploaded to manifests/<dataset>/, see upload_manifests.
+
+    Time, rows, bytes and peak RSS of every stage (read, parse, localize, resample, melt, profile,
+    write, upload) per dataset and country are written to <report_path>/preprocess-<run>.json.
+    """
+
+    root_path = os.path.join(data_path, 'raw')
+    output_path = os.path.join(data_path, 'processed', '{}')
+
+    processed_path = os.path.join(data_path, 'processed')
+    catalog_path = os.path.join(data_path, 'catalog.sqlite')
     bucket = 'energy-etl-processed'
 
-    print('Preprocessing total demand')
-    logging.info('Preprocessing total demand')
-    country_paths = traverse_path(os.path.join(root_path, 'total_demand'), -2)
+    # concurrent group runs start in the same second
+    run_id = '-'.join([datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%S')] + (datasets or []) + (countries or []))
+    start_time = time.perf_counter()
+
+    units = build_work_units(root_path, None if datasets is None else [d for d in datasets if d in DATASETS],
+                             countries)
+
+    # outputs are only reused when written with the same format, compression and resolution
+    output_key = output_format if compression is None else f'{output_format}.{compression}'
+    if resolution is not None:
+        output_key = f'{output_key}.{resolution}min'
+
+    with RawFileCatalog(catalog_path) as catalog:
+        if full_refresh:
+            todo, skipped, stale = units, list(), list()
+        else:
+            todo, skipped, stale = catalog.plan(units, output_key)
+        remove_outputs(stale, output_path)
+
+        print(f'Preprocessing {len(todo)} files with {workers} worker(s). {len(skipped)} unchanged or duplicate')
+        logging.info(f'Preprocessing {len(todo)} files with {workers} worker(s). {len(skipped)} unchanged or duplicate')
+
+        results, errors = process_units(todo, output_path, workers, profile_dir,
+                                        chunksize=chunksize, output_format=output_format,
+                                        compression=compression, reader=reader, resolution=resolution)
+
+        for unit, output_files, _, _ in results:
+            remove_outputs([(unit, catalog.record(unit, output_files, output_key))], output_path)
+
+    fact_units = list()
+    if build_facts and len(errors) == 0:
+        # facts of every country and period with changed generation, demand or prices
+        fact_units = build_fact_units(root_path, None if full_refresh else todo, countries=countries)
+    elif datasets is not None and len(errors) == 0:
+        # facts asked for by name are built from whatever their sources hold, which other
+        # group runs preprocessed
+        fact_units = build_fact_units(root_path, facts=datasets, countries=countries)
+
+    if len(fact_units) > 0:
+        print(f'Building {len(fact_units)} fact files')
 
-    new_total_demand_cols = ['event_date', 'total_demand', 'ts', 'country_id']
+        fact_results, errors = process_units(fact_units, output_path, workers, profile_dir,
+                                             chunksize=chunksize, output_format=output_format,
+                                             compression=compression, root_path=root_path, reader=reader,
+                                             resolution=resolution)
+        results = results + fact_results
 
-    process_capacity_demand(country_paths,
-                            output_path.format('total_demand'),
-                            'demand',
-                            new_total_demand_cols)
-    logging.info('Processing OK: Total demand')
+    for dataset in DATASETS.keys():
+        logging.info(f'Processing OK: {dataset} {sum(1 for unit, _, _, _ in results if unit[0] == dataset)} files')
 
-    print('Preprocessing installed capacity')
-    logging.info('Preprocessing installed capacity')
-    country_paths = traverse_path(os.path.join(root_path, 'installed_capacity'), -2)
+    upload_summary = None
 
-    new_install_capacity_cols = ['event_date', 'production_type', 'code',
-                                 'name', 'installed_capacity_year_start',
-                                 'current_installed_capacity', 'location',
-                                 'voltage_connection_level', 'commissioning_date',
-                                 'decommissioning_date', 'country_id']
+    try:
+        if len(errors) > 0:
+            raise RuntimeError(f'Preprocessing failed for {len(errors)} of {len(todo) + len(fact_units)} files')
 
-    process_capacity_demand(country_paths,
-                            output_path.format('installed_capacity'),
-                            'capacity',
-                            new_install_capacity_cols)
-    logging.info('Processing OK: Installed Capacity')
+        # times dimension rows for any newly covered year
+        calendar_files = write_calendar(os.path.join(processed_path, 'times'), covered_years(todo),
+                                        unit_timezones(todo))
 
-    print('Preprocessing total generation')
-    logging.info('Preprocessing total generation')
-    country_paths = traverse_path(os.path.join(root_path, 'total_generation'), -2)
+        if not upload:
+            return
 
-    process_total_generation(country_paths, output_path.format('total_generation'))
-    logging.info('Processing OK: Total Generation')
+        print(f'Uploading to S3 bucket {bucket}')
+        logging.info(f'Uploading to S3 bucket {bucket}')
 
-    print('Preprocessing day ahead prices')
-    logging.info('Preprocessing day ahead prices')
-    country_paths = traverse_path(os.path.join(root_path, 'day_ahead_prices'), -2)
+        client = s3_client(upload_workers)
+        upload_summary = upload_data(processed_path, bucket, workers=upload_workers, client=client)
 
-    process_day_ahead_prices(country_paths, output_path.format('day_ahead_prices'))
-    logging.info('Processing OK: Day Ahead Prices')
+        # datasets without new outputs get an empty manifest so they stage nothing
+        run_files = [output_file for _, output_files, _, _ in results for output_file in output_files] + \
+            calendar_files
+        manifests = {dataset: {'entries': list()}
+                     for dataset in list(DATASETS.keys()) + ['times'] + (list(FACTS.keys()) if build_facts else [])
+                     if datasets is None or dataset in datasets or dataset == 'times'}
+        manifests.update(build_manifests(run_files, processed_path, bucket))
 
-    print(f'Uploading to S3 bucket {bucket}')
-    logging.info(f'Uploading to S3 bucket {bucket}')
+        upload_manifests(manifests, bucket, run_id, client)
+    finally:
+        # failed runs are reported too, that's when the numbers are needed most
+        run = {'run_id': run_id, 'seconds': time.perf_counter() - start_time, 'workers': workers,
+               'chunksize': chunksize, 'reader': reader, 'output_format': output_key,
+               'processed': len(results), 'failed': len(errors), 'skipped': len(skipped), 'upload': upload_summary}
 
-    upload_data(processed_path, bucket)
+        if report_path is not None:
+            report_file = METRICS.write_report(os.path.join(report_path, f'preprocess-{run_id}.json'), **run)
+            print(f'Run report: {report_file}')
+        if statsd is not None:
+            METRICS.send_statsd(statsd)
 
 
 if __name__ == '__main__':
 
-    process_data()
+    parser = argparse.ArgumentParser(description='Preprocess ENTSO-E csvs and upload them to S3.')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of worker processes used for preprocessing')
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help='stream raw csvs in chunks of this many rows instead of loading them whole')
+    parser.add_argument('--format', dest='output_format', choices=['csv', 'parquet'], default='csv',
+                        help='write headerless csvs or typed parquet')
+    parser.add_argument('--compression', choices=['gzip', 'zstd'], default=None,
+                        help='compress the output files')
+    parser.add_argument('--full-refresh', action='store_true',
+                        help='reprocess every raw file instead of only new or changed ones')
+    parser.add_argument('--upload-workers', type=int, default=UPLOAD_WORKERS,
+                        help='number of concurrent S3 uploads')
+    parser.add_argument('--skip-upload', action='store_true',
+                        help='only preprocess, do not upload to S3')
+    parser.add_argument('--report-path', default='./data/reports',
+                        help='directory for the JSON run report with per stage timings')
+    parser.add_argument('--statsd', default=None, metavar='HOST:PORT',
+                        help='also send the per stage metrics to this StatsD server')
+    parser.add_argument('--profile-dir', default=None,
+                        help='dump cProfile stats of every stage into this directory')
+    parser.add_argument('--build-facts', action='store_true',
+                        help='also build the energy_loads fact rows locally, ready to COPY')
+    parser.add_argument('--reader', choices=RAW_READERS, default=RAW_READER,
+                        help='parse raw csvs with the multithreaded pyarrow reader or fall back to pandas')
+    parser.add_argument('--datasets', nargs='+', choices=list(DATASETS.keys()) + list(FACTS.keys()), default=None,
+                        help='only preprocess these datasets, or build these facts')
+    parser.add_argument('--countries', nargs='+', default=None,
+                        help='only preprocess the raw files of these country folders')
+    parser.add_argument('--data-path', default='./data',
+                        help='directory holding raw/, processed/ and the catalog')
+    parser.add_argument('--resolution', type=int, choices=RESOLUTIONS, default=None,
+                        help='resample time series to this many minutes. Defaults to the resolution of each export')
+    args = parser.parse_args()
+
+    process_data(workers=args.workers, chunksize=args.chunksize, output_format=args.output_format,
+                 compression=args.compression, full_refresh=args.full_refresh,
+                 upload_workers=args.upload_workers, upload=not args.skip_upload,
+                 report_path=args.report_path, statsd=args.statsd, profile_dir=args.profile_dir,
+                 build_facts=args.build_facts, reader=args.reader, datasets=args.datasets,
+                 countries=args.countries, data_path=args.data_path, resolution=args.resolution)
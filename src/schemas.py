@@ -0,0 +1,110 @@
+import re
+from collections import namedtuple
+
+import pandas as pd
+
+# A column of a raw ENTSO-E export.
+#   pattern: regex matched against the raw header
+#   name: output name, formatted with the regex groups, i.e. '{0}' for a name taken from the header
+#   dtype: type the values are parsed to
+#   units: values carry a unit suffix, i.e. "45.30 EUR". Read as text and stripped after.
+Column = namedtuple('Column', ['pattern', 'name', 'dtype', 'units'], defaults=[False])
+
+# A raw export variant: the columns kept, in no particular order, and the values read as missing.
+# Every column must match at least one header. Headers matching no column are not read.
+Schema = namedtuple('Schema', ['columns', 'na_values'])
+
+# not produced in an area
+NA_VALUES = ['n/e']
+
+# headers of the interval column, "MTU (CET)", "Time (CET)" or unlabelled
+_MTU = r'^(MTU|Time)\b'
+
+SCHEMAS = {
+    'total_demand': Schema([
+        Column(_MTU, 'mtu', 'str'),
+        Column(r'^Actual Total Load', 'total_demand', 'float64'),
+    ], NA_VALUES),
+
+    'day_ahead_prices': Schema([
+        Column(_MTU, 'mtu', 'str'),
+        Column(r'^Day-ahead Price', 'day_ahead_price', 'float64', units=True),
+    ], NA_VALUES),
+
+    # one column per generation type, named by the header up to the first '-', so
+    # "Hydro Run-of-river and poundage  - Actual Aggregated [MW]" is 'hydro run'. Pumped storage
+    # generation and consumption share a name.
+    'total_generation': Schema([
+        Column(r'^Area$', 'area', 'category'),
+        Column(_MTU, 'mtu', 'str'),
+        Column(r'^([^-]*)-.*\[MW\]$', '{0}', 'float32'),
+    ], NA_VALUES),
+
+    # portal downloads, i.e. "Installed Capacity Year Start [MW]", or exports already using
+    # the output names
+    'installed_capacity': Schema([
+        Column(r'^(Area/Year|event_date)$', 'event_date', 'str'),
+        Column(r'^Production[ _]Type$', 'production_type', 'str'),
+        Column(r'^Code$', 'code', 'str'),
+        Column(r'^Name$', 'name', 'str'),
+        Column(r'^Installed[ _]Capacity[ _]Year[ _]Start', 'installed_capacity_year_start', 'float64'),
+        Column(r'^Current[ _]Installed[ _]Capacity', 'current_installed_capacity', 'float64'),
+        Column(r'^Location$', 'location', 'str'),
+        Column(r'^Voltage[ _]Connection[ _]Level', 'voltage_connection_level', 'Int64'),
+        Column(r'^Commissioning[ _]Date$', 'commissioning_date', 'str'),
+        Column(r'^Decommissioning[ _]Date$', 'decommissioning_date', 'str'),
+    ], []),
+}
+
+
+def resolve(dataset, header):
+    """
+    Matches the header of a raw export against the schema of its dataset.
+
+    Input:
+        dataset: str. key of SCHEMAS
+        header: list. raw column headers in file order
+
+    Returns a dict of read options (usecols, dtype, na_values) for pd.read_csv, the output
+    name of each raw header read and the final dtype of the raw headers whose units are stripped.
+    """
+
+    schema = SCHEMAS[dataset]
+    usecols, dtype, names, units = list(), dict(), dict(), dict()
+    unmatched = list(schema.columns)
+
+    for raw in header:
+        for column in schema.columns:
+            match = re.search(column.pattern, str(raw), flags=re.IGNORECASE)
+            if match is None:
+                continue
+
+            usecols.append(raw)
+            names[raw] = column.name.format(*(group.strip().lower() for group in match.groups()))
+            dtype[raw] = 'str' if column.units else column.dtype
+            if column.units:
+                units[raw] = column.dtype
+            if column in unmatched:
+                unmatched.remove(column)
+            break
+
+    if len(unmatched) > 0:
+        raise ValueError(f'No {dataset} column matching {[column.pattern for column in unmatched]} '
+                         f'in header {list(header)}')
+
+    options = {'usecols': usecols, 'dtype': dtype, 'na_values': schema.na_values}
+
+    return options, names, units
+
+
+def to_output(df, names, units):
+    """
+    Strips units and renames a frame read with the options of resolve to the output names.
+    """
+
+    for raw, dtype in units.items():
+        df[raw] = pd.to_numeric(df[raw].str.split(' ', n=1).str[0]).astype(dtype)
+
+    df.columns = [names[raw] for raw in df.columns]
+
+    return df
@@ -0,0 +1,172 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# local time of each ENTSO-E area, by the country code of data/raw/<dataset>/<country>/.
+# Bidding zones like DE_LU, IT_NORD or NO_2 use the zone of their country.
+AREA_TIMEZONES = {
+    'AL': 'Europe/Tirane', 'AT': 'Europe/Vienna', 'BA': 'Europe/Sarajevo', 'BE': 'Europe/Brussels',
+    'BG': 'Europe/Sofia', 'BY': 'Europe/Minsk', 'CH': 'Europe/Zurich', 'CY': 'Asia/Nicosia',
+    'CZ': 'Europe/Prague', 'DE': 'Europe/Berlin', 'DK': 'Europe/Copenhagen', 'EE': 'Europe/Tallinn',
+    'ES': 'Europe/Madrid', 'FI': 'Europe/Helsinki', 'FR': 'Europe/Paris', 'GB': 'Europe/London',
+    'GR': 'Europe/Athens', 'HR': 'Europe/Zagreb', 'HU': 'Europe/Budapest', 'IE': 'Europe/Dublin',
+    'IT': 'Europe/Rome', 'LT': 'Europe/Vilnius', 'LU': 'Europe/Luxembourg', 'LV': 'Europe/Riga',
+    'MD': 'Europe/Chisinau', 'ME': 'Europe/Podgorica', 'MK': 'Europe/Skopje', 'MT': 'Europe/Malta',
+    'NI': 'Europe/London', 'NL': 'Europe/Amsterdam', 'NO': 'Europe/Oslo', 'PL': 'Europe/Warsaw',
+    'PT': 'Europe/Lisbon', 'RO': 'Europe/Bucharest', 'RS': 'Europe/Belgrade', 'RU': 'Europe/Moscow',
+    'SE': 'Europe/Stockholm', 'SI': 'Europe/Ljubljana', 'SK': 'Europe/Bratislava', 'TR': 'Europe/Istanbul',
+    'UA': 'Europe/Kiev', 'UK': 'Europe/London', 'XK': 'Europe/Belgrade',
+}
+
+# areas without an entry, and the portal's default download timezone
+DEFAULT_TIMEZONE = 'Europe/Brussels'
+
+# timezone labels the transparency portal puts on the MTU column of a download
+LABEL_TIMEZONES = {
+    'CET': 'Europe/Brussels',
+    'CET/CEST': 'Europe/Brussels',
+    'WET': 'Europe/Lisbon',
+    'WET/WEST': 'Europe/Lisbon',
+    'EET': 'Europe/Athens',
+    'EET/EEST': 'Europe/Athens',
+    'UTC': 'UTC',
+}
+_LABEL = re.compile(r'\(([A-Z/]+)\)')
+
+# the grid offset changes are searched on. All European changes happen on the hour.
+TRANSITION_RESOLUTION = '15min'
+
+
+def area_timezone(area):
+    """
+    Local timezone of an ENTSO-E area code, i.e. PT, GB or DE_LU.
+    """
+
+    area = str(area).upper()
+    return AREA_TIMEZONES.get(area, AREA_TIMEZONES.get(area.split('_')[0], DEFAULT_TIMEZONE))
+
+
+def export_timezone(df, area):
+    """
+    Timezone the MTU column of a raw export is published in.
+
+    The portal labels either the header, i.e. "MTU (CET)", or every value, i.e.
+    "01.01.2019 00:00 - 01.01.2019 01:00 (CET)", with the timezone picked for the download.
+    Unlabelled exports are taken to be in the local time of their area.
+
+    Input:
+        df: DataFrame. raw export with its original headers
+        area: str. ENTSO-E area code of the export
+    """
+
+    for column in df.columns:
+        if not str(column).startswith(('MTU', 'Time')):
+            continue
+
+        labels = [str(column)] + ([str(df[column].iloc[0])] if len(df) > 0 else [])
+        for label in labels:
+            match = _LABEL.search(label)
+            if match is not None and match.group(1) in LABEL_TIMEZONES:
+                return LABEL_TIMEZONES[match.group(1)]
+
+    return area_timezone(area)
+
+
+@lru_cache(maxsize=None)
+def year_transitions(tz, year):
+    """
+    UTC offset changes of tz during a year.
+
+    Returns a tuple of int64 nanosecond arrays (UTC instants, offsets before, offsets after)
+    and the offset at the start of the year.
+    """
+
+    utc = pd.date_range(f'{year}-01-01', f'{year + 1}-01-01', freq=TRANSITION_RESOLUTION, tz='UTC')
+    instants = utc.tz_localize(None).values.astype('datetime64[ns]').astype('int64')
+    offsets = utc.tz_convert(tz).tz_localize(None).values.astype('datetime64[ns]').astype('int64') - instants
+
+    changes = np.flatnonzero(np.diff(offsets)) + 1
+
+    return instants[changes], offsets[changes - 1], offsets[changes], int(offsets[0])
+
+
+@lru_cache(maxsize=None)
+def transitions(tz, first_year, last_year):
+    """
+    Transition arrays of tz from first_year to last_year, see year_transitions.
+    """
+
+    tables = [year_transitions(tz, year) for year in range(first_year, last_year + 1)]
+    arrays = tuple(np.concatenate([table[field] for table in tables]) for field in range(3))
+    for array in arrays:
+        array.flags.writeable = False
+
+    return arrays + (tables[0][3],)
+
+
+def localize(wall, tz):
+    """
+    Converts local wall clock interval starts to UTC in one vectorized pass.
+
+    Every start is placed between the cached offset changes of tz with a binary search. Starts
+    in the skipped spring hour are shifted back to the instant before the change, like
+    tz_localize(nonexistent='shift_backward'). Starts in the repeated autumn hour are resolved
+    from the order of the intervals: daylight time until the wall clock goes back, standard
+    time for starts listed again after that. Unlike ambiguous='infer' this needs neither
+    complete nor hourly data, so gappy, 15 minute or single listed repeats localize the same.
+
+    Input:
+        wall: array. naive datetime64 interval starts in file order
+        tz: str. timezone the starts are published in
+
+    Returns a tuple of int64 arrays (UTC nanoseconds since the epoch, local wall clock
+    nanoseconds after shifting skipped starts).
+    """
+
+    wall = np.asarray(wall).astype('datetime64[ns]').astype('int64')
+    if len(wall) == 0:
+        return wall, wall
+
+    years = np.asarray([wall.min(), wall.max()]).astype('datetime64[ns]').astype('datetime64[Y]').astype('int64')
+    instants, before, after, initial = transitions(tz, int(years[0]) + 1969, int(years[1]) + 1971)
+
+    if len(instants) == 0:
+        return wall - initial, wall
+
+    # wall clock window touched by each change: skipped in spring, repeated in autumn
+    window_start = instants + np.minimum(before, after)
+    window_end = instants + np.maximum(before, after)
+
+    idx = np.searchsorted(window_start, wall, side='right') - 1
+    last = np.maximum(idx, 0)
+    offset = np.where(idx >= 0, after[last], initial)
+    utc = wall - offset
+    local = wall
+
+    inside = np.flatnonzero((idx >= 0) & (wall < window_end[last]))
+    if len(inside) > 0:
+        change = idx[inside]
+        skipped = after[change] > before[change]
+
+        # spring: last instant before the change
+        shifted = inside[skipped]
+        utc = utc.copy()
+        utc[shifted] = instants[change[skipped]] - 1
+        local = local.copy()
+        local[shifted] = utc[shifted] + before[change[skipped]]
+
+        # autumn: standard time once an earlier start of the same repeat was at or after this one.
+        # Windows don't overlap, so a running max across them only compares starts of one window.
+        repeated = inside[~skipped]
+        order = np.argsort(change[~skipped], kind='stable')
+        starts = wall[repeated][order]
+        seen = np.maximum.accumulate(starts)
+        standard = np.empty(len(order), dtype=bool)
+        standard[order] = np.concatenate([[False], seen[:-1] >= starts[1:]])
+
+        change = change[~skipped]
+        utc[repeated] = wall[repeated] - np.where(standard, after[change], before[change])
+
+    return utc, local
@@ -0,0 +1,8 @@
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# the pipeline modules import each other as top level modules, like the scripts run from src/
+for path in ['src', 'benchmarks', os.path.join('airflows', 'plugins')]:
+    sys.path.insert(0, os.path.join(ROOT, path))
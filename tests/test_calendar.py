@@ -0,0 +1,71 @@
+import os
+
+import pandas as pd
+
+from calendar_dimension import CALENDAR_COLUMNS, build_calendar, covered_years, write_calendar
+from preprocess_upload import unit_timezones
+
+
+def test_local_attributes_in_the_country_timezone():
+    lisbon = build_calendar('2019-03-31', '2019-04-01', '1h', 'Europe/Lisbon', 'PT').set_index('ts')
+    athens = build_calendar('2019-03-31', '2019-04-01', '1h', 'Europe/Athens', 'GR').set_index('ts')
+
+    # the same UTC instant, an hour apart on the two wall clocks
+    ts = pd.Timestamp('2019-03-31 12:00', tz='UTC').value
+    assert lisbon.loc[ts, 'event_date'] == '2019-03-31 13:00:00'
+    assert athens.loc[ts, 'event_date'] == '2019-03-31 15:00:00'
+    assert (lisbon.loc[ts, 'hour'], athens.loc[ts, 'hour']) == (13, 15)
+    assert (lisbon['country_id'] == 'PT').all() and (lisbon['timezone'] == 'Europe/Lisbon').all()
+
+    # the clocks change at 01:00 in Lisbon and 03:00 in Athens
+    assert list(lisbon['hour'].iloc[:3]) == [0, 2, 3]
+    assert list(athens['hour'].iloc[:4]) == [0, 1, 2, 4]
+    assert list(lisbon['is_dst'].iloc[:2]) == [False, True]
+
+
+def test_autumn_repeat_in_each_timezone():
+    for tz, hour in [('Europe/Lisbon', 1), ('Europe/Brussels', 2), ('Europe/Helsinki', 3)]:
+        calendar = build_calendar('2019-10-27', '2019-10-28', '1h', tz)
+
+        repeated = calendar[calendar['hour'] == hour]
+        assert len(calendar) == 25
+        assert list(repeated['is_dst']) == [True, False]
+        assert repeated['ts'].diff().iloc[1] == pd.Timedelta('1h').value
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(content)
+
+    return path
+
+
+def test_one_calendar_per_country(tmp_path):
+    period = '_201901010000-202001010000.csv'
+    units = [
+        # unlabelled exports are in the local time of their area, and the generation one wins
+        ('total_demand', 'PT', write(str(tmp_path / 'raw' / 'demand-PT') + period,
+                                     'Time (CET),Actual Total Load [MW]\n01.01.2019 00:00 - 01.01.2019 01:00,1\n')),
+        ('total_generation', 'PT', write(str(tmp_path / 'raw' / 'generation-PT') + period,
+                                         'Area,MTU\nBZN|PT,01.01.2019 00:00 - 01.01.2019 01:00\n')),
+        ('total_demand', 'GR', write(str(tmp_path / 'raw' / 'demand-GR') + period,
+                                     'Time,Actual Total Load [MW]\n01.01.2019 00:00 - 01.01.2019 01:00,1\n')),
+        ('installed_capacity', 'AT', write(str(tmp_path / 'raw' / 'capacity-AT') + period, 'Area/Year\n')),
+    ]
+
+    timezones = unit_timezones(units)
+    assert timezones == {'PT': 'Europe/Lisbon', 'GR': 'Europe/Athens', 'AT': 'Europe/Vienna'}
+
+    written = write_calendar(str(tmp_path / 'times'), covered_years(units), timezones, freq='1h')
+
+    assert sorted(os.path.basename(path) for path in written) == [
+        'calendar-AT-2019.csv', 'calendar-GR-2019.csv', 'calendar-PT-2019.csv']
+    portugal = pd.read_csv(tmp_path / 'times' / 'calendar-PT-2019.csv', header=None, names=CALENDAR_COLUMNS,
+                           keep_default_na=False)
+    assert portugal['event_date'].iloc[0] == '2019-01-01 00:00:00'
+    assert portugal['ts'].iloc[0] == pd.Timestamp('2019-01-01 00:00', tz='UTC').value
+    assert (portugal['timezone'] == 'Europe/Lisbon').all()
+    assert len(portugal) == 365 * 24
+    # already written
+    assert write_calendar(str(tmp_path / 'times'), covered_years(units), timezones, freq='1h') == []
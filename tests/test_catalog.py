@@ -0,0 +1,93 @@
+import glob
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from catalog import RawFileCatalog
+from preprocess_upload import process_data
+from synthetic_entsoe import generate
+
+
+def write(path, content):
+    with open(path, 'w') as f:
+        f.write(content)
+    # a later write in the same second still changes the mtime
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 10 ** 9))
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    """
+    An empty catalog and a raw file recorded with two outputs.
+    """
+
+    raw = str(tmp_path / 'export_201901010000-202001010000.csv')
+    write(raw, 'a\n1\n')
+    outputs = [str(tmp_path / 'a.csv'), str(tmp_path / 'b.csv')]
+
+    with RawFileCatalog(str(tmp_path / 'catalog.sqlite')) as catalog:
+        catalog.record(('total_demand', 'BE', raw), outputs)
+        yield catalog, ('total_demand', 'BE', raw), outputs
+
+
+def test_unchanged_file_has_no_stale_outputs(catalog):
+    catalog, unit, outputs = catalog
+    os.utime(unit[2])
+
+    entry, stale = catalog.scan(unit)
+
+    assert json.loads(entry['outputs']) == outputs
+    assert stale == []
+
+
+def test_changed_file_returns_replaced_outputs(catalog):
+    catalog, unit, outputs = catalog
+    write(unit[2], 'a\n2\n')
+
+    todo, skipped, stale = catalog.plan([unit])
+
+    assert todo == [unit] and skipped == []
+    assert stale == [(unit, outputs)]
+    assert catalog.get(unit[2])['outputs'] is None
+    # returned once
+    assert catalog.scan(unit)[1] == []
+
+
+def test_record_returns_outputs_not_written_again(catalog):
+    # i.e. a full refresh, which doesn't plan
+    catalog, unit, outputs = catalog
+    write(unit[2], 'a\n2\n')
+
+    assert catalog.record(unit, outputs[1:] + ['c.csv']) == outputs[:1]
+
+
+def test_changed_export_replaces_its_outputs(tmp_path):
+    data_path = str(tmp_path / 'data')
+    generate(os.path.join(data_path, 'raw'), ['BE'], [2019])
+    raw = glob.glob(os.path.join(data_path, 'raw', 'total_demand', 'BE', '*.csv'))[0]
+
+    def run():
+        process_data(upload=False, report_path=None, datasets=['total_demand'], data_path=data_path)
+        processed = os.path.join(data_path, 'processed')
+        files = sorted(glob.glob(os.path.join(processed, 'total_demand', '**', '*.csv'), recursive=True))
+        profiles = sorted(glob.glob(os.path.join(processed, 'profiles', 'total_demand', '**', '*.json'),
+                                    recursive=True))
+        return files, profiles
+
+    files, profiles = run()
+    assert len(files) == 12 and len(profiles) == 12
+
+    # the export is downloaded again with only the first half of the year
+    df = pd.read_csv(raw, dtype=str, keep_default_na=False)
+    df.iloc[:len(df) // 2].to_csv(raw, index=False, quoting=1)
+    os.utime(raw, ns=(os.stat(raw).st_atime_ns, os.stat(raw).st_mtime_ns + 10 ** 9))
+
+    files, profiles = run()
+
+    with RawFileCatalog(os.path.join(data_path, 'catalog.sqlite')) as catalog:
+        outputs = json.loads(catalog.get(raw)['outputs'])
+    assert files == sorted(outputs)
+    assert len(files) in (6, 7) and len(profiles) == len(files)
+    assert all('month=12' not in file for file in files)
@@ -0,0 +1,62 @@
+import glob
+import gzip
+import os
+
+import pytest
+import zstandard
+
+from preprocess_upload import process_data
+from synthetic_entsoe import generate
+
+
+@pytest.fixture(scope='module')
+def raw_path(tmp_path_factory):
+    """
+    Raw exports of BE in 2019.
+    """
+
+    raw_path = str(tmp_path_factory.mktemp('raw'))
+    generate(raw_path, ['BE'], [2019])
+
+    return raw_path
+
+
+def preprocess(raw_path, data_path, compression=None):
+    """
+    Preprocesses the demand and prices of raw_path into data_path. Returns the content of every
+    output by its path below processed/, decompressed.
+    """
+
+    os.symlink(raw_path, os.path.join(data_path, 'raw'))
+    process_data(upload=False, report_path=None, compression=compression, data_path=data_path,
+                 datasets=['total_demand', 'day_ahead_prices'])
+
+    processed = os.path.join(data_path, 'processed')
+    outputs = dict()
+    for path in glob.glob(os.path.join(processed, '*', 'country=*', '**', '*.csv*'), recursive=True):
+        if path.endswith('.gz'):
+            with gzip.open(path, 'rb') as f:
+                content = f.read()
+        elif path.endswith('.zst'):
+            with open(path, 'rb') as f:
+                content = zstandard.ZstdDecompressor().stream_reader(f).read()
+        else:
+            with open(path, 'rb') as f:
+                content = f.read()
+        outputs[os.path.relpath(path, processed).split('.csv')[0]] = content
+
+    return outputs
+
+
+@pytest.mark.parametrize('compression, extension', [('zstd', '.csv.zst'), ('gzip', '.csv.gz')])
+def test_compressed_outputs_round_trip(raw_path, tmp_path, compression, extension):
+    os.makedirs(tmp_path / 'plain')
+    os.makedirs(tmp_path / compression)
+    plain = preprocess(raw_path, str(tmp_path / 'plain'))
+    compressed = preprocess(raw_path, str(tmp_path / compression), compression)
+
+    assert len(plain) == 24
+    assert compressed == plain
+    assert all(path.endswith(extension) for path in
+               glob.glob(str(tmp_path / compression / 'processed' / '*' / 'country=*' / '**' / '*.csv*'),
+                         recursive=True))
@@ -0,0 +1,233 @@
+import asyncio
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import extract
+from extract import DOMAINS, EXPORT_NAMES, EntsoeClient, RateLimiter, extract_all, parse_timeseries, queries
+from mock_entsoe_api import serve
+from preprocess_upload import read_export
+
+
+@pytest.fixture
+def server():
+    """
+    The mock API on a free port, see benchmarks/mock_entsoe_api.py.
+    """
+
+    server = serve()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def demand(day=1):
+    """
+    Parameters of the actual load of BE on 2019-01-<day>.
+    """
+
+    return queries('total_demand', DOMAINS['BE'], f'201901{day:02d}0000', f'201901{day + 1:02d}0000')['actual']
+
+
+def fetch(server, requests, **options):
+    """
+    Fetches every request concurrently from the mock with a new client.
+    Returns the contents, the client's stats and the seconds it took.
+    """
+
+    options = dict({'cache_dir': None, 'rate': 100000, 'backoff': 0.01}, **options)
+
+    async def run():
+        client = EntsoeClient(api_url=server.url, **options)
+        try:
+            return await asyncio.gather(*[client.fetch(params) for params in requests]), client.stats
+        finally:
+            client.close()
+
+    start = time.perf_counter()
+    contents, stats = asyncio.run(run())
+
+    return contents, stats, time.perf_counter() - start
+
+
+def test_retries_failures_with_exponential_backoff(server, monkeypatch):
+    # no jitter: waits backoff, then twice that
+    monkeypatch.setattr(extract.random, 'random', lambda: 0.0)
+    server.script.extend([503, 502])
+
+    (content,), stats, seconds = fetch(server, [demand()], backoff=0.2)
+
+    assert b'GL_MarketDocument' in content
+    assert server.requests == 3
+    assert stats['requests'] == 3
+    assert stats['retries'] == 2
+    assert seconds >= 0.2 + 0.4
+
+
+def test_retries_throttled_requests_after_retry_after(server):
+    server.script.append(429)
+    server.retry_after = '0'
+
+    # Retry-After wins over the backoff
+    (content,), stats, seconds = fetch(server, [demand()], backoff=30)
+
+    assert b'GL_MarketDocument' in content
+    assert server.throttled == 1
+    assert stats['retries'] == 1
+    assert seconds < 5
+
+
+def test_waits_retry_after_seconds(server):
+    server.script.append(429)
+    server.retry_after = '1'
+
+    _, stats, seconds = fetch(server, [demand()], backoff=0.01)
+
+    assert stats['retries'] == 1
+    assert seconds >= 1
+
+
+def test_gives_up_after_retries(server):
+    server.script.extend([503, 503, 503])
+
+    with pytest.raises(RuntimeError, match='after 3 attempts'):
+        fetch(server, [demand()], retries=2)
+    assert server.requests == 3
+
+
+def test_other_errors_are_not_retried(server):
+    server.script.append(401)
+
+    with pytest.raises(RuntimeError, match='failed with 401'):
+        fetch(server, [demand()])
+    assert server.requests == 1
+
+
+def test_rate_limiter_spaces_requests():
+    async def run():
+        limiter = RateLimiter(rate=10, period=1.0)
+        loop = asyncio.get_event_loop()
+        starts = list()
+
+        async def wait():
+            await limiter.wait()
+            starts.append(loop.time())
+
+        await asyncio.gather(*[wait() for _ in range(6)])
+        return starts
+
+    starts = sorted(asyncio.run(run()))
+
+    assert np.diff(starts).min() >= 0.1 - 0.01
+    assert starts[-1] - starts[0] >= 0.5 - 0.01
+
+
+def test_client_requests_within_rate(server):
+    _, stats, seconds = fetch(server, [demand(day) for day in range(1, 7)], rate=20, period=1.0, concurrency=8)
+
+    assert stats['requests'] == 6
+    # 20 a second start 0.05s apart
+    assert np.diff(sorted(server.started)).min() >= 0.05 - 0.01
+    assert seconds >= 5 * 0.05
+
+
+def test_semaphore_bounds_requests_in_flight(server):
+    server.latency = 0.2
+
+    _, stats, _ = fetch(server, [demand(day) for day in range(1, 9)], concurrency=3)
+
+    assert stats['requests'] == 8
+    assert server.max_active == 3
+
+
+def test_cache_hit_makes_no_request(server, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+
+    (first,), stats, _ = fetch(server, [demand()], cache_dir=cache_dir)
+    assert stats == dict(stats, requests=1, cached=0)
+    assert len(os.listdir(cache_dir)) == 1
+
+    # a new client, i.e. the next run, reads the cache
+    (second,), stats, _ = fetch(server, [demand()], cache_dir=cache_dir)
+
+    assert second == first
+    assert stats == dict(stats, requests=0, cached=1, bytes=0)
+    assert server.requests == 1
+
+
+def test_unfinished_periods_are_not_cached(server, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    future = (pd.Timestamp.now('UTC') + pd.Timedelta(days=2)).strftime('%Y%m%d0000')
+    params = queries('total_demand', DOMAINS['BE'], pd.Timestamp.now('UTC').strftime('%Y%m%d0000'), future)['actual']
+
+    fetch(server, [params], cache_dir=cache_dir)
+    _, stats, _ = fetch(server, [params], cache_dir=cache_dir)
+
+    assert stats['cached'] == 0
+    assert server.requests == 2
+    assert os.listdir(cache_dir) == []
+
+
+def test_no_matching_data_is_an_empty_answer(server):
+    params = dict(demand(), documentType='A99')
+
+    (content,), stats, _ = fetch(server, [params])
+
+    assert b'Acknowledgement_MarketDocument' in content
+    assert stats['retries'] == 0
+    assert server.requests == 1
+    assert parse_timeseries(content) == []
+
+
+def test_extract_all_writes_portal_exports(server, tmp_path):
+    output = str(tmp_path / 'raw')
+
+    written, failed, stats = asyncio.run(extract_all(['BE'], [2019], output=output, api_url=server.url,
+                                                     cache_dir=None, rate=100000, concurrency=4))
+
+    assert failed == []
+    # one request per document, total_demand has the forecast and the actual load
+    assert stats['requests'] == 5
+    assert sorted(written) == sorted(
+        os.path.join(output, dataset, 'BE', f'{name}_201901010000-202001010000.csv')
+        for dataset, name in EXPORT_NAMES.items())
+
+    exports = {dataset: pd.read_csv(os.path.join(output, dataset, 'BE', f'{name}_201901010000-202001010000.csv'),
+                                    dtype=str, keep_default_na=False)
+               for dataset, name in EXPORT_NAMES.items()}
+
+    # intervals in local time, the generation and load ones 15 minutes long, prices hourly
+    generation = exports['total_generation']
+    assert list(generation.columns[:3]) == ['Area', 'MTU', 'Biomass  - Actual Aggregated [MW]']
+    assert 'Hydro Pumped Storage  - Actual Consumption [MW]' in generation.columns
+    assert (generation['Fossil Oil  - Actual Aggregated [MW]'] == 'n/e').all()
+    assert generation['MTU'].iloc[0] == '01.01.2019 00:00 - 01.01.2019 00:15'
+    assert len(generation) == 365 * 96
+
+    demand_export = exports['total_demand']
+    assert list(demand_export.columns) == ['Time', 'Day-ahead Total Load Forecast [MW] - BZN|BE',
+                                           'Actual Total Load [MW] - BZN|BE']
+    assert demand_export['Time'].iloc[-1] == '31.12.2019 23:45 - 01.01.2020 00:00'
+
+    prices = exports['day_ahead_prices']
+    assert list(prices.columns) == ['MTU', 'Day-ahead Price [EUR/MWh]']
+    assert prices['MTU'].iloc[0] == '01.01.2019 00:00 - 01.01.2019 01:00'
+    assert len(prices) == 365 * 24
+
+    capacity = exports['installed_capacity']
+    assert capacity['Area/Year'].iloc[0] == 'BZN|BE / 01.01.2019 00:00 - 01.01.2020 00:00'
+    assert len(capacity) == 20
+
+    # and the exports read through their schemas like portal downloads
+    for dataset, name in EXPORT_NAMES.items():
+        frames, tz = read_export(os.path.join(output, dataset, 'BE', f'{name}_201901010000-202001010000.csv'),
+                                 dataset, 'BE')
+        assert tz == 'Europe/Brussels'
+        assert sum(len(frame) for frame in frames) == len(exports[dataset])
+
+    # existing exports are skipped
+    written, failed, _ = asyncio.run(extract_all(['BE'], [2019], output=output, api_url=server.url, cache_dir=None))
+    assert written == [] and failed == []
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from preprocess_upload import parse_mtu
+from synthetic_entsoe import local_periods, mtu_strings
+
+
+def baseline(mtu, tz='Europe/Brussels'):
+    """
+    The per-row parsing parse_mtu replaced. dayfirst is set so "dd.mm.YYYY" parses the same way.
+    """
+
+    starts = pd.DatetimeIndex([pd.to_datetime(x.split('-')[0], dayfirst=True) for x in mtu])
+    local = starts.astype('datetime64[ns]').tz_localize(tz, ambiguous='infer', nonexistent='shift_backward')
+    ts = local.tz_convert('UTC').tz_localize(None).values.astype('datetime64[ns]').astype('int64')
+
+    return pd.DataFrame({'event_date': local.strftime('%Y%m%d %H%M%S'), 'ts': ts})
+
+
+def export_mtu(freq, suffix='', year=2019):
+    """
+    MTU strings of the last weeks of March and October, around the DST changes, as the portal
+    lists them: the skipped spring hour as rows without data and the repeated autumn hour twice.
+    """
+
+    starts, _ = local_periods(year, freq)
+    starts = starts[starts.month.isin([3, 10]) & (starts.day >= 25)]
+
+    return pd.Series(np.asarray(mtu_strings(starts, freq, suffix)))
+
+
+@pytest.mark.parametrize('freq', ['15min', '30min', '60min'])
+@pytest.mark.parametrize('suffix', ['', ' (CET)', ' (CEST)'])
+def test_matches_baseline(freq, suffix):
+    mtu = export_mtu(freq, suffix)
+
+    times = parse_mtu(mtu)
+    expected = baseline(mtu)
+
+    np.testing.assert_array_equal(times['event_date'].to_numpy(dtype=str),
+                                  expected['event_date'].to_numpy(dtype=str))
+    np.testing.assert_array_equal(times['ts'].to_numpy(), expected['ts'].to_numpy())
+
+
+@pytest.mark.parametrize('freq', ['15min', '30min', '60min'])
+def test_interval_ends(freq):
+    mtu = export_mtu(freq, ' (CET)')
+
+    times = parse_mtu(mtu)
+    lengths = (times['interval_end'] - times['interval_start']).to_numpy()
+
+    assert (lengths == pd.Timedelta(freq).to_timedelta64()).all()
+    assert times.index.equals(mtu.index)
+
+
+def test_dst_rows():
+    mtu = pd.Series(['31.03.2019 01:00 - 31.03.2019 02:00 (CET)',
+                     # skipped spring hour, a blank row in the export
+                     '31.03.2019 02:00 - 31.03.2019 03:00 (CET)',
+                     '31.03.2019 03:00 - 31.03.2019 04:00 (CEST)',
+                     '27.10.2019 02:00 - 27.10.2019 03:00 (CEST)',
+                     '27.10.2019 02:00 - 27.10.2019 03:00 (CET)'])
+
+    times = parse_mtu(mtu)
+
+    # the skipped hour is shifted back to the instant before the change, like shift_backward did
+    assert list(times['event_date']) == ['20190331 010000', '20190331 015959', '20190331 030000',
+                                         '20191027 020000', '20191027 020000']
+    assert times['ts'].iloc[1] == pd.Timestamp('2019-03-31 01:00', tz='UTC').value - 1
+    # the repeated hour is two distinct instants
+    assert times['ts'].iloc[4] - times['ts'].iloc[3] == pd.Timedelta('1h').value
+    assert (times['ts'] == baseline(mtu)['ts']).all()
+
+
+def test_start_without_end():
+    mtu = pd.Series(['01.01.2019 00:00 - 01.01.2019 01:00', '01.01.2019 01:00'])
+
+    times = parse_mtu(mtu)
+
+    assert list(times['event_date']) == list(baseline(mtu)['event_date'])
+    assert list(times['ts']) == list(baseline(mtu)['ts'])
+    assert pd.isna(times['interval_end'].iloc[1])
+
+
+@pytest.mark.parametrize('malformed', ['garbage', '1.1.2019 0:00 - 1.1.2019 1:00', '01.01.2019',
+                                       '01-01-2019 00:00 - 01-01-2019 01:00', '01.01.2019 00:00 - 01.01'])
+def test_malformed_rows(malformed):
+    mtu = pd.Series(['01.01.2019 00:00 - 01.01.2019 01:00', malformed], index=[10, 11])
+
+    with pytest.raises(ValueError, match='Malformed MTU in 1 rows, the first at 11'):
+        parse_mtu(mtu)
+
+
+@pytest.mark.parametrize('blank', ['', None, np.nan])
+def test_blank_rows(blank):
+    # the baseline failed on missing values and turned empty strings into NaT timestamps
+    mtu = pd.Series(['01.01.2019 00:00 - 01.01.2019 01:00', blank, blank], dtype=object)
+
+    with pytest.raises(ValueError, match='Malformed MTU in 2 rows, the first at 1'):
+        parse_mtu(mtu)
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from synthetic_entsoe import local_periods
+from timezones import AREA_TIMEZONES, area_timezone, localize
+
+
+def baseline(wall, tz):
+    """
+    The tz_localize call localize replaced. ambiguous='infer' needs the complete repeated hour.
+    """
+
+    local = pd.DatetimeIndex(wall).astype('datetime64[ns]').tz_localize(tz, ambiguous='infer',
+                                                                        nonexistent='shift_backward')
+    utc = local.tz_convert('UTC').tz_localize(None).values.astype('datetime64[ns]').astype('int64')
+
+    return utc, local.tz_localize(None).values.astype('datetime64[ns]').astype('int64')
+
+
+def nanoseconds(*values):
+    return pd.DatetimeIndex(list(values)).values.astype('datetime64[ns]').astype('int64')
+
+
+# Brussels and areas whose changes fall on other wall clock hours: 01:00 in Lisbon and London,
+# 03:00 in Athens and Helsinki
+@pytest.mark.parametrize('area', ['BE', 'PT', 'GB', 'GR', 'FI'])
+@pytest.mark.parametrize('freq', ['15min', '60min'])
+def test_matches_baseline(area, freq):
+    tz = area_timezone(area)
+    starts, _ = local_periods(2019, freq, tz)
+
+    utc, local = localize(starts.values, tz)
+    expected_utc, expected_local = baseline(starts, tz)
+
+    np.testing.assert_array_equal(utc, expected_utc)
+    np.testing.assert_array_equal(local, expected_local)
+
+
+@pytest.mark.parametrize('area, change', [('BE', '2019-03-31 02:00'), ('PT', '2019-03-31 01:00'),
+                                          ('GR', '2019-03-31 03:00')])
+def test_spring_gap_shifts_backward(area, change):
+    tz = AREA_TIMEZONES[area]
+    hour = pd.Timestamp(change)
+    wall = nanoseconds(hour - pd.Timedelta('1h'), hour, hour + pd.Timedelta('30min'), hour + pd.Timedelta('1h'))
+
+    utc, local = localize(wall, tz)
+
+    # both skipped starts are the last instant before the change, like shift_backward
+    instant = pd.Timestamp(change).tz_localize(tz, nonexistent='shift_forward').tz_convert('UTC').value
+    assert list(utc[1:3]) == [instant - 1, instant - 1]
+    assert list(local[1:3]) == [hour.value - 1, hour.value - 1]
+    assert utc[3] == instant
+    np.testing.assert_array_equal(utc, baseline(wall, tz)[0])
+
+
+@pytest.mark.parametrize('area, change', [('BE', '2019-10-27 02:00'), ('PT', '2019-10-27 01:00'),
+                                          ('GR', '2019-10-27 03:00')])
+def test_autumn_repeat_in_file_order(area, change):
+    tz = AREA_TIMEZONES[area]
+    hour = pd.Timestamp(change)
+    wall = nanoseconds(hour - pd.Timedelta('1h'), hour, hour + pd.Timedelta('30min'),
+                       hour, hour + pd.Timedelta('30min'), hour + pd.Timedelta('1h'))
+
+    utc, local = localize(wall, tz)
+
+    # the repeated starts are two distinct instants an hour apart, daylight time first
+    assert len(np.unique(utc)) == len(utc)
+    assert (np.diff(utc) > 0).all()
+    assert utc[3] - utc[1] == pd.Timedelta('1h').value
+    assert utc[4] - utc[2] == pd.Timedelta('1h').value
+    np.testing.assert_array_equal(local, wall)
+    np.testing.assert_array_equal(utc, baseline(wall, tz)[0])
+
+
+def test_autumn_repeat_without_complete_hour():
+    # one start of the repeated hour listed twice, i.e. a 15 minute export with gaps
+    tz = AREA_TIMEZONES['DE']
+    wall = nanoseconds('2019-10-27 02:15', '2019-10-27 02:15')
+
+    utc, _ = localize(wall, tz)
+
+    assert list(utc) == list(nanoseconds('2019-10-27 00:15', '2019-10-27 01:15'))
+
+
+def test_timezone_without_changes():
+    wall = nanoseconds('2019-03-31 02:00', '2019-10-27 02:00')
+
+    utc, local = localize(wall, AREA_TIMEZONES['TR'])
+
+    assert list(utc) == list(wall - pd.Timedelta('3h').value)
+    np.testing.assert_array_equal(local, wall)
+
+
+def test_empty():
+    utc, local = localize(np.array([], dtype='datetime64[ns]'), 'Europe/Brussels')
+
+    assert len(utc) == 0 and len(local) == 0
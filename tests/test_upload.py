@@ -0,0 +1,150 @@
+import hashlib
+import os
+
+import boto3
+import pytest
+from boto3.s3.transfer import TransferConfig
+
+try:
+    from moto import mock_aws
+except ImportError:
+    # moto < 5
+    from moto import mock_s3 as mock_aws
+
+import preprocess_upload
+from preprocess_upload import list_bucket, local_etag, upload_data
+
+BUCKET = 'entsoe-test'
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """
+    S3 client of a mocked bucket.
+    """
+
+    for name in ['AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_SECURITY_TOKEN', 'AWS_SESSION_TOKEN']:
+        monkeypatch.setenv(name, 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+
+    with mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+@pytest.fixture
+def small_parts(monkeypatch):
+    """
+    Uploads files from 5 MB on in 5 MB parts, the smallest S3 accepts.
+    """
+
+    config = TransferConfig(multipart_threshold=5 * MB, multipart_chunksize=5 * MB, max_concurrency=2)
+    monkeypatch.setattr(preprocess_upload, 'UPLOAD_TRANSFER_CONFIG', config)
+
+    return config
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+
+    return path
+
+
+@pytest.fixture
+def processed(tmp_path):
+    """
+    A processed directory with two small partition files and an 11 MB one.
+    """
+
+    root = str(tmp_path / 'processed')
+    write(os.path.join(root, 'total_demand', 'country=BE', 'year=2019', 'month=01', 'demand-BE.csv'), b'a,b\n1,2\n')
+    write(os.path.join(root, 'total_demand', 'country=NL', 'year=2019', 'month=01', 'demand-NL.csv'), b'a,b\n3,4\n')
+    write(os.path.join(root, 'total_generation', 'country=BE', 'generation-BE.csv'), os.urandom(11 * MB))
+    # partially written outputs are never uploaded
+    write(os.path.join(root, 'total_demand', 'country=BE', '.demand-BE.csv.tmp'), b'a,b\n')
+
+    return root
+
+
+def test_local_etag_single_part(tmp_path):
+    content = b'a,b\n1,2\n'
+    path = write(str(tmp_path / 'f.csv'), content)
+
+    assert local_etag(path) == '"' + hashlib.md5(content).hexdigest() + '"'
+
+
+def test_local_etag_multipart(tmp_path):
+    content = os.urandom(11 * MB)
+    path = write(str(tmp_path / 'f.csv'), content)
+    parts = [content[:5 * MB], content[5 * MB:10 * MB], content[10 * MB:]]
+    expected = hashlib.md5(b''.join(hashlib.md5(part).digest() for part in parts)).hexdigest()
+
+    assert local_etag(path, chunksize=5 * MB, threshold=5 * MB) == f'"{expected}-3"'
+
+
+def test_local_etag_matches_s3(client, small_parts, tmp_path):
+    for name, size in [('single.csv', MB), ('multi.csv', 11 * MB)]:
+        path = write(str(tmp_path / name), os.urandom(size))
+        client.upload_file(path, BUCKET, name, Config=small_parts)
+
+        etag = client.head_object(Bucket=BUCKET, Key=name)['ETag']
+        assert etag == local_etag(path, small_parts.multipart_chunksize, small_parts.multipart_threshold)
+
+    assert client.head_object(Bucket=BUCKET, Key='multi.csv')['ETag'].endswith('-3"')
+
+
+def test_first_upload(client, small_parts, processed):
+    summary = upload_data(processed, BUCKET, workers=2, client=client)
+
+    assert summary['uploaded'] == 3
+    assert summary['skipped'] == 0
+    assert summary['bytes'] == 2 * len(b'a,b\n1,2\n') + 11 * MB
+    assert summary['seconds'] > 0
+    assert summary['bytes_per_sec'] == pytest.approx(summary['bytes'] / summary['seconds'])
+
+    # keyed by the path below the processed directory, hidden files left out
+    assert sorted(list_bucket(client, BUCKET, '')) == [
+        'total_demand/country=BE/year=2019/month=01/demand-BE.csv',
+        'total_demand/country=NL/year=2019/month=01/demand-NL.csv',
+        'total_generation/country=BE/generation-BE.csv',
+    ]
+
+
+def test_rerun_skips_matching_etags(client, small_parts, processed):
+    upload_data(processed, BUCKET, workers=2, client=client)
+    # the large file was uploaded in parts, its ETag is the multipart one
+    assert list_bucket(client, BUCKET, 'total_generation/')[
+        'total_generation/country=BE/generation-BE.csv'][1].endswith('-3"')
+
+    summary = upload_data(processed, BUCKET, workers=2, client=client)
+
+    assert summary['uploaded'] == 0
+    assert summary['skipped'] == 3
+    assert summary['bytes'] == 0
+
+
+def test_changed_file_is_uploaded_again(client, small_parts, processed):
+    upload_data(processed, BUCKET, workers=2, client=client)
+
+    # same size, different content: only the ETag tells them apart
+    changed = os.path.join(processed, 'total_demand', 'country=BE', 'year=2019', 'month=01', 'demand-BE.csv')
+    write(changed, b'a,b\n5,6\n')
+    summary = upload_data(processed, BUCKET, workers=2, client=client)
+
+    assert summary['uploaded'] == 1
+    assert summary['skipped'] == 2
+    assert summary['bytes'] == len(b'a,b\n5,6\n')
+
+    body = client.get_object(Bucket=BUCKET, Key='total_demand/country=BE/year=2019/month=01/demand-BE.csv')['Body']
+    assert body.read() == b'a,b\n5,6\n'
+
+
+def test_prefixes(client, small_parts, processed):
+    summary = upload_data(processed, BUCKET, workers=2, client=client, prefixes=['total_demand/country=NL'])
+
+    assert summary['uploaded'] == 1
+    assert list(list_bucket(client, BUCKET, '')) == ['total_demand/country=NL/year=2019/month=01/demand-NL.csv']
@@ -0,0 +1,101 @@
+import os
+
+import pytest
+
+from conftest import ROOT
+from helpers.euro_energy_sql_queries import EuroEnergyQueries
+from helpers.warehouse import DuckDBWarehouse, RedshiftWarehouse, Warehouse, window_partitions, window_sql
+
+COUNTRIES = os.path.join(ROOT, 'data', 'processed', 'countries')
+
+
+@pytest.fixture
+def warehouse(tmp_path):
+    """
+    An empty DuckDB warehouse reading the repo's processed files.
+    """
+
+    return DuckDBWarehouse(database=str(tmp_path / 'warehouse.duckdb'),
+                           s3_root=os.path.join(ROOT, 'data', 'processed'))
+
+
+def test_countries_load_namibia_as_na(warehouse):
+    warehouse.run(EuroEnergyQueries.create_countries)
+
+    assert warehouse.copy('countries', 's3://energy-etl-processed/countries') == 1
+
+    assert warehouse.get_records("SELECT country_name FROM countries WHERE country_id = 'NA'") == [('Namibia',)]
+    assert warehouse.get_records('SELECT COUNT(*) FROM countries WHERE country_id IS NULL') == [(0,)]
+
+
+def test_empty_fields_are_null(warehouse, tmp_path):
+    path = tmp_path / 'demand' / 'country=BE' / 'demand-BE.csv'
+    path.parent.mkdir(parents=True)
+    path.write_text('20190101 000000,,BE,1546297200000000000\nNA,9000.0,NA,1546300800000000000\n')
+    warehouse.run('CREATE TABLE demand (event_date VARCHAR, total_demand DOUBLE, country_id VARCHAR, ts BIGINT)')
+
+    warehouse.copy('demand', str(tmp_path / 'demand'))
+
+    assert warehouse.get_records('SELECT * FROM demand ORDER BY ts') == [
+        ('20190101 000000', None, 'BE', 1546297200000000000),
+        ('NA', 9000.0, 'NA', 1546300800000000000),
+    ]
+
+
+def test_redshift_copy_reads_only_marker_as_null():
+    assert "NULL AS '\\N'" in RedshiftWarehouse.FORMAT_SQL['CSV']
+
+
+def test_backends_implement_every_method():
+    class Partial(Warehouse):
+        def run(self, sql):
+            pass
+
+    with pytest.raises(TypeError, match='abstract'):
+        Partial()
+    with pytest.raises(TypeError, match='abstract'):
+        Warehouse()
+
+
+def test_window_partitions_in_local_months():
+    # the first UTC hour of a month is still the previous month in Lisbon in winter, but not in Brussels
+    assert window_partitions('2019-01-31 23:00:00', '2019-02-01 00:00:00', ['BE', 'PT']) == [
+        'country=BE/year=2019/month=02/*', 'country=PT/year=2019/month=01/*']
+    # and the last UTC hour of a month is the next month in Athens
+    assert window_partitions('2019-05-31T22:00:00+00:00', '2019-05-31T23:00:00+00:00', ['GR', 'BE']) == [
+        'country=GR/year=2019/month=06/*', 'country=BE/year=2019/month=06/*']
+    # without countries every zone is covered
+    assert window_partitions('2019-02-01 00:00:00', '2019-02-02 00:00:00') == [
+        'country=*/year=2019/month=01/*', 'country=*/year=2019/month=02/*']
+
+
+@pytest.mark.parametrize('countries', [['BE', 'PT', 'GR'], None])
+def test_window_sql_compares_local_event_dates(warehouse, countries):
+    warehouse.run('CREATE TABLE loads (event_date TIMESTAMP, country_id VARCHAR)')
+    # the first and last local hour of the UTC day 2019-07-01 in each country, then the hours around it
+    rows = {'BE': ['2019-07-01 02:00', '2019-07-02 01:00', '2019-07-01 01:00', '2019-07-02 02:00'],
+            'GR': ['2019-07-01 03:00', '2019-07-02 02:00', '2019-07-01 02:00', '2019-07-02 03:00'],
+            'PT': ['2019-07-01 01:00', '2019-07-02 00:00', '2019-07-01 00:00', '2019-07-02 01:00']}
+    warehouse.run('INSERT INTO loads VALUES ' + ', '.join(
+        f"('{event_date}', '{country}')" for country, dates in rows.items() for event_date in dates))
+
+    selected = warehouse.get_records(
+        "SELECT country_id, strftime(event_date, '%Y-%m-%d %H:%M') FROM loads WHERE "
+        + window_sql('event_date', '2019-07-01 00:00:00', '2019-07-02 00:00:00', countries)
+        + ' ORDER BY country_id, event_date')
+
+    assert selected == [(country, event_date) for country, dates in rows.items() for event_date in dates[:2]]
+
+
+def test_sample_outputs_are_partitioned(warehouse):
+    # a flat file under a dataset prefix would be uploaded and staged along with the partitions
+    processed = os.path.join(ROOT, 'data', 'processed')
+    for dataset in ['total_demand', 'total_generation', 'day_ahead_prices', 'installed_capacity']:
+        for path, _, files in os.walk(os.path.join(processed, dataset)):
+            assert files == [] or os.path.relpath(path, processed).split(os.sep)[1].startswith('country=')
+
+    warehouse.run(EuroEnergyQueries.stage_day_ahead_prices)
+    assert warehouse.copy('staging_day_ahead_prices', 's3://energy-etl-processed/day_ahead_prices') == 12
+    # every hour of 2019 once, and the row of the skipped spring hour shifted back
+    assert warehouse.get_records('SELECT COUNT(*), COUNT(DISTINCT ts), MIN(country_id), MAX(country_id) '
+                                 'FROM staging_day_ahead_prices') == [(8761, 8761, 'BE', 'BE')]